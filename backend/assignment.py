@@ -0,0 +1,167 @@
+import numpy as np
+from typing import Iterator, Optional, Tuple
+
+
+def similarity_blocks(queries: np.ndarray, targets: np.ndarray, block_size: int = 1024,
+                      metric: str = "l2") -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yields (start row, block) of the queries x targets similarity matrix, block_size rows
+    at a time, so memory stays at block_size x len(targets). Similarity is the inner product
+    for "ip" and 1 / (1 + squared L2) for "l2", the same score the FAISS searches report.
+    """
+    if metric == "ip":
+        for start in range(0, len(queries), block_size):
+            yield start, queries[start:start + block_size] @ targets.T
+        return
+    target_norms = np.einsum('ij,ij->i', targets, targets)
+    for start in range(0, len(queries), block_size):
+        block = queries[start:start + block_size]
+        d2 = np.einsum('ij,ij->i', block, block)[:, None] + target_norms[None, :] - 2 * block @ targets.T
+        yield start, 1 / (1 + np.maximum(d2, 0))
+
+
+def top_candidates(queries: np.ndarray, targets: np.ndarray, k: int, block_size: int = 1024,
+                   metric: str = "l2") -> Tuple[np.ndarray, np.ndarray]:
+    """Exact top-k targets per query by blockwise similarity: (indices, similarities), best first."""
+    k = min(k, len(targets))
+    indices = np.empty((len(queries), k), dtype=np.int64)
+    similarities = np.empty((len(queries), k))
+    for start, block in similarity_blocks(queries, targets, block_size, metric):
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_sim = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_sim, axis=1, kind='stable')
+        indices[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+        similarities[start:start + len(block)] = np.take_along_axis(top_sim, order, axis=1)
+    return indices, similarities
+
+
+def hungarian(cost: np.ndarray) -> np.ndarray:
+    """
+    Minimum-cost assignment for an n x m cost matrix with n <= m (Kuhn-Munkres with
+    potentials, O(n^2 m)); returns the assigned column for each row. The inner scan over
+    columns is vectorized, so a few thousand rows solve in seconds.
+    """
+    n, m = cost.shape
+    if n > m:
+        raise ValueError("hungarian() needs at least as many columns as rows; transpose the problem")
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.int64)   # owner[j]: 1-based row assigned to column j (0 = free)
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            j1 = int(np.argmin(np.where(free, minv[1:], np.inf))) + 1
+            delta = minv[j1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        # Augment along the alternating path back to the virtual column 0.
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+
+    assigned = np.empty(n, dtype=np.int64)
+    columns = np.nonzero(owner[1:])[0]
+    assigned[owner[1:][columns] - 1] = columns
+    return assigned
+
+
+def assign_dense(scores: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    """
+    Exact capacity-constrained assignment maximizing total score (Hungarian).
+    Each mentor column is repeated once per unit of capacity. Returns the mentor index per
+    mentee, -1 where capacity ran out.
+    """
+    n, m = scores.shape
+    slots = np.repeat(np.arange(m), np.minimum(capacity, n))
+    result = np.full(n, -1, dtype=np.int64)
+    if not len(slots):
+        return result
+    cost = -scores[:, slots]
+    if n <= len(slots):
+        result[:] = slots[hungarian(cost)]
+    else:
+        # More mentees than seats: assign seats to mentees instead.
+        result[hungarian(cost.T)] = slots
+    return result
+
+
+def auction(candidates: np.ndarray, scores: np.ndarray, capacity: np.ndarray, eps: float = 1e-3,
+            max_rounds: int = 100000) -> np.ndarray:
+    """
+    Capacity-constrained auction (Bertsekas, similar-objects variant) on sparse candidates.
+
+    candidates / scores are n x L: each mentee's L best mentors (-1 = none) and similarities.
+    All unassigned mentees bid each round (Jacobi style, vectorized); a mentor keeps its
+    `capacity` highest bids and its price is the lowest bid it holds once full. A mentee
+    whose best net value drops below zero (staying unassigned is worth 0) stops bidding.
+    The total score is within n * eps of optimal over the candidate graph.
+    Returns the mentor index per mentee, -1 if unassigned.
+    """
+    n, L = candidates.shape
+    m = len(capacity)
+    price = np.zeros(m)
+    assigned = np.full(n, -1, dtype=np.int64)
+    held_bid = np.zeros(n)
+    safe_candidates = np.where(candidates >= 0, candidates, 0)
+    valid = (candidates >= 0) & (capacity[safe_candidates] > 0)
+    active = valid.any(axis=1)
+
+    for _ in range(max_rounds):
+        bidders = np.nonzero((assigned < 0) & active)[0]
+        if not len(bidders):
+            break
+        values = np.where(valid[bidders], scores[bidders] - price[safe_candidates[bidders]], -np.inf)
+        best = np.argmax(values, axis=1)
+        first = values[np.arange(len(bidders)), best]
+        if L > 1:
+            values[np.arange(len(bidders)), best] = -np.inf
+            second = np.maximum(values.max(axis=1), 0.0)
+        else:
+            second = np.zeros(len(bidders))
+
+        quitting = first <= 0
+        active[bidders[quitting]] = False
+        bidders, best, second = bidders[~quitting], best[~quitting], second[~quitting]
+        if not len(bidders):
+            continue
+        mentors = candidates[bidders, best]
+        bids = scores[bidders, best] - second + eps
+
+        # Re-rank every mentor that received a bid: current holders plus new bidders.
+        contested = np.unique(mentors)
+        holders = np.nonzero(np.isin(assigned, contested))[0]
+        who = np.concatenate([holders, bidders])
+        where = np.concatenate([assigned[holders], mentors])
+        amount = np.concatenate([held_bid[holders], bids])
+        order = np.lexsort((-amount, where))
+        who, where, amount = who[order], where[order], amount[order]
+        group_start = np.searchsorted(where, where, side='left')
+        rank = np.arange(len(where)) - group_start
+        keep = rank < capacity[where]
+
+        assigned[who[~keep]] = -1
+        assigned[who[keep]] = where[keep]
+        held_bid[who[keep]] = amount[keep]
+
+        # Price = lowest held bid for full mentors (their last kept entry), otherwise 0.
+        kept_where, kept_amount, kept_rank = where[keep], amount[keep], rank[keep]
+        price[contested] = 0.0
+        full = kept_rank == capacity[kept_where] - 1
+        price[kept_where[full]] = kept_amount[full]
+    return assigned
@@ -0,0 +1,165 @@
+"""
+Correctness check for the cohort assignment solvers (assignment.py and
+MatchingEngine.assign_mentors) against brute force on small random instances.
+
+  - hungarian (assign_dense) seats min(mentees, seats) mentees, and its total must equal the
+    best total over every assignment seating that many
+  - auction may leave mentees unassigned (worth 0); its total must be within mentees * eps
+    of the best total over every feasible assignment on its candidate lists
+
+Instances mix negative scores, mentors with capacity 0, more mentees than seats and short
+candidate lists. Then both solvers run end to end through assign_mentors on small cohorts
+(mock encoder vectors, capacities from attributes and overrides). Any over-capacity mentor,
+unknown mentee or non-optimal total is printed, and the run exits with status 1.
+
+Usage (from backend/):
+    python -m benchmarks.assignment --trials 300
+"""
+import argparse
+import logging
+import math
+import sys
+from typing import List, Tuple
+
+import numpy as np
+
+from assignment import assign_dense, auction
+
+TOLERANCE = 1e-9
+
+
+def brute_force(scores: np.ndarray, capacity: np.ndarray) -> Tuple[float, float]:
+    """
+    (best total among assignments seating the most mentees, best total of any assignment)
+    by enumerating every feasible assignment. -inf scores mark pairs that are not allowed.
+    """
+    n, m = scores.shape
+    remaining = capacity.tolist()
+    best_full = (-1, -math.inf)
+    best_any = 0.0
+
+    def visit(i: int, seated: int, total: float):
+        nonlocal best_full, best_any
+        if i == n:
+            best_full = max(best_full, (seated, total))
+            best_any = max(best_any, total)
+            return
+        visit(i + 1, seated, total)
+        for j in range(m):
+            if remaining[j] > 0 and scores[i, j] > -math.inf:
+                remaining[j] -= 1
+                visit(i + 1, seated + 1, total + scores[i, j])
+                remaining[j] += 1
+
+    visit(0, 0, 0.0)
+    return best_full[1], best_any
+
+
+def feasible(assigned: np.ndarray, capacity: np.ndarray) -> bool:
+    if ((assigned < -1) | (assigned >= len(capacity))).any():
+        return False
+    return bool((np.bincount(assigned[assigned >= 0], minlength=len(capacity)) <= capacity).all())
+
+
+def random_instance(rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    n, m = int(rng.integers(1, 8)), int(rng.integers(1, 5))
+    scores = rng.uniform(-0.5, 1.0, size=(n, m))
+    capacity = rng.integers(0, 4, size=m)
+    return scores, capacity
+
+
+def check_solvers(rng: np.random.Generator, trials: int, eps: float) -> List[str]:
+    failures = []
+    for trial in range(trials):
+        scores, capacity = random_instance(rng)
+        n, m = scores.shape
+        best_full, best_any = brute_force(scores, capacity)
+
+        assigned = assign_dense(scores, capacity)
+        total = scores[np.arange(n), assigned][assigned >= 0].sum()
+        if not feasible(assigned, capacity) or abs(total - best_full) > TOLERANCE \
+                or (assigned >= 0).sum() != min(n, int(np.minimum(capacity, n).sum())):
+            failures.append(f"hungarian trial {trial}: {assigned.tolist()} total {total:.6f}, best {best_full:.6f}, "
+                            f"capacity {capacity.tolist()}")
+
+        # Auction on each mentee's L best mentors (best first, -1 padding like a FAISS miss)
+        length = int(rng.integers(1, m + 1))
+        order = np.argsort(-scores, axis=1)[:, :length]
+        candidates = order.copy()
+        candidate_scores = np.take_along_axis(scores, order, axis=1)
+        if length > 1 and rng.random() < 0.3:
+            candidates[:, -1] = -1
+        allowed = np.full((n, m), -math.inf)
+        for i in range(n):
+            for j, score in zip(candidates[i], candidate_scores[i]):
+                if j >= 0:
+                    allowed[i, j] = score
+        _, best_candidates = brute_force(allowed, capacity)
+        won = auction(candidates, candidate_scores, capacity, eps=eps)
+        total = sum(allowed[i, j] for i, j in enumerate(won.tolist()) if j >= 0)
+        if not feasible(won, capacity) or total == -math.inf or total < best_candidates - n * eps - TOLERANCE:
+            failures.append(f"auction trial {trial}: {won.tolist()} total {total:.6f}, best {best_candidates:.6f}, "
+                            f"capacity {capacity.tolist()}")
+    return failures
+
+
+def check_engine(rng: np.random.Generator, trials: int) -> List[str]:
+    from embeddings import EmbeddingManager
+    from matching import AUCTION_EPS, MENTEE_TYPE, MENTOR_TYPE, MatchingEngine
+    from models import AssignmentRequest
+
+    failures = []
+    for trial in range(trials):
+        mentees, mentors, dimension = int(rng.integers(1, 7)), int(rng.integers(1, 5)), 8
+        em = EmbeddingManager(dimension=dimension, encoder_backend="mock")
+        capacity = rng.integers(0, 4, size=mentors)
+        mentor_ids = [f"mentor-{j}" for j in range(mentors)]
+        mentee_ids = [f"mentee-{i}" for i in range(mentees)]
+        em.upsert_user_vectors(mentor_ids + mentee_ids,
+                               rng.standard_normal((mentors + mentees, dimension)).astype('float32'),
+                               [MENTOR_TYPE] * mentors + [MENTEE_TYPE] * mentees,
+                               attributes=[{"capacity": int(c)} for c in capacity] + [None] * mentees)
+        # Overrides replace the attribute for some mentors (capacity 0 included)
+        overrides = {u: int(rng.integers(0, 3)) for u in mentor_ids if rng.random() < 0.3}
+        for j, u in enumerate(mentor_ids):
+            capacity[j] = overrides.get(u, capacity[j])
+
+        vectors = lambda ids: em._vectors[[em.user_rows[u] for u in ids]]
+        distances = ((vectors(mentee_ids)[:, None, :] - vectors(mentor_ids)[None, :, :]) ** 2).sum(axis=2)
+        scores = 1 / (1 + distances.astype('float64'))
+        best_full, best_any = brute_force(scores, capacity)
+        engine = MatchingEngine(em)
+        for solver, best, slack in (("hungarian", best_full, 1e-5), ("auction", best_any, mentees * AUCTION_EPS + 1e-5)):
+            result = engine.assign_mentors(AssignmentRequest(solver=solver, capacities=overrides))
+            seated = np.bincount([mentor_ids.index(a.mentor_id) for a in result.assignments], minlength=mentors)
+            ids = [a.mentee_id for a in result.assignments] + result.unassigned
+            if (seated > capacity).any() or sorted(ids) != sorted(mentee_ids) or result.total_score < best - slack:
+                failures.append(f"assign_mentors {solver} trial {trial}: total {result.total_score:.6f}, "
+                                f"best {best:.6f}, seated {seated.tolist()}, capacity {capacity.tolist()}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=300, help="random instances per check")
+    parser.add_argument("--eps", type=float, default=1e-3, help="auction bid increment")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    rng = np.random.default_rng(args.seed)
+    checks = (("solvers (assign_dense, auction)", lambda: check_solvers(rng, args.trials, args.eps)),
+              ("assign_mentors (hungarian, auction)", lambda: check_engine(rng, args.trials)))
+    failed = False
+    for name, check in checks:
+        failures = check()
+        print(f"{name}: {args.trials} trials, " + (f"{len(failures)} FAILED" if failures else "all optimal"))
+        for failure in failures[:10]:
+            print(f"  {failure}")
+        failed |= bool(failures)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
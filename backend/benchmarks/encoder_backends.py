@@ -0,0 +1,109 @@
+"""
+Startup and latency report for the encoder backends in text_encoders.py.
+
+Each backend is measured in a fresh process, so startup includes importing its libraries:
+import + load time, warmup time, single-text p50 latency, per-text latency in batches of
+--batch, peak RSS, and cosine agreement of its vectors with the first backend listed.
+
+Usage (from backend/):
+    python -m benchmarks.encoder_backends --backends torch onnx onnx-int8
+    python -m benchmarks.encoder_backends --backends onnx onnx-int8 --model-dir ./minilm --json encoders.json
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+TEXTS = [
+    "Interests: Leadership, Career Growth. Challenges: Time Management.",
+    "Looking to learn data science and ML while managing a busy schedule.",
+    "Our startup needs fundraising advice before we scale; investors are asking about AI.",
+    "Stress about the job search and negotiating my first offer.",
+    "mentor",
+    "Goals: hire a first engineer, ship the product roadmap and manage a growing team.",
+]
+
+
+def measure(backend: str, model_name: str, dimension: int, model_dir: Optional[str],
+            threads: int, repeat: int, batch_size: int) -> Dict[str, Any]:
+    """Runs in a child process: everything, including imports, starts cold."""
+    start = time.perf_counter()
+    from text_encoders import create_text_encoder
+    encoder = create_text_encoder(backend, model_name, dimension, model_dir=model_dir, threads=threads)
+    encoder.load()
+    startup_s = time.perf_counter() - start
+    encoder.warmup()
+
+    single = []
+    for i in range(repeat):
+        text = TEXTS[i % len(TEXTS)]
+        start = time.perf_counter()
+        encoder.encode([text])
+        single.append((time.perf_counter() - start) * 1000)
+
+    batch = (TEXTS * (batch_size // len(TEXTS) + 1))[:batch_size]
+    start = time.perf_counter()
+    for _ in range(max(1, repeat // 10)):
+        encoder.encode(batch)
+    batched_ms = (time.perf_counter() - start) * 1000 / (max(1, repeat // 10) * batch_size)
+
+    return {
+        "backend": encoder.backend,
+        "startup_s": round(startup_s, 3),
+        "warmup_s": round(encoder.warmup_seconds, 3),
+        "single_p50_ms": round(float(np.percentile(single, 50)), 3),
+        "batched_ms_per_text": round(batched_ms, 3),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "vectors": encoder.encode(TEXTS).tolist(),
+    }
+
+
+def run(backends: List[str], model_name: str, dimension: int, model_dir: Optional[str],
+        threads: int, repeat: int, batch_size: int) -> List[Dict[str, Any]]:
+    report = []
+    reference = None
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        for backend in backends:
+            row = pool.apply(measure, (backend, model_name, dimension, model_dir, threads, repeat, batch_size))
+            vectors = np.asarray(row.pop("vectors"))
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            if reference is None:
+                reference = vectors
+            row["cosine_vs_first"] = round(float((vectors * reference).sum(axis=1).mean()), 4)
+            report.append(row)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--model-dir", help="local directory with onnx/model.onnx and tokenizer.json")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = all cores)")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--json", help="write the report to this path as JSON")
+    args = parser.parse_args()
+
+    report = run(args.backends, args.model, args.dimension, args.model_dir, args.threads, args.repeat, args.batch)
+
+    print(f"model={args.model} batch={args.batch} repeat={args.repeat}")
+    print(f"{'backend':<10} {'startup s':>9} {'warmup s':>9} {'p50 ms':>8} {'ms/text@batch':>14} "
+          f"{'rss MB':>8} {'cos':>7}")
+    for row in report:
+        print(f"{row['backend']:<10} {row['startup_s']:>9.2f} {row['warmup_s']:>9.3f} {row['single_p50_ms']:>8.2f} "
+              f"{row['batched_ms_per_text']:>14.3f} {row['peak_rss_mb']:>8.1f} {row['cosine_vs_first']:>7.4f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": vars(args), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark for the compiled entity extractor (extraction.py).
+
+Compares the original per-rule substring checks against the single-pass regex on long
+synthetic transcripts, then measures how the compiled extractor scales with thousands
+of keyword rules. Finally checks the compiled extractor against one regex per keyword on
+texts full of overlapping keywords ("time" / "time management" / "management"), and exits
+with status 1 on any difference.
+
+Usage (from backend/):
+    python -m benchmarks.extractor --words 50000 --rules 5000
+"""
+import argparse
+import random
+import re
+import sys
+import time
+
+from extraction import DEFAULT_RULES, EntityExtractor
+
+VOCABULARY = ("i want to improve my leadership and learn how to manage time while the team scales "
+              "we said data matters but html pages need maintaining investors are busy career growth "
+              "stress schedule hiring ai ml mentor founder product roadmap negotiation").split()
+
+
+def substring_extract(text: str, rules=DEFAULT_RULES):
+    """The pre-compiled extractor: one `in` check per keyword over the lowercased transcript."""
+    text = text.lower()
+    entities = []
+    for rule in rules:
+        if any(keyword.rstrip("*") in text for keyword in rule["keywords"]):
+            entities.append({"label": rule["label"], "text": rule["text"]})
+    return entities
+
+
+def reference_extract(text: str, rules):
+    """One search per keyword (whole words, '*' for a prefix): slow, but each keyword is checked on its own."""
+    entities = []
+    for rule in rules:
+        for keyword in rule["keywords"]:
+            words = keyword.rstrip("*").lower().split()
+            pattern = r"\b" + r"\s+".join(map(re.escape, words)) + ("" if keyword.endswith("*") else r"\b")
+            if re.search(pattern, text.lower()):
+                entities.append({"label": rule["label"], "text": rule["text"]})
+                break
+    return entities
+
+
+OVERLAP_CASES = [
+    # (keywords, one rule each; text; keywords expected to match)
+    (["time", "time management", "management"], "Time management is hard", ["time", "time management", "management"]),
+    (["machine learning", "learn*"], "machine learning", ["machine learning", "learn*"]),
+    (["machine learning", "learning algorithms"], "machine learning algorithms", ["machine learning", "learning algorithms"]),
+    (["data", "data science", "science*"], "data sciences", ["data", "science*"]),
+]
+
+
+def overlap_rules(vocabulary, n: int, rng: random.Random):
+    """Keywords of 1-3 words from a small vocabulary, so they share and overlap words."""
+    rules = []
+    for i in range(n):
+        keyword = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3)))
+        if rng.random() < 0.3:
+            keyword = keyword[:rng.randint(max(1, len(keyword) - 3), len(keyword))].rstrip() + "*"
+        rules.append({"label": "Interest", "text": f"Topic {i}", "keywords": [keyword]})
+    return rules
+
+
+def check_overlaps(rng: random.Random, trials: int) -> int:
+    failures = 0
+    for keywords, text, expected in OVERLAP_CASES:
+        rules = [{"label": "Interest", "text": keyword, "keywords": [keyword]} for keyword in keywords]
+        got = [e["text"] for e in EntityExtractor(rules).extract(text)]
+        if got != expected:
+            failures += 1
+            print(f"  {text!r} with {keywords}: expected {expected}, got {got}")
+    vocabulary = "time management data science machine learning learn lead leadership".split()
+    for _ in range(trials):
+        rules = overlap_rules(vocabulary, rng.randint(1, 8), rng)
+        text = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 12)))
+        expected, got = reference_extract(text, rules), EntityExtractor(rules).extract(text)
+        if got != expected:
+            failures += 1
+            if failures <= 5:
+                print(f"  {text!r} with {[r['keywords'][0] for r in rules]}: expected "
+                      f"{[e['text'] for e in expected]}, got {[e['text'] for e in got]}")
+    return failures
+
+
+def synthetic_rules(n: int, rng: random.Random):
+    rules = list(DEFAULT_RULES)
+    for i in range(n):
+        word = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 10)))
+        rules.append({"label": "Interest", "text": f"Topic {i}", "keywords": [word, f"{word}ing*"]})
+    return rules
+
+
+def timeit(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=50000, help="words per synthetic transcript")
+    parser.add_argument("--rules", type=int, default=5000, help="extra synthetic keyword rules")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--trials", type=int, default=2000, help="random overlapping-keyword checks")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Filler-only text never satisfies every rule, so the compiled scan can't stop early.
+    transcript = " ".join(rng.choice(VOCABULARY[20:]) for _ in range(args.words))
+    size_kb = len(transcript) / 1024
+
+    default = EntityExtractor()
+    start = time.perf_counter()
+    many_rules = synthetic_rules(args.rules, rng)
+    large = EntityExtractor(many_rules)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    print(f"transcript: {args.words} words ({size_kb:,.0f} KB), best of {args.repeat}")
+    print(f"{'extractor':<42} {'ms':>9} {'MB/s':>8}")
+    for name, fn in ((f"substring checks ({len(DEFAULT_RULES)} rules)", substring_extract),
+                     (f"compiled regex ({len(default.rules)} rules)", default.extract),
+                     (f"substring checks ({len(many_rules)} rules)", lambda t: substring_extract(t, many_rules)),
+                     (f"compiled regex ({len(large.rules)} rules)", large.extract)):
+        ms = timeit(fn, transcript, args.repeat)
+        print(f"{name:<42} {ms:>9.2f} {size_kb / 1024 / (ms / 1000):>8.1f}")
+    print(f"compiling {len(large.rules)} rules took {compile_ms:.0f} ms")
+
+    sample = "We said we maintain html pages."
+    print(f"\nword boundaries on {sample!r}:")
+    print(f"  substring: {[e['text'] for e in substring_extract(sample)]}")
+    print(f"  compiled:  {[e['text'] for e in default.extract(sample)]}")
+
+    print(f"\noverlapping keywords: {len(OVERLAP_CASES)} fixed cases + {args.trials} random vs one regex per keyword")
+    failures = check_overlaps(rng, args.trials)
+    print(f"  {'FAILED: ' + str(failures) + ' mismatches' if failures else 'ok'}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Memory benchmark: NetworkX vs compact array-backed Profile Graph storage.
+
+Ingests the same synthetic sessions into a GraphBuilder per backend, reports traced
+memory per user and ingest time, and checks that get_user_context / get_graph_data
+are identical across backends.
+
+Usage (from backend/):
+    python -m benchmarks.graph_memory --users 20000 --sessions 5
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from graph_logic import GraphBuilder
+from models import Session
+
+TRANSCRIPTS = [
+    "I want to improve my leadership skills and learn management.",
+    "Busy schedule and a lot of stress about my career and the job search.",
+    "Our startup needs fundraising advice before we scale; investors are asking about AI.",
+    "Looking to learn data science and ML while managing time.",
+    "Just checking in, nothing new this week.",
+]
+
+
+def make_sessions(users: int, sessions_per_user: int, seed: int):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    sessions = []
+    for u in range(users):
+        for s in range(sessions_per_user):
+            sessions.append(Session(
+                session_id=str(uuid.UUID(int=rng.getrandbits(128))),
+                user_id=f"user_{u}",
+                user_type="mentee" if u % 2 else "mentor",
+                transcript=rng.choice(TRANSCRIPTS),
+                timestamp=start + timedelta(minutes=rng.randint(0, 500000)),
+            ))
+    return sessions
+
+
+def measure(backend: str, sessions):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    builder = GraphBuilder(backend=backend)
+    for session in sessions:
+        builder.process_session(session)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return builder, current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--sessions", type=int, default=5, help="sessions per user")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    sessions = make_sessions(args.users, args.sessions, args.seed)
+    print(f"{args.users} users x {args.sessions} sessions")
+    print(f"{'backend':<10} {'MB':>9} {'bytes/user':>11} {'ingest s':>9}")
+
+    builders = {}
+    for backend in ("networkx", "compact"):
+        builder, current, elapsed = measure(backend, sessions)
+        builders[backend] = builder
+        print(f"{backend:<10} {current / 1e6:>9.1f} {current / args.users:>11,.0f} {elapsed:>9.2f}")
+
+    reference, compact = builders["networkx"], builders["compact"]
+    sample = random.Random(args.seed).sample(range(args.users), min(500, args.users))
+    mismatches = sum(
+        reference.get_user_context(f"user_{u}") != compact.get_user_context(f"user_{u}")
+        or reference.get_graph_data(f"user_{u}") != compact.get_graph_data(f"user_{u}")
+        for u in sample
+    )
+    print(f"output check on {len(sample)} users: {'identical' if not mismatches else f'{mismatches} MISMATCHES'}")
+
+
+if __name__ == "__main__":
+    main()
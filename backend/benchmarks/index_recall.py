@@ -0,0 +1,111 @@
+"""
+Recall-vs-latency report for the FAISS backends in vector_index.py.
+
+Builds every backend over the same synthetic, clustered profile vectors and compares
+recall@k against the exact Flat baseline, plus single-query p50/p99 latency.
+
+Usage (from backend/):
+    python -m benchmarks.index_recall --n 200000 --queries 500
+    python -m benchmarks.index_recall --n 50000 --json report.json
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from vector_index import IndexConfig, create_index
+
+
+def make_vectors(n: int, dimension: int, clusters: int, seed: int) -> np.ndarray:
+    """Gaussian clusters roughly mimic sentence embeddings grouped by topic."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype('float32')
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.35 * rng.standard_normal((n, dimension)).astype('float32')
+    return vectors.astype('float32')
+
+
+def default_configs(n: int, dimension: int) -> List[IndexConfig]:
+    # ~4*sqrt(n) lists, capped so k-means gets the 39 points per centroid it needs
+    nlist = int(max(16, min(4096, 4 * np.sqrt(n), n // 39)))
+    pq_m = dimension // 8
+    configs = [IndexConfig("flat")]
+    for nprobe in (1, 4, 16, 64):
+        configs.append(IndexConfig("ivf_flat", nlist=nlist, nprobe=nprobe, train_size=min(n, 39 * nlist)))
+    for nprobe in (16, 64):
+        configs.append(IndexConfig("ivf_pq", nlist=nlist, nprobe=nprobe, pq_m=pq_m,
+                                   train_size=min(n, 39 * nlist)))
+    for ef in (16, 64, 128):
+        configs.append(IndexConfig("hnsw", ef_search=ef))
+    return configs
+
+
+def describe(config: IndexConfig) -> str:
+    if config.index_type == "flat":
+        return "flat"
+    if config.index_type == "hnsw":
+        return f"hnsw(M={config.hnsw_m},efSearch={config.ef_search})"
+    extra = f",m={config.pq_m}" if config.index_type == "ivf_pq" else ""
+    return f"{config.index_type}(nlist={config.nlist},nprobe={config.nprobe}{extra})"
+
+
+def run(n: int, dimension: int, n_queries: int, k: int, seed: int) -> List[Dict[str, Any]]:
+    vectors = make_vectors(n, dimension, clusters=max(8, n // 500), seed=seed)
+    queries = make_vectors(n_queries, dimension, clusters=max(8, n // 500), seed=seed + 1)
+    rows = np.arange(n)
+
+    report = []
+    truth = None
+    for config in default_configs(n, dimension):
+        index = create_index(dimension, config)
+        start = time.perf_counter()
+        index.upsert(rows, vectors)
+        build_s = time.perf_counter() - start
+
+        _, found = index.search(queries, k)
+        if truth is None:
+            truth = found
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+
+        latencies = []
+        for q in queries:
+            start = time.perf_counter()
+            index.search(q.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        report.append({
+            "backend": describe(config),
+            "recall_at_k": round(float(recall), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "build_s": round(build_s, 2),
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000, help="number of profile vectors")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write the report to this path as JSON")
+    args = parser.parse_args()
+
+    report = run(args.n, args.dimension, args.queries, args.k, args.seed)
+
+    print(f"n={args.n} d={args.dimension} k={args.k} queries={args.queries}")
+    print(f"{'backend':<40} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8}")
+    for row in report:
+        print(f"{row['backend']:<40} {row['recall_at_k']:>9.3f} {row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['build_s']:>8.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": vars(args), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Correctness check for the state-owner IPC (ipc.py): calls and their failure paths between a
+StateClient and a StateServer hosting a stub service, over a real Unix socket.
+
+  - round trips, and many concurrent calls multiplexed on one connection (slow calls do not
+    hold up fast ones, every reply reaches its own caller)
+  - an exception raised by the owner is re-raised with its type; one that cannot be rebuilt
+    from its pickle (constructor with other arguments) and an unpicklable result arrive as
+    RuntimeError, and the connection stays usable
+  - a method outside REMOTE_METHODS is refused with AttributeError without running
+  - the owner shutting down or dropping the connection mid-call, or sending a frame that does
+    not unpickle, fails the in-flight calls with ConnectionError instead of hanging them, and the next
+    call reconnects
+  - the socket is created with mode 0600, and a connection from another user (peer uid
+    faked) is refused before its call runs
+Any difference is printed, and the run exits with status 1.
+
+Usage (from backend/):
+    python -m benchmarks.ipc_errors --calls 200
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import shutil
+import stat
+import sys
+import tempfile
+from typing import Any, Callable, List
+
+import ipc
+from ipc import StateClient, StateServer, _read_frame
+
+# Every call is bounded, so a reply that never comes fails the check instead of hanging it.
+CALL_TIMEOUT = 5
+
+
+class TwoArgError(Exception):
+    """Pickles fine, but unpickling calls __init__ with one argument."""
+
+    def __init__(self, code: int, reason: str):
+        super().__init__(f"{code} {reason}")
+
+
+class StubService:
+    REMOTE_METHODS = ("echo", "sleep_echo", "fail", "fail_odd", "unpicklable", "count")
+
+    def __init__(self):
+        self.calls = 0
+
+    async def echo(self, value: Any) -> Any:
+        return value
+
+    async def sleep_echo(self, value: Any, seconds: float) -> Any:
+        await asyncio.sleep(seconds)
+        return value
+
+    async def fail(self, message: str):
+        raise KeyError(message)
+
+    async def fail_odd(self):
+        raise TwoArgError(7, "odd")
+
+    async def unpicklable(self) -> Callable:
+        return lambda: None
+
+    async def count(self) -> int:
+        self.calls += 1
+        return self.calls
+
+    async def secret(self):
+        self.calls += 1000
+
+
+async def expect(failures: List[str], what: str, call, error: type) -> Any:
+    try:
+        await asyncio.wait_for(call, CALL_TIMEOUT)
+        failures.append(f"{what}: returned instead of raising {error.__name__}")
+    except asyncio.TimeoutError:
+        failures.append(f"{what}: still waiting after {CALL_TIMEOUT}s")
+    except Exception as e:
+        if not isinstance(e, error):
+            failures.append(f"{what}: raised {type(e).__name__}: {e}, expected {error.__name__}")
+        return e
+
+
+async def check_calls(rng: random.Random, path: str, calls: int) -> List[str]:
+    failures = []
+    service = StubService()
+    server = StateServer(service, path)
+    await server.start()
+    mode = stat.S_IMODE(os.stat(path).st_mode)
+    if mode != 0o600:
+        failures.append(f"socket mode {oct(mode)}, expected 0o600")
+    client = StateClient(path, StubService.REMOTE_METHODS)
+    await client.start()
+    try:
+        if await asyncio.wait_for(client.echo({"a": [1, 2]}), CALL_TIMEOUT) != {"a": [1, 2]}:
+            failures.append("echo returned something else")
+
+        delays = [rng.choice([0.0, rng.uniform(0, 0.05)]) for _ in range(calls)]
+        finished: List[int] = []
+
+        async def one(i: int):
+            value = await client.sleep_echo(i, delays[i])
+            finished.append(i)
+            return value
+
+        results = await asyncio.wait_for(asyncio.gather(*(one(i) for i in range(calls))), CALL_TIMEOUT)
+        if results != list(range(calls)):
+            failures.append("concurrent calls got replies meant for other calls")
+        slowest = max(range(calls), key=delays.__getitem__)
+        if any(finished.index(i) > finished.index(slowest) for i in range(calls) if delays[i] == 0):
+            failures.append("the slowest call held up calls that needed no time")
+
+        connection = client._writer
+        error = await expect(failures, "remote KeyError", client.fail("boom"), KeyError)
+        if error is not None and error.args != ("boom",):
+            failures.append(f"remote KeyError arrived as {error!r}")
+        error = await expect(failures, "exception that does not unpickle", client.fail_odd(), RuntimeError)
+        if error is not None and "TwoArgError" not in str(error):
+            failures.append(f"exception that does not unpickle arrived as {error!r}, without its type")
+        await expect(failures, "unpicklable result", client.unpicklable(), RuntimeError)
+        await expect(failures, "method outside REMOTE_METHODS", client.call("secret"), AttributeError)
+        if service.calls:
+            failures.append("a method outside REMOTE_METHODS ran")
+        if await asyncio.wait_for(client.count(), CALL_TIMEOUT) != 1 or client._writer is not connection:
+            failures.append("the connection did not survive the failed calls")
+    finally:
+        await client.close()
+        await server.close()
+    return failures
+
+
+async def check_foreign_peer(path: str) -> List[str]:
+    failures = []
+    service = StubService()
+    server = StateServer(service, path)
+    await server.start()
+    real_peer_uid = ipc._peer_uid
+    ipc._peer_uid = lambda writer: os.getuid() + 1
+    client = StateClient(path, StubService.REMOTE_METHODS)
+    try:
+        await client.start()
+        await expect(failures, "call from another user", client.count(), ConnectionError)
+        if service.calls:
+            failures.append("a call from another user ran")
+    finally:
+        ipc._peer_uid = real_peer_uid
+        await client.close()
+        await server.close()
+    return failures
+
+
+async def raw_owner(path: str, reply: Callable[[asyncio.StreamWriter], None]) -> asyncio.AbstractServer:
+    """An owner that reads one call and answers it with `reply` (then hangs up)."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await _read_frame(reader)
+            reply(writer)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_unix_server(handle, path=path)
+
+
+async def check_broken_owner(path: str) -> List[str]:
+    failures = []
+    client = StateClient(path, StubService.REMOTE_METHODS)
+    for what, reply in (("owner shutting down mid-call", None),
+                        ("owner hanging up mid-call", lambda writer: None),
+                        ("frame that does not unpickle", lambda writer: writer.write(b"\x00\x00\x00\x05junk!"))):
+        if reply is None:
+            owner = StateServer(StubService(), path)
+            await owner.start()
+        else:
+            owner = await raw_owner(path, reply)
+        await client.start()
+        calls = [asyncio.ensure_future(client.sleep_echo(i, CALL_TIMEOUT * 2)) for i in range(3)]
+        await asyncio.sleep(0.05)
+        if reply is None:
+            await owner.close()
+        await asyncio.gather(*(expect(failures, f"{what} (call {i})", call, ConnectionError)
+                               for i, call in enumerate(calls)))
+        if reply is not None:
+            owner.close()
+            await owner.wait_closed()
+            os.remove(path)
+        if failures:
+            break
+
+        # The owner comes back: the next call reconnects.
+        server = StateServer(StubService(), path)
+        await server.start()
+        try:
+            if await asyncio.wait_for(client.echo("again"), CALL_TIMEOUT) != "again":
+                failures.append(f"after {what}: reconnected call returned something else")
+        except Exception as e:
+            failures.append(f"after {what}: next call raised {type(e).__name__}: {e} instead of reconnecting")
+        await client.close()
+        await server.close()
+    return failures
+
+
+async def run_checks(seed: int, calls: int) -> List[str]:
+    directory = tempfile.mkdtemp(prefix="ipc-check-")
+    path = os.path.join(directory, "state.sock")
+    try:
+        failures = await check_calls(random.Random(seed), path, calls)
+        failures += await check_foreign_peer(path)
+        failures += await check_broken_owner(path)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="concurrent calls on one connection")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    # The refused peer and the unreadable reply are logged by ipc.py on purpose.
+    logging.getLogger("ipc").setLevel(logging.CRITICAL)
+
+    failures = asyncio.run(run_checks(args.seed, args.calls))
+    print(f"state IPC: {args.calls} concurrent calls and error paths, "
+          + (f"{len(failures)} FAILED" if failures else "all correct"))
+    for failure in failures[:10]:
+        print(f"  {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
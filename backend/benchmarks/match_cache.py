@@ -0,0 +1,150 @@
+"""
+Correctness check for the match cache (MatchingEngine._cached / _still_valid): after every
+random profile change, rankings served through the cache must equal freshly computed ones.
+
+Each step applies one mutation to a small mock-encoder index, then every mentee is matched
+for each (top_k, filters) through a cached engine and an uncached one (cache_size=0).
+Mutations cover the cases the revalidation has to get right:
+  - a mentor upserted far from / close to the mentees (new or existing, attributes changed)
+  - a mentee's own profile changing
+  - a user switching role (mentor <-> mentee) and a user being removed
+  - a burst of more than MAX_REVALIDATE_CHANGES mentor changes (entries must be dropped)
+Every few steps the batch path (find_matches_batch) is compared as well. Any difference is
+printed, and the run exits with status 1.
+
+Usage (from backend/):
+    python -m benchmarks.match_cache --steps 300
+"""
+import argparse
+import logging
+import sys
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from embeddings import EmbeddingManager
+from matching import MAX_REVALIDATE_CHANGES, MENTEE_TYPE, MENTOR_TYPE, MatchingEngine
+from models import BatchMatchRequest, MatchRequest, MatchResult
+
+DIMENSION = 8
+TOP_KS = (1, 3, 5)
+FILTERS = ({}, {"track": "a"})
+TRACKS = ("a", "b")
+# Batched and single-query FAISS searches round distances differently
+SCORE_TOLERANCE = 1e-4
+
+
+def ranking(matches: List[MatchResult]) -> List[Tuple[str, float]]:
+    return [(m.mentor_id, round(m.score, 5)) for m in matches]
+
+
+def same_ranking(got: List[MatchResult], want: List[MatchResult]) -> bool:
+    return [m.mentor_id for m in got] == [m.mentor_id for m in want] \
+        and all(abs(a.score - b.score) <= SCORE_TOLERANCE for a, b in zip(got, want))
+
+
+class Population:
+    """Profiles in the index, with the role each user currently has."""
+
+    def __init__(self, rng: np.random.Generator, em: EmbeddingManager, mentors: int, mentees: int):
+        self.rng = rng
+        self.em = em
+        self.roles: Dict[str, str] = {}
+        self.next_id = 0
+        self.upsert([self.new_id() for _ in range(mentors)], MENTOR_TYPE)
+        self.upsert([self.new_id() for _ in range(mentees)], MENTEE_TYPE)
+
+    def new_id(self) -> str:
+        self.next_id += 1
+        return f"user-{self.next_id}"
+
+    def ids(self, role: str) -> List[str]:
+        return [u for u, r in self.roles.items() if r == role]
+
+    def upsert(self, user_ids: List[str], role: str, near: str = None):
+        vectors = self.rng.standard_normal((len(user_ids), DIMENSION)).astype('float32')
+        if near is not None and self.em.get_user_vector(near) is not None:
+            # Close to a mentee, so the change can enter (or reorder) its cached rankings
+            vectors = self.em._vectors[self.em.user_rows[near]] + 0.05 * vectors
+        self.em.upsert_user_vectors(user_ids, vectors, [role] * len(user_ids),
+                                    attributes=[{"track": str(self.rng.choice(TRACKS))} for _ in user_ids])
+        self.roles.update((u, role) for u in user_ids)
+
+    def mutate(self) -> str:
+        rng = self.rng
+        mentors, mentees = self.ids(MENTOR_TYPE), self.ids(MENTEE_TYPE)
+        kind = rng.choice(["mentor_far", "mentor_near", "mentor_near", "mentee", "role", "remove", "burst"],
+                          p=[0.25, 0.2, 0.1, 0.15, 0.1, 0.1, 0.1])
+        if kind == "mentor_far" or (kind == "mentor_near" and not mentees):
+            target = str(rng.choice(mentors)) if mentors and rng.random() < 0.5 else self.new_id()
+            self.upsert([target], MENTOR_TYPE)
+        elif kind == "mentor_near":
+            target = str(rng.choice(mentors)) if mentors and rng.random() < 0.5 else self.new_id()
+            self.upsert([target], MENTOR_TYPE, near=str(rng.choice(mentees)))
+        elif kind == "mentee" and mentees:
+            self.upsert([str(rng.choice(mentees))], MENTEE_TYPE)
+        elif kind == "role" and len(mentors) > 1 and len(mentees) > 1:
+            user_id = str(rng.choice(mentors + mentees))
+            self.upsert([user_id], MENTEE_TYPE if self.roles[user_id] == MENTOR_TYPE else MENTOR_TYPE)
+        elif kind == "remove" and len(mentors) > 1 and len(mentees) > 1:
+            user_id = str(rng.choice(mentors + mentees))
+            self.em.remove_user(user_id)
+            del self.roles[user_id]
+        elif kind == "burst":
+            count = MAX_REVALIDATE_CHANGES + int(rng.integers(1, 10))
+            for _ in range(count):
+                self.upsert([str(rng.choice(mentors)) if rng.random() < 0.7 else self.new_id()], MENTOR_TYPE)
+        else:
+            kind = "mentor_far"
+            self.upsert([self.new_id()], MENTOR_TYPE)
+        return str(kind)
+
+
+def check(rng: np.random.Generator, steps: int, mentors: int, mentees: int) -> Tuple[List[str], MatchingEngine]:
+    em = EmbeddingManager(dimension=DIMENSION, encoder_backend="mock")
+    population = Population(rng, em, mentors, mentees)
+    cached = MatchingEngine(em)
+    uncached = MatchingEngine(em, cache_size=0)
+    failures = []
+    for step in range(steps):
+        kind = population.mutate()
+        mentee_ids = population.ids(MENTEE_TYPE)
+        for top_k in TOP_KS:
+            for filters in FILTERS:
+                if step % 10 == 9:
+                    request = BatchMatchRequest(user_ids=mentee_ids, top_k=top_k, filters=filters)
+                    got, want = cached.find_matches_batch(request), uncached.find_matches_batch(request)
+                    pairs = [(u, got[u], want[u]) for u in mentee_ids]
+                else:
+                    pairs = [(u, cached.find_matches(MatchRequest(user_id=u, top_k=top_k, filters=filters)),
+                              uncached.find_matches(MatchRequest(user_id=u, top_k=top_k, filters=filters)))
+                             for u in mentee_ids]
+                for user_id, got, want in pairs:
+                    if not same_ranking(got, want):
+                        failures.append(f"step {step} after {kind}: {user_id} top_k={top_k} filters={filters} "
+                                        f"cached {ranking(got)}, fresh {ranking(want)}")
+    return failures, cached
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=300, help="random profile changes")
+    parser.add_argument("--mentors", type=int, default=40)
+    parser.add_argument("--mentees", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    failures, engine = check(np.random.default_rng(args.seed), args.steps, args.mentors, args.mentees)
+    cache = engine.cache
+    print(f"match cache: {args.steps} steps, " + (f"{len(failures)} FAILED" if failures else "all identical"))
+    print(f"  hits {cache.hits}, misses {cache.misses}, revalidations {cache.revalidations}, "
+          f"invalidations {cache.invalidations}")
+    for failure in failures[:10]:
+        print(f"  {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Synthetic concurrent load against the scheduler: floods the ingest endpoints while
+interactive /match requests run, in-process through the httpx ASGI transport (mock encoder
+unless ENCODER_BACKEND says otherwise), and checks that the service sheds load instead of
+queueing it.
+
+Phases:
+  - seed: --users sessions through /sessions/bulk
+  - idle: /match latency for distinct users with nothing else running
+  - load: --ingest-clients tasks post /session (every --bulk-every-th a /sessions/bulk of
+    --bulk-size) as fast as they are answered, while --match-clients tasks time /match
+
+Reported: /match p50/p99 idle vs under load, /health and /metrics latency under load, status
+counts per endpoint class, accepted ingest throughput and state-queue depth. The run fails (exit 1) if a 429/503 lacks a
+Retry-After header, or if any request fails with another status.
+
+Flooders wait Retry-After after a 429/503 (--backoff-ms retries sooner, like impatient
+clients). Limits come from the usual MATCH_* / INGEST_* variables.
+
+Usage (from backend/):
+    python -m benchmarks.overload --json overload.json
+    python -m benchmarks.overload --users 10000 --ingest-clients 256 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.suite import git_commit, latency_stats, make_sessions, parse_users, print_report
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    import main
+
+    rng = random.Random(args.seed)
+    np.random.seed(args.seed)
+    sessions = make_sessions(args.users, args.seed)
+    mentee_ids = [s["user_id"] for s in sessions if s["user_type"] == "mentee"]
+    results: Dict[str, Any] = {}
+    statuses: Dict[str, Counter] = {"match": Counter(), "ingest": Counter()}
+    missing_retry_after = 0
+
+    def record(kind: str, resp) -> bool:
+        nonlocal missing_retry_after
+        statuses[kind][str(resp.status_code)] += 1
+        if resp.status_code in (429, 503) and "retry-after" not in resp.headers:
+            missing_retry_after += 1
+        return resp.status_code == 200
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        service = main.service
+        for offset in range(0, len(sessions), args.bulk_size):
+            (await client.post("/sessions/bulk", json={"sessions": sessions[offset:offset + args.bulk_size]})).raise_for_status()
+
+        # Disjoint users per phase, so both phases measure cache misses
+        users = rng.sample(mentee_ids, min(len(mentee_ids), 2 * args.matches))
+        idle_users, load_users = users[:len(users) // 2], users[len(users) // 2:]
+
+        samples = []
+        for user_id in idle_users:
+            start = time.perf_counter()
+            (await client.post("/match", json={"user_id": user_id, "top_k": 3})).raise_for_status()
+            samples.append((time.perf_counter() - start) * 1000)
+        results["match_idle"] = latency_stats(samples)
+
+        # Bulk bodies are serialized up front, so the flood costs the server, not this client.
+        bulk_bodies = [json.dumps({"sessions": [
+            dict(sessions[rng.randrange(len(sessions))], session_id=f"overload-bulk-{b}-{j}") for j in range(args.bulk_size)
+        ]}).encode() for b in range(8)]
+        stop = asyncio.Event()
+        accepted = 0
+        max_state_queue = 0
+
+        async def ingest_client(worker: int):
+            nonlocal accepted
+            i = 0
+            while not stop.is_set():
+                i += 1
+                if i % args.bulk_every == 0:
+                    resp = await client.post("/sessions/bulk", content=bulk_bodies[i % len(bulk_bodies)],
+                                             headers={"content-type": "application/json"})
+                    accepted += args.bulk_size if record("ingest", resp) else 0
+                else:
+                    session = dict(sessions[rng.randrange(len(sessions))], session_id=f"overload-{worker}-{i}")
+                    resp = await client.post("/session", json=session)
+                    accepted += 1 if record("ingest", resp) else 0
+                if resp.status_code in (429, 503):
+                    # Well-behaved clients wait Retry-After (with jitter); --backoff-ms simulates impatient ones.
+                    delay = args.backoff_ms / 1000 if args.backoff_ms is not None else float(resp.headers["retry-after"])
+                    await asyncio.sleep(delay * rng.uniform(1.0, 1.5))
+
+        load_samples: List[float] = []
+        pending = list(load_users)
+
+        async def match_client():
+            while pending:
+                user_id = pending.pop()
+                start = time.perf_counter()
+                resp = await client.post("/match", json={"user_id": user_id, "top_k": 3})
+                if record("match", resp):
+                    load_samples.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(args.seconds / max(1, len(load_users)) * args.match_clients)
+
+        probe_samples: List[float] = []
+
+        async def probe():
+            # Health checks and scrapes must not wait behind the ingest jobs.
+            while not stop.is_set():
+                for path in ("/health", "/metrics"):
+                    start = time.perf_counter()
+                    (await client.get(path)).raise_for_status()
+                    probe_samples.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.05)
+
+        async def watch_queue():
+            nonlocal max_state_queue
+            while not stop.is_set():
+                max_state_queue = max(max_state_queue, service.executor.pending())
+                await asyncio.sleep(0.01)
+
+        floods = [asyncio.create_task(ingest_client(w)) for w in range(args.ingest_clients)]
+        watcher = asyncio.create_task(watch_queue())
+        prober = asyncio.create_task(probe())
+        start = time.perf_counter()
+        # Let the ingest queue fill before timing matches
+        await asyncio.sleep(min(1.0, args.seconds / 4))
+        await asyncio.gather(*(match_client() for _ in range(args.match_clients)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*floods, watcher, prober)
+
+        results["match_under_load"] = latency_stats(load_samples) if load_samples else {"count": 0}
+        results["probes_under_load"] = latency_stats(probe_samples) if probe_samples else {"count": 0}
+        results["ingest_under_load"] = {
+            "seconds": round(elapsed, 3),
+            "accepted_sessions": accepted,
+            "accepted_sessions_per_s": round(accepted / elapsed, 1),
+            "max_state_queue": max_state_queue,
+        }
+        results["status"] = {kind: dict(counts) for kind, counts in statuses.items()}
+
+    unexpected = sum(count for counts in statuses.values() for status, count in counts.items()
+                     if status not in ("200", "429", "503"))
+    results["checks"] = {"missing_retry_after": missing_retry_after, "unexpected_status": unexpected,
+                         "match_rejected": sum(v for k, v in statuses["match"].items() if k != "200")}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=parse_users, default=2000, help="seeded users: 1k, 100k, 1m or an integer")
+    parser.add_argument("--bulk-size", type=int, default=1000, help="sessions per /sessions/bulk request")
+    parser.add_argument("--bulk-every", type=int, default=10, help="every Nth ingest request is a bulk request")
+    parser.add_argument("--ingest-clients", type=int, default=256, help="concurrent ingest flooders")
+    parser.add_argument("--match-clients", type=int, default=4, help="concurrent /match clients")
+    parser.add_argument("--matches", type=int, default=300, help="/match requests per phase")
+    parser.add_argument("--seconds", type=float, default=5.0, help="approximate length of the load phase")
+    parser.add_argument("--backoff-ms", type=float, help="flooder pause after a 429/503 (default: its Retry-After)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write the report to this path as JSON")
+    parser.add_argument("--baseline", help="earlier --json report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's INFO logging")
+    args = parser.parse_args()
+
+    os.environ.setdefault("ENCODER_BACKEND", "mock")
+    os.environ.pop("STATE_SOCKET", None)
+    if not args.verbose:
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+    results = asyncio.run(run(args))
+
+    report = {
+        "params": vars(args),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "encoder_backend": os.environ["ENCODER_BACKEND"],
+        "limits": {name: os.environ.get(name) for name in
+                   ("MATCH_CONCURRENCY", "MATCH_QUEUE_SIZE", "MATCH_QUEUE_TIMEOUT_MS", "INGEST_CONCURRENCY",
+                    "INGEST_QUEUE_SIZE", "INGEST_QUEUE_TIMEOUT_MS", "STATE_PRIORITY_DELAY_MS")},
+        "results": results,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    checks = results["checks"]
+    if checks["missing_retry_after"] or checks["unexpected_status"]:
+        print(f"FAILED: {checks}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
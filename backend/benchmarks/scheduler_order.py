@@ -0,0 +1,237 @@
+"""
+Correctness check for request scheduling (scheduler.py): StateExecutor deadline ordering and
+shutdown, and ConcurrencyLimiter admission under random arrivals, timeouts and cancellations.
+
+StateExecutor, with a fake monotonic clock:
+  - the state thread is held by a gate job while random-priority jobs are enqueued at random
+    times; once released they must run in deadline order (enqueue time + priority * delay,
+    then enqueue order)
+  - a job's exception reaches its caller, the caller's context variables reach the job,
+    close() lets queued jobs finish, and run() after close raises RuntimeError
+ConcurrencyLimiter:
+  - a full queue answers 429 and a wait past queue_timeout 503
+  - a waiter cancelled just as it is handed a slot passes the slot on
+  - random request storms (some clients disconnecting) never exceed `limit` in flight, end
+    every request served, shed (429/503) or cancelled, and leave nothing active or queued behind
+Any difference is printed, and the run exits with status 1.
+
+Usage (from backend/):
+    python -m benchmarks.scheduler_order --trials 200
+"""
+import argparse
+import asyncio
+import contextvars
+import random
+import sys
+import threading
+import types
+from typing import List
+
+import scheduler
+from scheduler import ConcurrencyLimiter, Overloaded, StateExecutor
+
+PRIORITY_DELAY = 0.25
+REQUEST_ID = contextvars.ContextVar("request_id", default=None)
+
+
+class FakeClock:
+    """Replaces scheduler.time: monotonic() returns `now`, which only the check advances."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+async def blocked(executor: StateExecutor) -> threading.Event:
+    """Occupies the state thread until the returned event is set."""
+    started, gate = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        gate.wait()
+
+    asyncio.ensure_future(executor.run(scheduler.INTERACTIVE, hold))
+    await asyncio.to_thread(started.wait)
+    return gate
+
+
+async def enqueue(executor: StateExecutor, priority: int, fn, *args) -> asyncio.Task:
+    task = asyncio.ensure_future(executor.run(priority, fn, *args))
+    # Let run() push the job before the clock moves on
+    await asyncio.sleep(0)
+    return task
+
+
+async def check_order(rng: random.Random, clock: FakeClock, jobs: int) -> List[str]:
+    executor = StateExecutor(priority_delay=PRIORITY_DELAY)
+    gate = await blocked(executor)
+    ran: List[int] = []
+    deadlines = []
+    tasks = []
+    for i in range(jobs):
+        clock.now += rng.choice([0.0, rng.uniform(0, 2 * PRIORITY_DELAY)])
+        priority = rng.choice([scheduler.INTERACTIVE, scheduler.INGEST, scheduler.BACKGROUND])
+        deadlines.append((clock.now + priority * PRIORITY_DELAY, i))
+        tasks.append(await enqueue(executor, priority, ran.append, i))
+    gate.set()
+    await asyncio.gather(*tasks)
+    executor.close()
+    want = [i for _, i in sorted(deadlines)]
+    if ran != want:
+        return [f"{jobs} jobs ran in order {ran}, expected {want}"]
+    return []
+
+
+async def check_executor() -> List[str]:
+    failures = []
+    executor = StateExecutor(priority_delay=PRIORITY_DELAY)
+
+    def fail():
+        raise KeyError("boom")
+
+    try:
+        await executor.run(scheduler.INGEST, fail)
+        failures.append("a failing job returned normally")
+    except KeyError:
+        pass
+
+    REQUEST_ID.set("req-1")
+    if await executor.run(scheduler.INTERACTIVE, REQUEST_ID.get) != "req-1":
+        failures.append("the caller's context did not reach the job")
+
+    gate = await blocked(executor)
+    done: List[int] = []
+    tasks = [await enqueue(executor, scheduler.BACKGROUND, done.append, i) for i in range(5)]
+    closing = asyncio.ensure_future(asyncio.to_thread(executor.close))
+    await asyncio.sleep(0.01)
+    gate.set()
+    await closing
+    await asyncio.gather(*tasks)
+    if done != list(range(5)):
+        failures.append(f"close() ran queued jobs {done}, expected all 5")
+    try:
+        await executor.run(scheduler.INTERACTIVE, int)
+        failures.append("run() after close() did not raise")
+    except RuntimeError:
+        pass
+    return failures
+
+
+async def check_limiter() -> List[str]:
+    failures = []
+    limiter = ConcurrencyLimiter("check", limit=1, max_queue=1, queue_timeout=0.05)
+    await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    try:
+        await limiter.acquire()
+        failures.append("a full queue admitted a request")
+    except Overloaded as e:
+        if e.status_code != 429:
+            failures.append(f"full queue answered {e.status_code}, expected 429")
+    try:
+        await waiter
+        failures.append("a request waited past queue_timeout")
+    except Overloaded as e:
+        if e.status_code != 503:
+            failures.append(f"queue timeout answered {e.status_code}, expected 503")
+
+    # Handed a slot and cancelled in the same iteration: the next waiter must get it.
+    limiter.queue_timeout, limiter.max_queue = 5, 2
+    first = asyncio.ensure_future(limiter.acquire())
+    second = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    limiter.release(0.01)
+    first.cancel()
+    # (Before Python 3.12 wait_for returns a result that is already set instead of raising, so the
+    # cancelled request may hold the slot after all; it then gives it back like any request.)
+    if (await asyncio.gather(first, return_exceptions=True))[0] is None:
+        limiter.release(0.01)
+    try:
+        await asyncio.wait_for(second, 1)
+        limiter.release(0.01)
+    except asyncio.TimeoutError:
+        failures.append("the slot handed to a cancelled waiter was lost")
+    if (limiter.active, limiter.waiting) != (0, 0):
+        failures.append(f"after hand-over {limiter.active} active / {limiter.waiting} waiting, expected 0 / 0")
+    return failures
+
+
+async def check_storm(rng: random.Random, requests: int) -> List[str]:
+    limiter = ConcurrencyLimiter("check", limit=rng.randint(1, 4), max_queue=rng.randint(0, 6),
+                                 queue_timeout=rng.choice([0.005, 0.02, 1.0]))
+    inside = 0
+    peak = 0
+
+    async def request() -> str:
+        nonlocal inside, peak
+        try:
+            async with limiter.slot():
+                inside += 1
+                peak = max(peak, inside)
+                try:
+                    await asyncio.sleep(rng.uniform(0, 0.01))
+                finally:
+                    inside -= 1
+            return "served"
+        except Overloaded as e:
+            return str(e.status_code)
+
+    tasks = []
+    for _ in range(requests):
+        tasks.append(asyncio.ensure_future(request()))
+        if rng.random() < 0.3:
+            await asyncio.sleep(rng.uniform(0, 0.003))
+        if rng.random() < 0.1:
+            rng.choice(tasks).cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    failures = []
+    if peak > limiter.limit:
+        failures.append(f"{peak} requests in flight with limit {limiter.limit}")
+    if (limiter.active, limiter.waiting) != (0, 0):
+        failures.append(f"{limiter.active} active / {limiter.waiting} waiting after the storm, expected 0 / 0")
+    unexpected = [r for r in results if not isinstance(r, asyncio.CancelledError) and r not in ("served", "429", "503")]
+    if unexpected:
+        failures.append(f"requests ended with {unexpected[:3]}")
+    return failures
+
+
+async def run_checks(seed: int, trials: int, jobs: int, requests: int) -> List[str]:
+    rng = random.Random(seed)
+    failures = []
+    real_time, clock = scheduler.time, FakeClock()
+    scheduler.time = types.SimpleNamespace(monotonic=clock.monotonic)
+    try:
+        for trial in range(trials):
+            failures += [f"ordering trial {trial}: {f}" for f in await check_order(rng, clock, rng.randint(2, jobs))]
+        failures += [f"executor: {f}" for f in await check_executor()]
+    finally:
+        scheduler.time = real_time
+    failures += [f"limiter: {f}" for f in await check_limiter()]
+    for trial in range(trials):
+        failures += [f"storm trial {trial}: {f}" for f in await check_storm(rng, requests)]
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=200)
+    parser.add_argument("--jobs", type=int, default=40, help="most jobs queued per ordering trial")
+    parser.add_argument("--requests", type=int, default=30, help="requests per limiter storm")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    failures = asyncio.run(run_checks(args.seed, args.trials, args.jobs, args.requests))
+    print(f"scheduler: {args.trials} ordering trials, {args.trials} limiter storms, "
+          + (f"{len(failures)} FAILED" if failures else "all correct"))
+    for failure in failures[:10]:
+        print(f"  {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
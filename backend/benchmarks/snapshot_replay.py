@@ -0,0 +1,208 @@
+"""
+Crash-recovery check for snapshots and session log replay (persistence.py, ingest.py): after
+every restart (restore the snapshot, replay the log from its checkpoint) the Profile Graphs
+and profiles must equal those of a reference fed each session exactly once.
+
+Each trial runs a few crash cycles against one data directory:
+  - random session batches are ingested through SessionIngestor with a session log, and
+    snapshots are taken at random points between its state jobs, including between a
+    batch's graph update and its profile upserts
+  - sometimes a last batch is logged but never applied (a crash right after the append)
+  - the process "crashes": the log is closed without a final snapshot, sometimes after a
+    torn record was left at its end
+  - a fresh stack restores the snapshot and replays the log, as MentorshipService does
+After every restart each user's graph, context and profile metadata (type, attributes,
+context preview) are compared with the reference. Any difference is printed, and the run
+exits with status 1.
+
+Usage (from backend/):
+    python -m benchmarks.snapshot_replay --trials 30
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from embeddings import EmbeddingManager
+from encoder import BatchingEncoder
+from graph_logic import GraphBuilder
+from graph_store import GRAPH_BACKENDS
+from ingest import SessionIngestor
+from persistence import SnapshotManager
+from wal import SessionLog, _encode, _segment_name
+
+DIMENSION = 8
+USERS = 12
+WORDS = ("learning", "stress", "time", "busy", "career", "hiring", "investors", "scaling", "leadership",
+         "management", "data", "ai", "the", "and", "weekly", "goals")
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+class Stack:
+    """Graph builder, embedding manager and ingestor; with a directory, also a session log and snapshots."""
+
+    def __init__(self, backend: str, directory: Optional[str] = None, rng: Optional[random.Random] = None,
+                 snapshot_rate: float = 0.0):
+        self.graph_builder = GraphBuilder(backend=backend)
+        self.embedding_manager = EmbeddingManager(dimension=DIMENSION, encoder_backend="mock")
+        self.encoder = BatchingEncoder(self.embedding_manager.encode_batch)
+        self.session_log = self.snapshots = None
+        if directory is not None:
+            self.session_log = SessionLog(os.path.join(directory, "wal"), group_commit_ms=0, fsync=False)
+            self.snapshots = SnapshotManager(os.path.join(directory, "snapshots"), self.graph_builder,
+                                             self.embedding_manager, session_log=self.session_log)
+        self.rng = rng
+        self.snapshot_rate = snapshot_rate
+        self.snapshots_taken = 0
+        self.ingestor = SessionIngestor(self.graph_builder, self.embedding_manager, self.encoder,
+                                        session_log=self.session_log, run=self.run)
+
+    async def run(self, fn, *args):
+        # Stands in for the state executor: a periodic snapshot may land between any two jobs.
+        if self.snapshots is not None and self.rng.random() < self.snapshot_rate:
+            await self.snapshots.snapshot()
+            self.snapshots_taken += 1
+        return fn(*args)
+
+    async def restart(self) -> int:
+        """Restores the snapshot and replays the log after it; returns the sessions replayed."""
+        rate, self.snapshot_rate = self.snapshot_rate, 0.0
+        manifest = self.snapshots.restore()
+        replayed = await self.ingestor.replay(manifest["extra"]["wal_offset"] if manifest else 0)
+        # (Periodic snapshots only start once replay is done)
+        self.snapshot_rate = rate
+        return replayed
+
+    async def close(self):
+        if self.session_log is not None:
+            await self.session_log.close()
+        await self.encoder.close()
+
+    def profiles(self) -> Dict[str, Dict[str, Any]]:
+        em = self.embedding_manager
+        return {user_id: {key: em.metadata[row][key] for key in ("user_type", "attributes", "text_preview")}
+                for user_id, row in em.user_rows.items()}
+
+    def graphs(self) -> Dict[str, str]:
+        return {user_id: json.dumps(graph, sort_keys=True, default=str)
+                for user_id, graph in self.graph_builder.iter_graph_data()}
+
+
+def random_batch(rng: random.Random, counter: int) -> List[Dict[str, Any]]:
+    batch = []
+    for i in range(rng.randint(1, 12)):
+        n = counter + i
+        user = rng.randrange(USERS)
+        batch.append({
+            "session_id": f"s{n}",
+            "user_id": f"user-{user}",
+            # Role switches now and then, so profiles move between partitions
+            "user_type": "mentor" if (user + (n % 17 == 0)) % 2 else "mentee",
+            "transcript": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8))),
+            "timestamp": (START + timedelta(minutes=n)).isoformat(),
+            "metadata": {"track": rng.choice("abc")},
+        })
+    return batch
+
+
+def compare(stack: Stack, reference: Stack, where: str) -> List[str]:
+    failures = []
+    got, want = stack.graphs(), reference.graphs()
+    if got.keys() != want.keys():
+        failures.append(f"{where}: graph users {sorted(got)}, expected {sorted(want)}")
+    for user_id in sorted(got.keys() & want.keys()):
+        if got[user_id] != want[user_id]:
+            failures.append(f"{where}: graph of {user_id} differs")
+        if stack.graph_builder.get_user_context(user_id) != reference.graph_builder.get_user_context(user_id):
+            failures.append(f"{where}: context of {user_id} differs")
+    got_profiles, want_profiles = stack.profiles(), reference.profiles()
+    for user_id in sorted(got_profiles.keys() | want_profiles.keys()):
+        if got_profiles.get(user_id) != want_profiles.get(user_id):
+            failures.append(f"{where}: profile of {user_id} is {got_profiles.get(user_id)}, "
+                            f"expected {want_profiles.get(user_id)}")
+    return failures
+
+
+async def run_trial(rng: random.Random, directory: str, backend: str, cycles: int, batches: int) -> Dict[str, Any]:
+    failures: List[str] = []
+    reference = Stack(backend)
+    counter = snapshots = replayed = 0
+    for cycle in range(cycles + 1):
+        stack = Stack(backend, directory, rng, snapshot_rate=rng.choice([0.05, 0.2, 0.5]))
+        replayed += await stack.restart()
+        failures += compare(stack, reference, f"restart {cycle}")
+        if failures or cycle == cycles:
+            snapshots += stack.snapshots_taken
+            await stack.close()
+            break
+
+        for _ in range(rng.randint(1, batches)):
+            batch = random_batch(rng, counter)
+            counter += len(batch)
+            await stack.ingestor.ingest(list(enumerate(batch)))
+            await reference.ingestor.ingest(list(enumerate(batch)))
+        if rng.random() < 0.3:
+            # Logged, then the process died before applying it: replay has to.
+            batch = random_batch(rng, counter)
+            counter += len(batch)
+            await stack.session_log.append(batch)
+            await reference.ingestor.ingest(list(enumerate(batch)))
+
+        snapshots += stack.snapshots_taken
+        await stack.close()
+        if rng.random() < 0.5:
+            line = _encode(random_batch(rng, counter)[0])
+            with open(os.path.join(stack.session_log.directory, _segment_name(stack.session_log._bases[-1])), "ab") as f:
+                f.write(line[:rng.randint(1, len(line) - 1)].replace(b"\n", b" "))
+    await reference.close()
+    return {"failures": failures, "sessions": counter, "snapshots": snapshots, "replayed": replayed}
+
+
+def check(seed: int, trials: int, cycles: int, batches: int, backends: List[str]) -> Dict[str, Any]:
+    totals = {"failures": [], "sessions": 0, "snapshots": 0, "replayed": 0}
+    for backend in backends:
+        for trial in range(trials):
+            directory = tempfile.mkdtemp(prefix="snapshot-check-")
+            try:
+                result = asyncio.run(run_trial(random.Random(seed * 100003 + trial), directory, backend,
+                                               cycles, batches))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            totals["failures"] += [f"{backend} trial {trial}: {f}" for f in result.pop("failures")]
+            for key, value in result.items():
+                totals[key] += value
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=30, help="trials per graph backend")
+    parser.add_argument("--cycles", type=int, default=4, help="crash / restart cycles per trial")
+    parser.add_argument("--batches", type=int, default=6, help="most batches ingested per cycle")
+    parser.add_argument("--backends", nargs="+", default=list(GRAPH_BACKENDS), choices=list(GRAPH_BACKENDS))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    # Torn records are logged by wal.py on purpose.
+    logging.getLogger("wal").setLevel(logging.CRITICAL)
+
+    totals = check(args.seed, args.trials, args.cycles, args.batches, args.backends)
+    failures = totals["failures"]
+    print(f"snapshot + replay: {args.trials} trials x {args.cycles} restarts per backend, "
+          + (f"{len(failures)} FAILED" if failures else "all recovered"))
+    print(f"  sessions {totals['sessions']}, snapshots {totals['snapshots']}, replayed {totals['replayed']}")
+    for failure in failures[:10]:
+        print(f"  {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
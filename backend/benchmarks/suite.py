@@ -0,0 +1,256 @@
+"""
+End-to-end benchmark suite: synthetic users from the generate_data personas, driven
+in-process against the FastAPI app (httpx ASGI transport, no server or network) with the
+offline mock encoder unless ENCODER_BACKEND says otherwise.
+
+Measures:
+  - bulk ingest throughput (/sessions/bulk) and single /session latency
+  - /match p50/p99 for distinct users (cache misses) and the same users again (cache hits)
+  - /match/batch throughput
+  - per-call cost of get_user_vector, search_by_vector, get_user_context, process_session
+  - RSS after each phase and peak RSS
+
+Results are written as JSON (--json) so runs can be compared across commits (--baseline).
+All randomness is seeded, so the same --users/--seed produce the same workload.
+
+Usage (from backend/):
+    python -m benchmarks.suite --users 1k --json bench.json
+    python -m benchmarks.suite --users 100k --matches 2000 --json after.json --baseline before.json
+    python -m benchmarks.suite --users 1m --bulk-size 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+SCALES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+
+def parse_users(value: str) -> int:
+    return SCALES.get(value.lower()) or int(value)
+
+
+def make_sessions(users: int, seed: int) -> List[Dict[str, Any]]:
+    """One session per user, cycling through the mentor and mentee personas."""
+    from generate_data import mentee_personas, mentor_personas, generate_variation
+
+    random.seed(seed)
+    personas = [(p, "mentor") for p in mentor_personas] + [(p, "mentee") for p in mentee_personas]
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    sessions = []
+    for i in range(users):
+        persona, user_type = personas[i % len(personas)]
+        session = generate_variation(persona, i // len(personas))
+        session.update(
+            session_id=f"bench-{i}",
+            user_type=user_type,
+            timestamp=(start + timedelta(seconds=i)).isoformat(),
+            metadata={"cohort": str(i % 4)},
+        )
+        sessions.append(session)
+    return sessions
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux /proc), falling back to the peak elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def latency_stats(samples_ms: List[float]) -> Dict[str, float]:
+    samples = np.asarray(samples_ms)
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(samples.mean()), 4),
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p99_ms": round(float(np.percentile(samples, 99)), 4),
+    }
+
+
+def time_calls(fn: Callable[[int], Any], n: int) -> Dict[str, float]:
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return latency_stats(samples)
+
+
+async def time_async_calls(fn: Callable[[int], Any], n: int) -> Dict[str, float]:
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        await fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return latency_stats(samples)
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    import main
+    from models import Session
+
+    rng = random.Random(args.seed)
+    np.random.seed(args.seed)
+    results: Dict[str, Any] = {"rss_mb": {"start": round(rss_mb(), 1)}}
+
+    sessions = make_sessions(args.users, args.seed)
+    mentee_ids = [s["user_id"] for s in sessions if s["user_type"] == "mentee"]
+    mentor_ids = [s["user_id"] for s in sessions if s["user_type"] == "mentor"]
+    results["rss_mb"]["sessions_built"] = round(rss_mb(), 1)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        service = main.service
+        # Bulk ingest
+        start = time.perf_counter()
+        for offset in range(0, len(sessions), args.bulk_size):
+            resp = await client.post("/sessions/bulk", json={"sessions": sessions[offset:offset + args.bulk_size]})
+            resp.raise_for_status()
+        elapsed = time.perf_counter() - start
+        results["ingest"] = {
+            "sessions": len(sessions),
+            "seconds": round(elapsed, 3),
+            "sessions_per_s": round(len(sessions) / elapsed, 1),
+        }
+        results["rss_mb"]["after_ingest"] = round(rss_mb(), 1)
+
+        # Single-session requests (graph update + encode + upsert per request)
+        extra = [dict(sessions[rng.randrange(len(sessions))], session_id=f"bench-extra-{i}")
+                 for i in range(args.sessions)]
+        async def post_session(i):
+            (await client.post("/session", json=extra[i])).raise_for_status()
+        results["session_http"] = await time_async_calls(post_session, len(extra))
+
+        # /match: distinct users first (cache misses), then the same users again (hits)
+        users = rng.sample(mentee_ids, min(args.matches, len(mentee_ids)))
+        async def match(i):
+            (await client.post("/match", json={"user_id": users[i], "top_k": 3})).raise_for_status()
+        results["match_http"] = await time_async_calls(match, len(users))
+        results["match_http_cached"] = await time_async_calls(match, len(users))
+
+        # /match/batch
+        batch_users = rng.sample(mentee_ids, min(args.batch_users, len(mentee_ids)))
+        service.matching_engine.cache.clear()
+        start = time.perf_counter()
+        (await client.post("/match/batch", json={"user_ids": batch_users, "top_k": 3})).raise_for_status()
+        elapsed = time.perf_counter() - start
+        results["match_batch_http"] = {
+            "users": len(batch_users),
+            "seconds": round(elapsed, 4),
+            "users_per_s": round(len(batch_users) / elapsed, 1),
+        }
+
+        # Direct calls on the components behind the endpoints
+        em, graphs = service.embedding_manager, service.graph_builder
+        profiled = [user_id for user_id in mentee_ids + mentor_ids if user_id in em.user_rows]
+        sample = [rng.choice(profiled) for _ in range(args.micro)]
+        vectors = [em.get_user_vector(user_id) for user_id in sample]
+        results["micro"] = {
+            "get_user_vector": time_calls(lambda i: em.get_user_vector(sample[i]), len(sample)),
+            "search_by_vector": time_calls(
+                lambda i: em.search_by_vector(vectors[i], k=3, user_type="mentor", exclude_user_ids=[sample[i]]),
+                len(sample)),
+            "get_user_context": time_calls(lambda i: graphs.get_user_context(sample[i]), len(sample)),
+        }
+        direct = [Session(**dict(sessions[rng.randrange(len(sessions))], session_id=f"bench-direct-{i}"))
+                  for i in range(args.sessions)]
+        results["micro"]["process_session"] = await time_async_calls(
+            lambda i: service.process_session(direct[i]), len(direct))
+        results["rss_mb"]["end"] = round(rss_mb(), 1)
+    results["rss_mb"]["peak"] = round(peak_rss_mb(), 1)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None):
+    current = flatten(report["results"])
+    previous = flatten(baseline["results"]) if baseline else {}
+    print(f"users={report['params']['users']} commit={report['commit'] or '?'}")
+    for key, value in current.items():
+        line = f"{key:<40} {value:>14.4f}"
+        if key in previous and previous[key]:
+            line += f"   {(value - previous[key]) / previous[key] * 100:+7.1f}% vs {previous[key]:.4f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=parse_users, default=1000, help="number of users: 1k, 100k, 1m or an integer")
+    parser.add_argument("--bulk-size", type=int, default=1000, help="sessions per /sessions/bulk request")
+    parser.add_argument("--sessions", type=int, default=200, help="single /session requests and direct calls")
+    parser.add_argument("--matches", type=int, default=500, help="/match requests per pass")
+    parser.add_argument("--batch-users", type=int, default=500, help="users in the /match/batch request")
+    parser.add_argument("--micro", type=int, default=2000, help="calls per component micro-benchmark")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write the report to this path as JSON")
+    parser.add_argument("--baseline", help="earlier --json report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's INFO logging")
+    args = parser.parse_args()
+
+    # Offline by default: no model download, deterministic mock vectors.
+    os.environ.setdefault("ENCODER_BACKEND", "mock")
+    # Components are measured directly, so the state must live in this process.
+    os.environ.pop("STATE_SOCKET", None)
+    # Logging is configured when main is imported; keep per-request records out of the timings.
+    if not args.verbose:
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+    results = asyncio.run(run(args))
+
+    report = {
+        "params": vars(args),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "encoder_backend": os.environ["ENCODER_BACKEND"],
+        "index_type": os.environ.get("FAISS_INDEX_TYPE", "flat"),
+        "results": results,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Crash-recovery check for the session log (wal.py): random append / fail / rotate / crash
+sequences, after each of which the log must read back exactly the records that were
+acknowledged, at the offsets append returned.
+
+Each trial drives one SessionLog through random steps:
+  - concurrent appends (group-committed together), some tickets left in flight for a while
+  - a write that fails halfway (full disk), with the truncate afterwards succeeding or failing
+  - a checkpoint: rotate and truncate_before(checkpoint_offset())
+  - a crash: the log is reopened after a torn record (a prefix of a line, or bytes without a
+    newline) was left at the end of the last segment
+After every step read_from(checkpoint) must equal the acknowledged records from the checkpoint
+on, and checkpoint_offset() the oldest ticket still in flight. Any difference is printed, and
+the run exits with status 1.
+
+Usage (from backend/):
+    python -m benchmarks.wal_recovery --trials 200
+"""
+import argparse
+import asyncio
+import errno
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+from typing import Any, Dict, List, Set, Tuple
+
+from wal import SessionLog, _encode, _segment_name
+
+
+class FailingFile:
+    """Stands in for a segment file whose next write stops halfway with ENOSPC."""
+
+    def __init__(self, file, truncate_fails: bool):
+        self.file = file
+        self.truncate_fails = truncate_fails
+        self.armed = True
+        self.partial = False
+
+    def write(self, data) -> int:
+        if not self.armed:
+            return self.file.write(data)
+        if not self.partial and len(data) > 1:
+            self.partial = True
+            return self.file.write(data[:len(data) // 2])
+        self.armed = False
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    def truncate(self, size: int):
+        if self.truncate_fails:
+            raise OSError(errno.EIO, "Input/output error")
+        return self.file.truncate(size)
+
+    def __getattr__(self, name: str):
+        return getattr(self.file, name)
+
+
+def random_record(rng: random.Random, n: int) -> Dict[str, Any]:
+    return {"session_id": f"s{n}", "transcript": "x" * rng.randint(0, 200)}
+
+
+async def run_trial(rng: random.Random, directory: str, steps: int) -> List[str]:
+    failures: List[str] = []
+    acknowledged: List[Tuple[int, Dict[str, Any]]] = []
+    in_flight: Set[int] = set()
+    floor = 0
+    counter = 0
+    log = SessionLog(directory, group_commit_ms=rng.choice([0, 1]), fsync=False)
+
+    for step in range(steps):
+        action = rng.random()
+        if action < 0.55 or (action < 0.65 and log._reopen):
+            batches = [[random_record(rng, counter + i * 10 + j) for j in range(rng.randint(1, 3))]
+                       for i in range(rng.randint(1, 4))]
+            counter += 100
+            results = await asyncio.gather(*(log.append(batch) for batch in batches))
+            for batch, offsets in zip(batches, results):
+                acknowledged += zip(offsets, batch)
+                if rng.random() < 0.3:
+                    in_flight.add(offsets[0])
+                else:
+                    log.applied(offsets[0])
+            kind = f"append {len(batches)} batches"
+        elif action < 0.65 and not log._reopen:
+            # (After a failed truncate the next write opens a new segment, replacing any stand-in file.)
+            truncate_fails = rng.random() < 0.5
+            log._file = FailingFile(log._file, truncate_fails)
+            try:
+                await log.append([random_record(rng, counter)])
+                failures.append(f"step {step}: a failed write was acknowledged")
+            except OSError:
+                pass
+            counter += 1
+            kind = f"failed write (truncate {'fails' if truncate_fails else 'succeeds'})"
+        elif action < 0.8:
+            for ticket in list(in_flight):
+                if rng.random() < 0.5:
+                    log.applied(ticket)
+                    in_flight.discard(ticket)
+            floor = log.checkpoint_offset()
+            log.rotate()
+            log.truncate_before(floor)
+            kind = f"checkpoint at {floor}"
+        else:
+            await log.close()
+            line = _encode(random_record(rng, counter))
+            torn = line[:rng.randint(1, len(line) - 1)] if rng.random() < 0.7 else os.urandom(rng.randint(1, 20))
+            with open(os.path.join(directory, _segment_name(log._bases[-1])), "ab") as f:
+                f.write(torn.replace(b"\n", b" "))
+            log = SessionLog(directory, group_commit_ms=rng.choice([0, 1]), fsync=False)
+            # Nothing survives a restart in flight.
+            in_flight.clear()
+            kind = "crash with torn tail"
+
+        got = list(log.read_from(floor))
+        want = sorted((offset, record) for offset, record in acknowledged if offset >= floor)
+        if got != want:
+            failures.append(f"step {step} after {kind}: read {len(got)} records, expected {len(want)}; "
+                            f"first difference at {next((i for i, (a, b) in enumerate(zip(got, want)) if a != b), min(len(got), len(want)))}")
+        checkpoint = min(in_flight, default=log.end_offset)
+        if log.checkpoint_offset() != checkpoint:
+            failures.append(f"step {step} after {kind}: checkpoint {log.checkpoint_offset()}, expected {checkpoint}")
+        if failures:
+            break
+    await log.close()
+    return failures
+
+
+def check(seed: int, trials: int, steps: int) -> List[str]:
+    failures = []
+    for trial in range(trials):
+        directory = tempfile.mkdtemp(prefix="wal-check-")
+        try:
+            failures += [f"trial {trial}: {f}" for f in asyncio.run(run_trial(random.Random(seed * 100003 + trial),
+                                                                              directory, steps))]
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=30, help="random steps per trial")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    # The injected failures and torn records are logged by wal.py on purpose.
+    logging.getLogger("wal").setLevel(logging.CRITICAL)
+
+    failures = check(args.seed, args.trials, args.steps)
+    print(f"session log: {args.trials} trials x {args.steps} steps, "
+          + (f"{len(failures)} FAILED" if failures else "all recovered"))
+    for failure in failures[:10]:
+        print(f"  {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,230 @@
+import logging
+import time
 import numpy as np
-import faiss
-from typing import List, Dict, Any
+from collections import deque
+from typing import List, Dict, Any, Deque, Optional, Set, Tuple
 from models import Session
+from embedding_cache import EmbeddingCache
+from privacy import PrivacyEngine
+from profile_history import ProfileHistory
+from text_encoders import TextEncoder, MockEncoder, create_text_encoder
+from metrics import BATCH_SIZE, stage
+from vector_index import IndexConfig, VectorIndex, create_index, distance_to_score, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+# Raw session vectors are kept apart from profile vectors (which are partitioned by user_type).
+SESSION_PARTITION = "session"
+# Profile changes remembered for cache revalidation (see changes_since)
+CHANGE_LOG_SIZE = 4096
 
 class EmbeddingManager:
-    def __init__(self, dimension: int = 384):
+    def __init__(self, dimension: int = 384, initial_capacity: int = 1024,
+                 index_config: Optional[IndexConfig] = None, model_name: str = 'all-MiniLM-L6-v2',
+                 cache_size: int = 10000, cache_dir: Optional[str] = None,
+                 feature_weights: Optional[np.ndarray] = None, encoder_backend: str = "torch",
+                 text_encoder: Optional[TextEncoder] = None, privacy: Optional[PrivacyEngine] = None,
+                 history: Optional[ProfileHistory] = None):
         self.dimension = dimension
-        self.use_mock = False
-        self.model = None
-        
-        # Initialize Sentence Transformer
-        try:
-            from sentence_transformers import SentenceTransformer
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
-            self.dimension = self.model.get_sentence_embedding_dimension()
-        except ImportError:
-            print("Warning: sentence-transformers not found. Using Mock Embeddings.")
-            self.use_mock = True
-
-        # Initialize FAISS index
-        self.index = faiss.IndexFlatL2(self.dimension)
-        # Store metadata mapping: index_id -> info
+        self.model_name = model_name
+
+        # Text encoder (torch, ONNX or int8 ONNX; see text_encoders.py). It loads lazily,
+        # so `dimension` must match the model's output; load() verifies it.
+        self.encoder = text_encoder or create_text_encoder(encoder_backend, model_name, dimension)
+        self.use_mock = isinstance(self.encoder, MockEncoder)
+
+        # Repeated profile contexts (and the cold-start query) are served from cache, never re-encoded.
+        self.cache = EmbeddingCache(self.encoder.cache_name, max_entries=cache_size, disk_dir=cache_dir)
+
+        # Initialize FAISS indexes (Flat by default; IVF/HNSW selectable via IndexConfig)
+        # Profiles are partitioned by user_type so a mentor search only ever scans mentor vectors.
+        # A row is allocated once per user and then replaced in place,
+        # so the indexes never hold more than one profile vector per user.
+        self.index_config = index_config or IndexConfig()
+        # Optional differential-privacy stage: profile vectors are clipped and noised (and the
+        # user's epsilon budget charged) before they are stored. Queries are never noised.
+        self.privacy = privacy
+        # Optional profile history: every update is appended there (float16, with its timestamp)
+        # and the index holds the user's time-decayed aggregate instead of the latest vector.
+        self.history = history
+        # Per-dimension feature weights are folded into the stored vectors as sqrt(w) * v,
+        # so a plain inner product (or cosine, when normalized) over them is the weighted one.
+        self._feature_scale: Optional[np.ndarray] = None
+        if feature_weights is not None:
+            weights = np.asarray(feature_weights, dtype='float32').reshape(-1)
+            if len(weights) != self.dimension or (weights < 0).any():
+                raise ValueError(f"feature_weights must be {self.dimension} non-negative values")
+            self._feature_scale = np.sqrt(weights)
+        self.partitions: Dict[str, VectorIndex] = {}
+        # Store metadata mapping: row -> info (rows without metadata are free slots)
         self.metadata: Dict[int, Dict[str, Any]] = {}
         self.current_id = 0
 
+        # User Vector Store: user_id -> row, backed by a side array of the stored vectors
+        # so lookups are O(1) and never depend on index.reconstruct support.
+        self.user_rows: Dict[str, int] = {}
+        self._free_rows: List[int] = []
+        self._vectors = np.zeros((initial_capacity, self.dimension), dtype='float32')
+
+        # Postings for filterable profile attributes: (key, value) -> rows
+        self._attribute_rows: Dict[Tuple[str, str], Set[int]] = {}
+
+        # Change tracking for result caches: every profile upsert/removal bumps the epoch,
+        # stamps the user's version and is logged as (epoch, user_id, affected user_types).
+        self.epoch = 0
+        self._versions: Dict[str, int] = {}
+        self._changes: Deque[Tuple[int, str, Tuple[str, ...]]] = deque(maxlen=CHANGE_LOG_SIZE)
+
+    def _record_change(self, user_id: str, *user_types: str):
+        self.epoch += 1
+        self._versions[user_id] = self.epoch
+        self._changes.append((self.epoch, user_id, user_types))
+
+    def user_version(self, user_id: str) -> Optional[int]:
+        """Epoch of the user's last profile change (None if never seen)."""
+        return self._versions.get(user_id)
+
+    def changes_since(self, epoch: int) -> Optional[List[Tuple[str, Tuple[str, ...]]]]:
+        """
+        (user_id, user_types) for every profile change after `epoch`, oldest first,
+        or None if the log no longer reaches back that far.
+        """
+        changes = []
+        for changed_at, user_id, user_types in reversed(self._changes):
+            if changed_at <= epoch:
+                break
+            changes.append((user_id, user_types))
+        else:
+            if epoch < self.epoch - len(self._changes):
+                return None
+        changes.reverse()
+        return changes
+
     def _get_embedding(self, text: str) -> np.ndarray:
-        if self.use_mock or not self.model:
-            # Generate random vector for MVP demo if libs missing
-            return np.random.rand(self.dimension).astype('float32')
-        
-        return self.model.encode([text])[0]
+        return self.encode_batch([text])[0]
+
+    def prepare(self, vectors: np.ndarray, private: bool = False) -> np.ndarray:
+        """
+        Maps encoder output into index space in one batched pass: a single float32 copy,
+        privatized in place when `private` (and a privacy engine is set), then scaled by the
+        feature weights and L2-normalized when the index config asks for it.
+        Stored vectors (and get_user_vector) are already in index space.
+        """
+        prepared = np.array(vectors, dtype='float32', order='C', ndmin=2)
+        if private and self.privacy is not None:
+            self.privacy.privatize(prepared)
+        if self._feature_scale is not None:
+            prepared *= self._feature_scale
+        if self.index_config.normalize:
+            normalize_rows(prepared)
+        return prepared
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Encodes a text query into index space (see prepare)."""
+        return self.prepare(self._get_embedding(text))[0]
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Encodes many texts in one model call. Safe to run from a worker thread (see BatchingEncoder).
+        """
+        vectors = np.empty((len(texts), self.dimension), dtype='float32')
+        missing: Dict[str, List[int]] = {}
+        for i, (text, cached) in enumerate(zip(texts, self.cache.get_many(texts))):
+            if cached is not None:
+                vectors[i] = cached
+            else:
+                missing.setdefault(text, []).append(i)
+        if not missing:
+            return vectors
+
+        to_encode = list(missing)
+        BATCH_SIZE.observe(len(to_encode), "model")
+        with stage("model_inference"):
+            encoded = self.encoder.encode(to_encode)
+
+        for text, vector in zip(to_encode, encoded):
+            self.cache.put(text, vector)
+            vectors[missing[text]] = vector
+        return vectors
+
+    def _allocate_row(self) -> int:
+        """Returns a free row id, reusing slots released by remove_user."""
+        if self._free_rows:
+            return self._free_rows.pop()
+
+        row = self.current_id
+        self.current_id += 1
+        if row >= len(self._vectors):
+            # Also moves a memory-mapped snapshot into RAM on the first insert past it.
+            grown = np.zeros((max(1, len(self._vectors)) * 2, self.dimension), dtype='float32')
+            grown[:len(self._vectors)] = self._vectors
+            self._vectors = grown
+        return row
+
+    def _partition(self, name: str) -> VectorIndex:
+        if name not in self.partitions:
+            self.partitions[name] = create_index(self.dimension, self.index_config)
+        return self.partitions[name]
+
+    def _write_row(self, row: int, vector: np.ndarray, partition: str):
+        """Stores a vector at the given row, replacing any vector its partition held for it."""
+        vector_np = self.prepare(np.asarray(vector).reshape(1, self.dimension), private=True)
+        self._vectors[row] = vector_np[0]
+        self._partition(partition).upsert(np.array([row]), vector_np)
+
+    def _index_attributes(self, row: int, attributes: Dict[str, Any]):
+        for key, value in attributes.items():
+            if isinstance(value, (str, int, float, bool)):
+                self._attribute_rows.setdefault((key, str(value)), set()).add(row)
+
+    def _unindex_attributes(self, row: int, attributes: Dict[str, Any]):
+        for key, value in attributes.items():
+            rows = self._attribute_rows.get((key, str(value)))
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self._attribute_rows[(key, str(value))]
+
+    def _allowed_rows(self, filters: Optional[Dict[str, Any]],
+                      allow_user_ids: Optional[List[str]] = None) -> Optional[np.ndarray]:
+        """Rows passing the attribute filters and belonging to allow_user_ids (None: no restriction)."""
+        allow_rows = self._rows_matching(filters) if filters else None
+        if allow_user_ids is not None:
+            rows = np.fromiter((self.user_rows[u] for u in allow_user_ids if u in self.user_rows), dtype='int64')
+            allow_rows = rows if allow_rows is None else np.intersect1d(allow_rows, rows)
+        return allow_rows
+
+    def _rows_matching(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Rows whose profile attributes match every filter (intersection of postings)."""
+        postings = sorted((self._attribute_rows.get((key, str(value)), set()) for key, value in filters.items()), key=len)
+        rows = set(postings[0]).intersection(*postings[1:]) if postings else set()
+        return np.fromiter(rows, dtype='int64', count=len(rows))
 
     def generate_embeddings_for_session(self, session: Session):
         """
         Generates embedding for the session transcript and adds to FAISS.
         """
+        if self.privacy is not None and not self.privacy.charge([session.user_id])[0]:
+            return
         vector = self._get_embedding(session.transcript)
         
-        # Add to FAISS
-        # Note: FAISS expects a matrix (list of vectors)
-        vector_np = np.array([vector]).astype('float32')
-        self.index.add(vector_np)
+        row = self._allocate_row()
+        self._write_row(row, vector, SESSION_PARTITION)
         
         # Store metadata
-        self.metadata[self.current_id] = {
+        self.metadata[row] = {
             "session_id": session.session_id,
             "user_id": session.user_id,
             "user_type": session.user_type,
             "timestamp": session.timestamp
         }
-        self.current_id += 1
 
-    def search(self, query_text: str, k: int = 5) -> List[Dict[str, Any]]:
-        query_vector = self._get_embedding(query_text)
-        query_np = np.array([query_vector]).astype('float32')
-        
-        distances, indices = self.index.search(query_np, k)
-        
-        results = []
-        for i, idx in enumerate(indices[0]):
-            if idx != -1 and idx in self.metadata:
-                meta = self.metadata[idx]
-                results.append({
-                    "metadata": meta,
-                    "score": float(1 / (1 + distances[0][i])) # Convert parameters distance to similarity score
-                })
-        return results
+    def search(self, query_text: str, k: int = 5, **search_kwargs) -> List[Dict[str, Any]]:
+        query_vector = self.embed_query(query_text)
+        return self.search_by_vector(query_vector, k=k, **search_kwargs)
 
-    def update_user_embedding(self, user_id: str, context_text: str, user_type: str = "unknown"):
+    def update_user_embedding(self, user_id: str, context_text: str, user_type: str = "unknown",
+                              attributes: Optional[Dict[str, Any]] = None, timestamp: Optional[float] = None):
         """
         Updates (or overwrites) the embedding for a specific user based on their Profile Graph context.
         This aligns with the 'EV derived from PG' requirement.
@@ -76,62 +233,290 @@ class EmbeddingManager:
             return
 
         vector = self._get_embedding(context_text)
-        vector_np = np.array([vector]).astype('float32')
-
-        # FAISS IndexFlatL2 doesn't support "update" easily by ID without IDMap.
-        # For this MVP, we will simpler: We append the NEW vector and update the metadata pointer.
-        # Queries will find the *latest* vector because we can filter for the most recent index per user?
-        # NO, FAISS search returns everything. 
-        # Better approach for MVP: Rebuild index? No, too slow.
-        # We will just ADD it. And in search, we deduplicate by user_id, taking the one with highest score 
-        # (which technically might be an old state, but likely the new state if it matches better).
-        # OR: We maintain a separate dict for User Vectors for exact lookup, and FAISS for similarity.
-        # Let's just Add it. The 'Feature Store' versioning concept allows history.
-        
-        self.index.add(vector_np)
-        self.metadata[self.current_id] = {
-            "user_id": user_id,
-            "user_type": user_type,
-            "type": "profile_snapshot", # Distinguish from raw sessions
-            "type": "profile_snapshot", # Distinguish from raw sessions
-            "text_preview": context_text[:50] + "..."
-        }
-        self.current_id += 1
+        self.upsert_user_vector(user_id, vector, user_type=user_type, context_text=context_text,
+                                attributes=attributes, timestamp=timestamp)
+
+    def update_user_embeddings(self, profiles: List[Dict[str, Any]], batch_size: int = 256) -> int:
+        """
+        Bulk version of update_user_embedding.
+        Each profile is a dict with user_id, context_text, user_type and optional attributes and timestamp.
+        Contexts are encoded in batches of batch_size and added to the index in one call per partition.
+        Returns the number of users updated.
+        """
+        profiles = [p for p in profiles if p.get("context_text")]
+        if not profiles:
+            return 0
+
+        texts = [p["context_text"] for p in profiles]
+        vectors = np.concatenate([self.encode_batch(texts[i:i + batch_size])
+                                  for i in range(0, len(texts), batch_size)])
+        self.upsert_user_vectors(
+            [p["user_id"] for p in profiles], vectors,
+            user_types=[p.get("user_type", "unknown") for p in profiles],
+            context_texts=texts,
+            attributes=[p.get("attributes") for p in profiles],
+            timestamps=[p.get("timestamp") for p in profiles]
+        )
+        return len(profiles)
+
+    def upsert_user_vector(self, user_id: str, vector: np.ndarray, user_type: str = "unknown",
+                           context_text: str = "", attributes: Optional[Dict[str, Any]] = None,
+                           timestamp: Optional[float] = None):
+        """
+        Inserts or replaces the single profile vector held for a user.
+        Scalar attributes are stored as filterable metadata (see search_by_vector's filters).
+        """
+        self.upsert_user_vectors([user_id], np.asarray(vector).reshape(1, -1), user_types=[user_type],
+                                 context_texts=[context_text], attributes=[attributes], timestamps=[timestamp])
+
+    def upsert_user_vectors(self, user_ids: List[str], vectors: np.ndarray, user_types: List[str],
+                            context_texts: Optional[List[str]] = None,
+                            attributes: Optional[List[Optional[Dict[str, Any]]]] = None,
+                            timestamps: Optional[List[Optional[float]]] = None):
+        """
+        Batched upsert: bookkeeping per user, then one index upsert per partition.
+        Vectors are raw encoder output; they are prepared for the index once, as a batch.
+        If a user_id appears more than once, the last entry wins.
+        With a privacy engine, users whose epsilon budget is spent keep their stored vector.
+        With a history, the new vectors are appended there (at `timestamps`, epoch seconds,
+        default now) and each user's decayed aggregate is what gets indexed.
+        """
+        vectors = self.prepare(np.asarray(vectors).reshape(len(user_ids), self.dimension), private=True)
+        context_texts = context_texts or [""] * len(user_ids)
+        attributes = attributes or [None] * len(user_ids)
+        last = {user_id: i for i, user_id in enumerate(user_ids)}
+        released = self.privacy.charge(list(last)) if self.privacy is not None else np.ones(len(last), dtype=bool)
+
+        by_partition: Dict[str, Tuple[List[int], List[int]]] = {}
+        fresh: List[int] = []
+        for (user_id, i), allowed in zip(last.items(), released.tolist()):
+            user_type = user_types[i]
+            user_attributes = dict(attributes[i] or {})
+            row = self.user_rows.get(user_id)
+            if not allowed:
+                if row is None:
+                    logger.warning("Privacy budget spent for %s; profile not stored", user_id)
+                    continue
+                # No new release: re-store the vector already published for this user.
+                vectors[i] = self._vectors[row]
+            else:
+                fresh.append(i)
+            if row is None:
+                row = self._allocate_row()
+                self.user_rows[user_id] = row
+                self._record_change(user_id, user_type)
+            else:
+                previous = self.metadata[row]
+                if previous["user_type"] != user_type:
+                    # Role changed: move the vector to its new partition.
+                    self.partitions[previous["user_type"]].remove(np.array([row]))
+                    self._record_change(user_id, previous["user_type"], user_type)
+                else:
+                    self._record_change(user_id, user_type)
+                self._unindex_attributes(row, previous["attributes"])
+                # Attributes accumulate across sessions; newer values win.
+                user_attributes = {**previous["attributes"], **user_attributes}
+
+            self._index_attributes(row, user_attributes)
+            self.metadata[row] = {
+                "user_id": user_id,
+                "user_type": user_type,
+                "type": "profile_snapshot", # Distinguish from raw sessions
+                "text_preview": context_texts[i][:50] + "...",
+                "attributes": user_attributes
+            }
+            rows, positions = by_partition.setdefault(user_type, ([], []))
+            rows.append(row)
+            positions.append(i)
+
+        if self.history is not None and fresh:
+            with stage("history"):
+                now = time.time()
+                fresh_ids = [user_ids[i] for i in fresh]
+                self.history.append(fresh_ids, vectors[fresh],
+                                    [timestamps[i] if timestamps and timestamps[i] is not None else now for i in fresh])
+                aggregated = self.history.aggregate(fresh_ids)
+                if self.index_config.normalize:
+                    normalize_rows(aggregated)
+                vectors[fresh] = aggregated
+
+        with stage("index_add"):
+            for partition, (rows, positions) in by_partition.items():
+                rows_np = np.array(rows, dtype='int64')
+                self._vectors[rows_np] = vectors[positions]
+                self._partition(partition).upsert(rows_np, vectors[positions])
+
+    def remove_user(self, user_id: str) -> bool:
+        """
+        Drops a user's profile vector and releases its row for reuse.
+        """
+        row = self.user_rows.pop(user_id, None)
+        if row is None:
+            return False
+
+        meta = self.metadata.pop(row)
+        self._record_change(user_id, meta["user_type"])
+        self.partitions[meta["user_type"]].remove(np.array([row]))
+        self._unindex_attributes(row, meta["attributes"])
+        if self.history is not None:
+            self.history.remove(user_id)
+        self._vectors[row] = 0.0
+        self._free_rows.append(row)
+        return True
+
+    def profile_rows(self, user_type: str) -> Tuple[List[str], np.ndarray]:
+        """(user_ids, rows) of every profile of the given user_type."""
+        pairs = [(user_id, row) for user_id, row in self.user_rows.items()
+                 if self.metadata[row]["user_type"] == user_type]
+        return [user_id for user_id, _ in pairs], np.array([row for _, row in pairs], dtype='int64')
 
     def get_user_vector(self, user_id: str) -> Optional[np.ndarray]:
         """
-        Retrieves the latest embedding vector for a given user.
-        """
-        # Linear scan backwards to find the latest snapshot
-        for i in range(self.current_id - 1, -1, -1):
-            if i in self.metadata:
-                meta = self.metadata[i]
-                if meta['user_id'] == user_id and meta.get('type') == 'profile_snapshot':
-                    # Retrieve vector from index
-                    # FAISS IndexFlatL2 supports direct access via reconstruct if enabled, 
-                    # but standard index might not. 
-                    # For MVP with FlatL2, we can usually use `reconstruct`.
-                    try:
-                        return self.index.reconstruct(i)
-                    except:
-                        # If reconstruct not supported (rare for FlatL2), we'd need to store side-vectors.
-                        # For now, assume it works or we should have stored it.
-                        pass
-        return None
-
-    def search_by_vector(self, query_vector: np.ndarray, k: int = 5) -> List[Dict[str, Any]]:
-        """
-        Searches the index using a pre-computed vector.
-        """
-        query_np = np.array([query_vector]).astype('float32')
-        distances, indices = self.index.search(query_np, k)
+        Retrieves the latest embedding vector for a given user (in index space,
+        so it can be passed straight back to search_by_vector).
+        """
+        row = self.user_rows.get(user_id)
+        if row is None:
+            return None
+        return self._vectors[row].copy()
+
+    def similarity(self, query_vector: np.ndarray, rows: List[int]) -> np.ndarray:
+        """Scores of the stored vectors at `rows` for an index-space query, as the searches report them."""
+        vectors = self._vectors[rows]
+        if self.index_config.metric == "ip":
+            return vectors @ np.asarray(query_vector, dtype='float32')
+        return distance_to_score(((vectors - query_vector) ** 2).sum(axis=1), "l2")
+
+    # Fields captured in snapshots (see persistence.py); vectors are written separately as raw float32.
+    _STATE_FIELDS = ("dimension", "index_config", "partitions", "metadata", "current_id",
+                     "user_rows", "_free_rows", "_attribute_rows", "_feature_scale")
+
+    def export_state(self) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Returns (vectors for all allocated rows, picklable index/metadata state)."""
+        state = {field: getattr(self, field) for field in self._STATE_FIELDS}
+        # Spent privacy budgets must survive restarts, or users could be released again for free.
+        state["privacy_spent"] = dict(self.privacy.spent) if self.privacy is not None else {}
+        state["history"] = self.history.export_state() if self.history is not None else None
+        return self._vectors[:self.current_id], state
+
+    def restore_state(self, vectors: np.ndarray, state: Dict[str, Any]):
+        """
+        Replaces all vectors, indexes and metadata with a snapshot.
+        `vectors` may be a read-only or copy-on-write np.memmap; it is only copied
+        into memory once the store has to grow past it.
+        """
+        if state["dimension"] != self.dimension:
+            raise ValueError(f"Snapshot dimension {state['dimension']} does not match model dimension {self.dimension}")
+        for field in self._STATE_FIELDS:
+            setattr(self, field, state[field])
+        self._vectors = vectors
+        for index in self.partitions.values():
+            index.restore_vectors(vectors)
+        if self.privacy is not None:
+            self.privacy.spent = dict(state["privacy_spent"])
+        if self.history is not None:
+            self.history.restore_state(state["history"])
+            if state["history"] is None and self.user_rows:
+                # History was disabled when the snapshot was taken: start each user's history from
+                # their stored vector.
+                user_ids = list(self.user_rows)
+                self.history.append(user_ids, self._vectors[[self.user_rows[u] for u in user_ids]],
+                                    [time.time()] * len(user_ids))
+        # Everything may have changed: drop the change log so cached results revalidate as stale.
+        self._changes.clear()
+        self.epoch += 1
+        self._versions = {user_id: self.epoch for user_id in self.user_rows}
+
+    def search_by_vector(self, query_vector: np.ndarray, k: int = 5, user_type: Optional[str] = None,
+                         exclude_user_ids: Optional[List[str]] = None,
+                         filters: Optional[Dict[str, Any]] = None,
+                         allow_user_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Searches the index using a pre-computed index-space vector (see prepare).
+        user_type restricts the search to that role's partition (all partitions if None);
+        exclude_user_ids, attribute filters and an allow_user_ids candidate set are applied
+        inside FAISS, so up to k hits come back without over-fetching.
+        """
+        query_np = np.asarray(query_vector, dtype='float32').reshape(1, self.dimension)
+        names = [user_type] if user_type is not None else list(self.partitions)
+        with stage("filter"):
+            allow_rows = self._allowed_rows(filters, allow_user_ids)
+            exclude_rows = np.array([self.user_rows[u] for u in exclude_user_ids or [] if u in self.user_rows],
+                                    dtype='int64')
+
+        hits = []
+        with stage("index_search"):
+            for name in names:
+                index = self.partitions.get(name)
+                if index is None or len(index) == 0:
+                    continue
+                distances, rows = index.search(query_np, k, allow_rows=allow_rows, exclude_rows=exclude_rows)
+                hits.extend(zip(distances[0].tolist(), rows[0].tolist()))
+        hits.sort(key=lambda hit: hit[0])
         
         results = []
-        for i, idx in enumerate(indices[0]):
+        for distance, idx in hits:
             if idx != -1 and idx in self.metadata:
                 meta = self.metadata[idx]
                 results.append({
                     "metadata": meta,
-                    "score": float(1 / (1 + distances[0][i]))
+                    "score": float(distance_to_score(distance, self.index_config.metric))
                 })
+                if len(results) >= k:
+                    break
+        return results
+
+    def search_by_vectors(self, query_vectors: np.ndarray, k: int = 5, user_type: Optional[str] = None,
+                          exclude_user_ids: Optional[List[List[str]]] = None,
+                          filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Batch version of search_by_vector: one FAISS search per partition for all queries.
+        exclude_user_ids holds one list per query (e.g. the requester itself); since the
+        exclusions differ per row they are over-fetched and masked out with NumPy rather
+        than through a shared IDSelector. Filters are shared by all queries.
+        """
+        queries = np.ascontiguousarray(query_vectors, dtype='float32').reshape(-1, self.dimension)
+        n = len(queries)
+        names = [user_type] if user_type is not None else list(self.partitions)
+        with stage("filter"):
+            allow_rows = self._rows_matching(filters) if filters else None
+
+            # Per-query excluded rows, padded into an (n, m) matrix with -2 (never a row id or miss).
+            excluded = [[self.user_rows[u] for u in ids if u in self.user_rows] for ids in exclude_user_ids or [[]] * n]
+            width = max((len(rows) for rows in excluded), default=0)
+            exclude_matrix = np.full((n, max(width, 1)), -2, dtype='int64')
+            for i, rows in enumerate(excluded):
+                exclude_matrix[i, :len(rows)] = rows
+
+        distances, rows = [], []
+        with stage("index_search"):
+            for name in names:
+                index = self.partitions.get(name)
+                if index is None or len(index) == 0:
+                    continue
+                d, r = index.search(queries, k + width, allow_rows=allow_rows)
+                distances.append(d)
+                rows.append(r)
+        if not rows:
+            return [[] for _ in range(n)]
+        distances = np.concatenate(distances, axis=1)
+        rows = np.concatenate(rows, axis=1)
+
+        # Drop misses and excluded rows, then keep the k nearest per query across partitions.
+        dropped = (rows < 0) | (rows[:, :, None] == exclude_matrix[:, None, :]).any(axis=2)
+        distances = np.where(dropped, np.inf, distances)
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        distances = np.take_along_axis(distances, order, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        scores = distance_to_score(distances, self.index_config.metric)
+
+        results = []
+        for i in range(n):
+            hits = []
+            for distance, row, score in zip(distances[i].tolist(), rows[i].tolist(), scores[i].tolist()):
+                if distance == np.inf:
+                    break
+                if row in self.metadata:
+                    hits.append({"metadata": self.metadata[row], "score": score})
+            results.append(hits)
         return results
@@ -0,0 +1,108 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from metrics import BATCH_SIZE
+
+
+class BatchingEncoder:
+    """
+    Coalesces encode requests from concurrent handlers into micro-batches.
+
+    Texts are queued by `encode()`; a dispatcher drains the queue into batches of up to
+    `max_batch_size`, waiting at most `max_wait_ms` for a batch to fill, and runs the model
+    in a worker pool so the event loop keeps serving /health and /match during inference.
+    While every worker is busy, new requests keep accumulating into the next batch.
+    """
+
+    def __init__(self, encode_batch: Callable[[List[str]], np.ndarray], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, workers: int = 1, executor: Optional[Executor] = None):
+        self._encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.workers = workers
+        # Thread pool by default: the transformer forward pass releases the GIL.
+        self._executor = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix="encoder")
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        # Running batches: the loop only keeps weak references to tasks, so hold them until done.
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _ensure_started(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.workers)
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Encodes a single text as part of whatever batch it lands in."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def encode_many(self, texts: List[str], chunk_size: int = 256) -> np.ndarray:
+        """
+        Encodes a large list of texts (bulk ingest) in chunks of chunk_size.
+        Chunks bypass the coalescing queue but still take a worker slot, so bulk jobs
+        share the pool with interactive requests instead of starving them.
+        """
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        chunks = []
+        for start in range(0, len(texts), chunk_size):
+            async with self._slots:
+                chunks.append(await loop.run_in_executor(self._executor, self._encode_batch,
+                                                         texts[start:start + chunk_size]))
+        return np.concatenate(chunks) if chunks else np.empty((0, 0), dtype='float32')
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            task = loop.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            # Identical texts in one batch (common for profile contexts) are encoded once.
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            BATCH_SIZE.observe(len(texts), "encoder")
+            vectors = await asyncio.get_running_loop().run_in_executor(self._executor, self._encode_batch, texts)
+            by_text = dict(zip(texts, vectors))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        # Let dispatched batches finish, so their callers get their vectors.
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False)
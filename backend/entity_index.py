@@ -0,0 +1,135 @@
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+UNKNOWN_ROLE = "unknown"
+
+
+def entity_key(label: str, text: str) -> str:
+    """Same "Label: text" form as the user context strings."""
+    return f"{label}: {text}"
+
+
+class EntityIndex:
+    """
+    Inverted index from Profile Graph entities ("Goal: Leadership Skills") to users.
+
+    Maintained incrementally by GraphBuilder.process_session: a user is added to an entity's
+    posting list the first time the entity appears in their graph. Users get dense integer ids
+    and postings are append-only int32 arrays kept per role (user_type), so a mentor search
+    reads only mentor postings and scoring is one NumPy scatter-add per query entity.
+
+    Scores are IDF-weighted overlap: the sum of log(1 + users / df) over shared entities,
+    divided by the same sum over the query's entities, so a candidate sharing every entity
+    scores 1. Users restored from snapshots that predate the index have an unknown role until
+    their next session; role searches include them (the caller checks roles against the
+    vector store).
+    """
+
+    def __init__(self):
+        self.user_ids: List[str] = []
+        self._user_index: Dict[str, int] = {}
+        self._user_roles: List[str] = []
+        self._user_entities: List[List[str]] = []
+        # role -> entity -> uids
+        self._postings: Dict[str, Dict[str, array]] = {}
+        # entity -> users holding it, over all roles
+        self._df: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def _uid(self, user_id: str) -> int:
+        uid = self._user_index.get(user_id)
+        if uid is None:
+            uid = self._user_index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            self._user_roles.append(UNKNOWN_ROLE)
+            self._user_entities.append([])
+        return uid
+
+    def set_role(self, user_id: str, role: str):
+        """Records the user's role; on a role change their postings move to the new role (rare, O(postings))."""
+        uid = self._uid(user_id)
+        previous = self._user_roles[uid]
+        if previous == role:
+            return
+        self._user_roles[uid] = role
+        for entity in self._user_entities[uid]:
+            self._postings[previous][entity].remove(uid)
+            self._postings.setdefault(role, {}).setdefault(entity, array('i')).append(uid)
+
+    def add(self, user_id: str, entity: str) -> bool:
+        """Adds user_id to the entity's postings; False if it was already there."""
+        uid = self._uid(user_id)
+        entities = self._user_entities[uid]
+        if entity in entities:
+            return False
+        entities.append(entity)
+        self._postings.setdefault(self._user_roles[uid], {}).setdefault(entity, array('i')).append(uid)
+        self._df[entity] = self._df.get(entity, 0) + 1
+        return True
+
+    def entities(self, user_id: str) -> List[str]:
+        uid = self._user_index.get(user_id)
+        return list(self._user_entities[uid]) if uid is not None else []
+
+    def idf(self, entity: str) -> float:
+        df = self._df.get(entity)
+        return math.log(1 + len(self.user_ids) / df) if df else 0.0
+
+    def search(self, entities: Sequence[str], k: int, role: Optional[str] = None,
+               exclude_user_ids: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """
+        Top-k (user_id, score) sharing at least one of `entities`, best first.
+        `role` keeps users of that role (and of unknown role); ties keep the order users were first seen.
+        """
+        entities = [e for e in dict.fromkeys(entities) if self._df.get(e)]
+        if not entities or k <= 0:
+            return []
+        roles = list(self._postings) if role is None else [role, UNKNOWN_ROLE]
+        scores = np.zeros(len(self.user_ids), dtype='float32')
+        total = 0.0
+        for entity in entities:
+            weight = self.idf(entity)
+            total += weight
+            for name in roles:
+                postings = self._postings.get(name, {}).get(entity)
+                if postings:
+                    scores[np.frombuffer(postings, dtype=np.int32)] += weight
+        for user_id in exclude_user_ids:
+            uid = self._user_index.get(user_id)
+            if uid is not None:
+                scores[uid] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            # Best k by score, ties broken by uid; partition keeps this linear in the candidates
+            # (a few distinct entities can leave most users tied).
+            candidate_scores = scores[candidates]
+            kth = np.partition(candidate_scores, len(candidates) - k)[len(candidates) - k]
+            better = candidates[candidate_scores > kth]
+            tied = candidates[candidate_scores == kth][:k - len(better)]
+            candidates = np.concatenate([better, tied])
+        order = np.lexsort((candidates, -scores[candidates]))
+        return [(self.user_ids[uid], float(scores[uid] / total)) for uid in candidates[order].tolist()]
+
+    def search_user(self, user_id: str, k: int, role: Optional[str] = None,
+                    exclude_user_ids: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """search() with the entities of user_id's own graph, excluding the user."""
+        return self.search(self.entities(user_id), k, role=role, exclude_user_ids=[user_id, *exclude_user_ids])
+
+    def export_state(self) -> Dict[str, Any]:
+        return {"user_ids": self.user_ids, "user_roles": self._user_roles, "user_entities": self._user_entities,
+                "postings": self._postings, "df": self._df}
+
+    def restore_state(self, state: Dict[str, Any]):
+        """Replaces the contents in place, so holders of this index (MatchingEngine) see the restore."""
+        self.user_ids = state["user_ids"]
+        self._user_index = {user_id: uid for uid, user_id in enumerate(self.user_ids)}
+        self._user_roles = state["user_roles"]
+        self._user_entities = state["user_entities"]
+        self._postings = state["postings"]
+        self._df = state["df"]
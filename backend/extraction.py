@@ -0,0 +1,127 @@
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+# Keyword rules for the heuristic Profile Graph extractor.
+# A keyword matches whole words only; a trailing '*' also matches any word it prefixes
+# ("learn*" -> learn, learning, learned). Multi-word keywords tolerate any whitespace.
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {"label": "Goal", "text": "Improve Skills", "keywords": ["improve*", "learn*"]},
+    {"label": "Sentiment", "text": "Anxious", "keywords": ["stress*", "anxious", "anxiety"]},
+    {"label": "Constraint", "text": "Time Constraints", "keywords": ["time", "busy", "schedul*"]},
+    {"label": "Goal", "text": "Job Search / Career Growth", "keywords": ["job", "jobs", "hiring", "career*"]},
+    {"label": "Goal", "text": "Startup Fundraising & Scaling", "keywords": ["fundraising", "investor*", "scale", "scaling"]},
+    {"label": "Goal", "text": "Leadership Skills", "keywords": ["leadership", "management"]},
+    {"label": "Interest", "text": "AI & Data Science", "keywords": ["ai", "ml", "data"]},
+]
+
+
+def _normalize(keyword: str) -> str:
+    return " ".join(keyword.lower().split())
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Compiles words into a trie-shaped regex ("data|database" -> "data(?:base)?").
+    Python's re tries alternatives one by one, so a flat alternation of thousands of
+    keywords is slow; the trie shares prefixes and keeps matching close to one pass per position.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def walk(node: Dict[str, Any]) -> str:
+        branches = [(r"\s+" if ch == " " else re.escape(ch)) + walk(child)
+                    for ch, child in sorted(node.items()) if ch != ""]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return f"(?:{body})?" if len(branches) > 1 or len(body) > 1 else f"{body}?"
+        return body
+
+    return walk(trie)
+
+
+class EntityExtractor:
+    """
+    Single-pass, data-driven keyword extractor.
+    All rule keywords are compiled into one word-boundary regex, so each transcript is
+    scanned once regardless of how many rules are loaded. Overlapping keywords all match.
+    """
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self._exact: Dict[str, List[int]] = {}
+        self._prefix: Dict[str, List[int]] = {}
+        for i, rule in enumerate(self.rules):
+            for keyword in rule["keywords"]:
+                if keyword.endswith("*"):
+                    self._prefix.setdefault(_normalize(keyword[:-1]), []).append(i)
+                else:
+                    self._exact.setdefault(_normalize(keyword), []).append(i)
+
+        # Matching happens inside lookaheads, which consume nothing, so it is tried at every word
+        # start, including those inside a longer match ("management" in "time management").
+        # Where an exact keyword matches, a prefix keyword starting at the same word is tried too
+        # ("time" and "time manag*").
+        exact = rf"(?=(?P<exact>{_trie_pattern(self._exact)})\b)" if self._exact else None
+        prefix = _trie_pattern(self._prefix) if self._prefix else None
+        # Group name per capturing group, in order (the "extended" one holds a prefix keyword too)
+        self._groups: List[str] = []
+        self._pattern = None
+        if exact and prefix:
+            self._groups = ["exact", "prefix", "prefix"]
+            self._pattern = re.compile(rf"\b(?:{exact}(?=(?P<extended>{prefix}))?|(?=(?P<prefix>{prefix})))")
+        elif exact or prefix:
+            self._groups = ["exact" if exact else "prefix"]
+            self._pattern = re.compile(r"\b" + (exact or rf"(?=(?P<prefix>{prefix}))"))
+        self._memo: Dict[tuple, frozenset] = {}
+
+    @classmethod
+    def from_config(cls, path: str) -> "EntityExtractor":
+        """Loads rules from a JSON file: a list of {"label", "text", "keywords"} objects."""
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def extract(self, text: str) -> List[Dict[str, str]]:
+        """Returns one {"label", "text"} entity per matching rule, in rule order."""
+        if self._pattern is None:
+            return []
+
+        matched = set()
+        seen = set()
+        for m in self._pattern.finditer(text.lower()):
+            for group, phrase in zip(self._groups, m.groups()):
+                if phrase is None or (group, phrase) in seen:
+                    continue
+                seen.add((group, phrase))
+                matched |= self._rules_for(group, phrase)
+            if len(matched) == len(self.rules):
+                break
+
+        return [{"label": self.rules[i]["label"], "text": self.rules[i]["text"]} for i in sorted(matched)]
+
+    def _rules_for(self, group: str, phrase: str) -> frozenset:
+        """
+        Every rule the matched phrase satisfies. The regex reports only the longest keyword
+        starting at each word, so shorter keywords it starts with ("learn*" inside "learning",
+        "time" inside "time management") are looked up here; keywords starting at a later word
+        of the phrase get a match of their own. Memoized: phrases are bounded by the keyword set.
+        """
+        key = (group, phrase)
+        rules = self._memo.get(key)
+        if rules is None:
+            phrase = " ".join(phrase.split())
+            found = set(self._exact[phrase]) if group == "exact" else set()
+            for i in range(1, len(phrase) + 1):
+                head = phrase[:i]
+                if head in self._prefix:
+                    found.update(self._prefix[head])
+                if i < len(phrase) and phrase[i] == " " and head in self._exact:
+                    found.update(self._exact[head])
+            rules = self._memo[key] = frozenset(found)
+        return rules
@@ -100,33 +100,39 @@ def main():
     
     # Clear existing? No, just append. User said "around 50".
     
-    total = 0
+    sessions = []
     
     # Generate 25 Mentors (5 base personas * 5 variations)
     for i in range(5):
         for p in mentor_personas:
             data = generate_variation(p, i)
             data["user_type"] = "mentor" # Force type to be safe
-            try:
-                requests.post(f"{BASE_URL}/session", json=data)
-                print(f"[\u2713] Created {data['user_id']}")
-                total += 1
-            except Exception as e:
-                print(f"[X] Failed {data['user_id']}: {e}")
+            sessions.append(data)
 
     # Generate 25 Mentees (5 base personas * 5 variations)
     for i in range(5):
         for p in mentee_personas:
             data = generate_variation(p, i)
             data["user_type"] = "mentee" # Force type
-            try:
-                requests.post(f"{BASE_URL}/session", json=data)
-                print(f"[\u2713] Created {data['user_id']}")
-                total += 1
-            except Exception as e:
-                print(f"[X] Failed {data['user_id']}: {e}")
+            sessions.append(data)
 
-    print(f"\nSuccessfully populated {total} rich persona profiles.")
+    # One bulk request instead of one POST per transcript
+    try:
+        resp = requests.post(f"{BASE_URL}/sessions/bulk", json={"sessions": sessions})
+        resp.raise_for_status()
+        result = resp.json()
+    except Exception as e:
+        print(f"[X] Bulk ingest failed: {e}")
+        return
+
+    failed = {err["index"]: err["error"] for err in result["errors"]}
+    for i, data in enumerate(sessions):
+        if i in failed:
+            print(f"[X] Failed {data['user_id']}: {failed[i]}")
+        else:
+            print(f"[\u2713] Created {data['user_id']}")
+
+    print(f"\nSuccessfully populated {result['processed']} rich persona profiles.")
 
 if __name__ == "__main__":
     main()
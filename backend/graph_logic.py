@@ -1,100 +1,174 @@
-import networkx as nx
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, Optional, Set, Tuple
 from models import Session, UserGraph, Node, Edge
-import uuid
+from extraction import EntityExtractor
+from graph_store import GraphStore, NetworkXGraphStore, create_graph_store
+from entity_index import EntityIndex, entity_key
+from metrics import timed
 
 class GraphBuilder:
-    def __init__(self):
-        # In-memory graph storage: user_id -> nx.Graph
-        self.graphs: Dict[str, nx.Graph] = {}
+    def __init__(self, extractor: Optional[EntityExtractor] = None, max_session_nodes: Optional[int] = None,
+                 backend: Optional[str] = None, store: Optional[GraphStore] = None):
+        # Per-user Profile Graph storage: NetworkX graphs by default, or the compact array-backed
+        # store for large user counts (see graph_store.py). Both produce identical output.
+        self.store = store or create_graph_store(backend)
+        self.extractor = extractor or EntityExtractor()
+        # Optional cap on Session nodes kept per user; older ones are pruned but their
+        # mentions stay counted on the entity nodes. None keeps the full history.
+        self.max_session_nodes = max_session_nodes
 
-    def _get_or_create_graph(self, user_id: str) -> nx.Graph:
-        if user_id not in self.graphs:
-            self.graphs[user_id] = nx.MultiDiGraph()
-        return self.graphs[user_id]
+        # Cached context strings; a user's context is only rebuilt when a new
+        # distinct entity marks it dirty.
+        self._contexts: Dict[str, str] = {}
+        self._dirty: Set[str] = set()
+        # Users in first-seen order, so graph pages are O(page size) to slice
+        self._user_order: List[str] = []
+        # Entity -> users postings for lexical retrieval (see entity_index.py), updated per session
+        self.entity_index = EntityIndex()
+        # Session log offsets of the sessions applied since the last snapshot checkpoint, so a replay
+        # after restoring that snapshot skips the ones it already contains. None (not tracked) unless
+        # a SnapshotManager with a session log owns this builder; it trims the set at each capture.
+        self.logged_offsets: Optional[Set[int]] = None
 
-    def process_session(self, session: Session):
+    @property
+    def graphs(self) -> Dict[str, Any]:
+        """user_id -> nx.MultiDiGraph (NetworkX backend only)."""
+        if not isinstance(self.store, NetworkXGraphStore):
+            raise AttributeError("graphs is only available with the networkx graph backend")
+        return self.store.graphs
+
+    @timed("graph_update")
+    def process_session(self, session: Session, log_offset: Optional[int] = None) -> bool:
         """
         Parses the session transcript to extract nodes and edges.
         In a real system, this would call an LLM.
         For MVP, we use simple keyword heuristics or simulated extraction.
+        Entities are deduplicated per user: a repeated mention bumps the entity's
+        mention count and edge weight instead of adding a node.
+        `log_offset` is the session's offset in the session log: a session already applied
+        under it is skipped (returns False), so replay never counts its mentions twice.
         """
-        G = self._get_or_create_graph(session.user_id)
+        if log_offset is not None and self.logged_offsets is not None:
+            if log_offset in self.logged_offsets:
+                return False
+            self.logged_offsets.add(log_offset)
+        user_id = session.user_id
+        if user_id not in self.store:
+            self._dirty.add(user_id)
+            self._user_order.append(user_id)
         
         # 1. Add Session Node
-        G.add_node(session.session_id, label="Session", timestamp=session.timestamp)
+        self.store.add_session(user_id, session.session_id, session.timestamp)
         
         # 2. Extract Entities (Simulated/Heuristic)
-        # We'll extract "Goal" if we see words like "want to", "goal", "aim"
-        text = session.transcript.lower()
-        
-        # Simple extraction logic for MVP demo
-        entities = []
-        if "improve" in text or "learn" in text:
-            entities.append({"label": "Goal", "text": "Improve Skills"})
-        if "stress" in text or "anxious" in text:
-            entities.append({"label": "Sentiment", "text": "Anxious"})
-        if "time" in text or "busy" in text or "schedule" in text:
-            entities.append({"label": "Constraint", "text": "Time Constraints"})
-        if "job" in text or "hiring" in text or "career" in text:
-             entities.append({"label": "Goal", "text": "Job Search / Career Growth"})
-        if "fundraising" in text or "investor" in text or "scale" in text:
-             entities.append({"label": "Goal", "text": "Startup Fundraising & Scaling"})
-        if "leadership" in text or "management" in text:
-             entities.append({"label": "Goal", "text": "Leadership Skills"})
-        if "ai" in text or "ml" in text or "data" in text:
-             entities.append({"label": "Interest", "text": "AI & Data Science"})
+        # Keyword rules are compiled into one word-boundary regex (see extraction.py),
+        # so the transcript is scanned once however many rules are loaded.
+        entities = self.extractor.extract(session.transcript)
             
-        # Add nodes and edges to graph
+        # Add nodes and edges to graph (Session -> Entity)
+        self.entity_index.set_role(user_id, session.user_type)
         for entity in entities:
-            node_id = f"{entity['label']}_{uuid.uuid4().hex[:8]}"
-            G.add_node(node_id, label=entity['label'], text=entity['text'])
-            # Edge from Session to Entity
-            G.add_edge(session.session_id, node_id, relation="MENTIONS", weight=1.0)
+            if self.store.add_mention(user_id, session.session_id, entity['label'], entity['text']):
+                self._dirty.add(user_id)
+                self.entity_index.add(user_id, entity_key(entity['label'], entity['text']))
+
+        if self.max_session_nodes is not None:
+            self.store.prune_sessions(user_id, self.max_session_nodes)
+        return True
+
+    def process_sessions(self, sessions: List[Session],
+                         log_offsets: Optional[List[int]] = None) -> Tuple[Dict[str, str], Dict[int, str]]:
+        """
+        Bulk version of process_session.
+        Returns (affected users as user_id -> latest user_type, errors keyed by position in `sessions`).
+        A failing session is reported and skipped; the rest of the batch is still applied.
+        Sessions skipped as already applied still count as affected: the snapshot that holds them may
+        have been taken before their user's vector was rebuilt.
+        """
+        affected: Dict[str, str] = {}
+        errors: Dict[int, str] = {}
+        for i, session in enumerate(sessions):
+            try:
+                self.process_session(session, log_offsets[i] if log_offsets is not None else None)
+            except Exception as e:
+                errors[i] = str(e)
+                continue
+            affected[session.user_id] = session.user_type
+        return affected, errors
 
     def get_graph_data(self, user_id: Optional[str] = None) -> Dict[str, Any]:
         """Returns the graph data in a JSON-serializable format."""
         if user_id:
-             if user_id in self.graphs:
-                 return nx.node_link_data(self.graphs[user_id])
+             if user_id in self.store:
+                 return self.store.node_link_data(user_id)
              else:
                  return {"error": "User not found"}
         
-        # Return all graphs
-        all_data = {}
-        for uid, G in self.graphs.items():
-            all_data[uid] = nx.node_link_data(G)
-        return all_data
+        # Return all graphs (unbounded; prefer get_graph_page / iter_graph_data for large deployments)
+        return dict(self.iter_graph_data())
+
+    def get_graph_page(self, cursor: int = 0, limit: int = 100) -> Tuple[Dict[str, Any], Optional[int]]:
+        """
+        One page of user graphs in first-seen order.
+        Returns (user_id -> graph data, cursor of the next page or None at the end).
+        Users are only ever appended, so a cursor stays valid while new users arrive.
+        """
+        user_ids = self._user_order[cursor:cursor + limit]
+        page = {uid: self.store.node_link_data(uid) for uid in user_ids}
+        next_cursor = cursor + len(user_ids)
+        return page, (next_cursor if next_cursor < len(self._user_order) else None)
+
+    def iter_graph_data(self, cursor: int = 0) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yields (user_id, graph data) one user at a time, starting at cursor."""
+        for i in range(cursor, len(self._user_order)):
+            user_id = self._user_order[i]
+            yield user_id, self.store.node_link_data(user_id)
+
+    def user_count(self) -> int:
+        return len(self._user_order)
+
+    def export_state(self) -> Dict[str, Any]:
+        """Picklable Profile Graph state for snapshots (the extractor is configuration, not state)."""
+        return {"store": self.store, "contexts": self._contexts, "dirty": self._dirty, "user_order": self._user_order,
+                "entity_index": self.entity_index.export_state(),
+                "logged_offsets": set(self.logged_offsets) if self.logged_offsets is not None else None}
 
+    def restore_state(self, state: Dict[str, Any]):
+        self.store = state["store"]
+        self._contexts = state["contexts"]
+        self._dirty = state["dirty"]
+        self._user_order = state["user_order"]
+        self.entity_index.restore_state(state["entity_index"])
+        if self.logged_offsets is not None:
+            # (None in the snapshot if it was taken without a session log)
+            self.logged_offsets = set(state["logged_offsets"] or ())
+
+    def forget_logged_before(self, offset: int):
+        """Drops logged offsets before a snapshot checkpoint: replay never starts before it again."""
+        if self.logged_offsets:
+            self.logged_offsets = {o for o in self.logged_offsets if o >= offset}
+
+    @timed("context_build")
     def get_user_context(self, user_id: str) -> str:
         """
         Retrieves a text representation of the User's Profile Graph.
-        Aggregates all node labels and texts to form the 'User State'.
-        Also includes the latest session transcript to ensure dense embeddings.
+        Aggregates the distinct entity labels and texts to form the 'User State'.
+        Cached per user and only rebuilt after a new entity appears, so the cost is
+        bounded by distinct entities rather than by the number of sessions.
         """
-        if user_id not in self.graphs:
+        if user_id not in self.store:
             return ""
-        
-        G = self.graphs[user_id]
-        context_parts = []
+        if user_id not in self._dirty:
+            return self._contexts[user_id]
         
         # 1. Add Graph Nodes (Long-term memory)
-        for node_id, data in G.nodes(data=True):
-            label = data.get('label', 'Unknown')
-            text = data.get('text', '')
-            if label != "Session": 
-                context_parts.append(f"{label}: {text}")
+        context_parts = [f"{label}: {text}" for label, text in self.store.entities(user_id)]
 
-        # 2. Flatten relevant session history (or just the latest)??
-        # The AI Hive "EV" is derived from the graph. 
-        # Since we added "Goal" nodes, that should be enough.
-        # But if the graph is empty (cold start), we should fallback to session usage.
-        
-        if not context_parts:
-             # Try to find the latest session node
-             session_nodes = [n for n, d in G.nodes(data=True) if d.get('label') == 'Session']
-             # (This is a simplified check, ideally sort by timestamp)
-             if session_nodes:
-                 context_parts.append("New User History: (Processing...)") # Placeholder
+        # 2. The AI Hive "EV" is derived from the graph.
+        # But if the graph has no entities yet (cold start), we fall back to a session placeholder.
+        if not context_parts and self.store.session_count(user_id):
+            context_parts.append("New User History: (Processing...)") # Placeholder
         
-        return ". ".join(context_parts)
+        context = ". ".join(context_parts)
+        self._contexts[user_id] = context
+        self._dirty.discard(user_id)
+        return context
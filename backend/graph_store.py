@@ -0,0 +1,308 @@
+import networkx as nx
+from array import array
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+# node_link_data renamed "links" to "edges" in NetworkX 3.4; match whichever is installed.
+_EDGES_KEY = "edges" if "edges" in nx.node_link_data(nx.MultiDiGraph()) else "links"
+_EPOCH = datetime(1970, 1, 1)
+
+
+class GraphStore:
+    """
+    Storage backend behind GraphBuilder: per-user Session -> entity graphs.
+    Entities are canonical per user (one node per distinct label/text); repeated
+    mentions bump counts and edge weights instead of adding nodes.
+    """
+
+    def __contains__(self, user_id: str) -> bool:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def user_ids(self) -> Iterator[str]:
+        """User ids in first-seen order."""
+        raise NotImplementedError
+
+    def add_session(self, user_id: str, session_id: str, timestamp: datetime):
+        raise NotImplementedError
+
+    def add_mention(self, user_id: str, session_id: str, label: str, text: str) -> bool:
+        """Links the session to the entity; returns True if the entity is new for this user."""
+        raise NotImplementedError
+
+    def entities(self, user_id: str) -> List[Tuple[str, str]]:
+        """Distinct (label, text) pairs in first-mention order."""
+        raise NotImplementedError
+
+    def session_count(self, user_id: str) -> int:
+        raise NotImplementedError
+
+    def prune_sessions(self, user_id: str, keep: int):
+        """Drops the oldest Session nodes (and their edges) beyond `keep`."""
+        raise NotImplementedError
+
+    def node_link_data(self, user_id: str) -> Dict[str, Any]:
+        """The user's graph in networkx.node_link_data format."""
+        raise NotImplementedError
+
+
+class NetworkXGraphStore(GraphStore):
+    """One nx.MultiDiGraph per user. Flexible, but every node and edge costs several dicts."""
+
+    def __init__(self):
+        # In-memory graph storage: user_id -> nx.Graph
+        self.graphs: Dict[str, nx.MultiDiGraph] = {}
+        self._entities: Dict[str, List[str]] = {}
+        self._sessions: Dict[str, Deque[str]] = {}
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.graphs
+
+    def __len__(self) -> int:
+        return len(self.graphs)
+
+    def user_ids(self) -> Iterator[str]:
+        return iter(self.graphs)
+
+    def add_session(self, user_id: str, session_id: str, timestamp: datetime):
+        if user_id not in self.graphs:
+            self.graphs[user_id] = nx.MultiDiGraph()
+            self._entities[user_id] = []
+            self._sessions[user_id] = deque()
+        G = self.graphs[user_id]
+        if session_id not in G:
+            self._sessions[user_id].append(session_id)
+        G.add_node(session_id, label="Session", timestamp=timestamp)
+
+    def add_mention(self, user_id: str, session_id: str, label: str, text: str) -> bool:
+        G = self.graphs[user_id]
+        # Canonical id: one node per distinct (label, text) per user
+        node_id = f"{label}:{text}"
+        new = node_id not in G
+        if new:
+            G.add_node(node_id, label=label, text=text, mentions=1)
+            self._entities[user_id].append(node_id)
+        else:
+            G.nodes[node_id]['mentions'] += 1
+        # Edge from Session to Entity
+        if G.has_edge(session_id, node_id):
+            G[session_id][node_id][0]['weight'] += 1.0
+        else:
+            G.add_edge(session_id, node_id, relation="MENTIONS", weight=1.0)
+        return new
+
+    def entities(self, user_id: str) -> List[Tuple[str, str]]:
+        nodes = self.graphs[user_id].nodes
+        return [(nodes[n].get('label', 'Unknown'), nodes[n].get('text', '')) for n in self._entities[user_id]]
+
+    def session_count(self, user_id: str) -> int:
+        return len(self._sessions[user_id])
+
+    def prune_sessions(self, user_id: str, keep: int):
+        sessions = self._sessions[user_id]
+        while len(sessions) > keep:
+            self.graphs[user_id].remove_node(sessions.popleft())
+
+    def node_link_data(self, user_id: str) -> Dict[str, Any]:
+        return nx.node_link_data(self.graphs[user_id])
+
+
+class _Strings:
+    """Intern table: each distinct string is stored once and referenced by an int id."""
+    __slots__ = ("values", "ids")
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.ids: Dict[Any, int] = {}
+
+    def intern(self, value: Any) -> int:
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+
+class _UserRecord:
+    """
+    One user's bipartite Session -> entity graph as flat typed arrays.
+    Node sequence numbers reproduce NetworkX's insertion order for node_link_data;
+    edges are an edge list (session seq, local entity index, weight) ordered by session seq.
+    """
+    __slots__ = ("session_ids", "session_seq", "session_us", "session_tz", "entity_ids", "entity_seq",
+                 "mentions", "edge_session", "edge_entity", "edge_weight", "next_seq")
+
+    def __init__(self):
+        self.session_ids: List[str] = []
+        self.session_seq = array('q')
+        # Timestamps as wall-clock microseconds since 1970-01-01 plus an interned tzinfo id,
+        # so the original datetime round-trips exactly.
+        self.session_us = array('q')
+        self.session_tz = array('i')
+        self.entity_ids = array('i')     # global entity ids, first-mention order
+        self.entity_seq = array('q')
+        self.mentions = array('i')
+        self.edge_session = array('q')   # session seq number
+        self.edge_entity = array('i')    # index into entity_ids
+        self.edge_weight = array('d')
+        self.next_seq = 0
+
+
+class CompactGraphStore(GraphStore):
+    """
+    Array-backed alternative to NetworkXGraphStore for large user counts.
+    Labels, texts and (label, text) entities are interned globally; each user is a
+    __slots__ record of typed arrays instead of NetworkX's dict-of-dict-of-dict.
+    Produces the same entities() and node_link_data() output as the NetworkX backend.
+    """
+
+    def __init__(self):
+        self._users: Dict[str, _UserRecord] = {}
+        self._strings = _Strings()
+        self._timezones = _Strings()
+        self._entities = _Strings()   # (label_id, text_id) -> global entity id
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def user_ids(self) -> Iterator[str]:
+        return iter(self._users)
+
+    @staticmethod
+    def _session_index(record: _UserRecord, session_id: str) -> int:
+        # The session being ingested is almost always the latest one.
+        if record.session_ids and record.session_ids[-1] == session_id:
+            return len(record.session_ids) - 1
+        return record.session_ids.index(session_id)
+
+    def add_session(self, user_id: str, session_id: str, timestamp: datetime):
+        record = self._users.get(user_id)
+        if record is None:
+            record = self._users[user_id] = _UserRecord()
+        tz = self._timezones.intern(timestamp.tzinfo)
+        micros = (timestamp.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)
+        if session_id in record.session_ids:
+            i = record.session_ids.index(session_id)
+            record.session_us[i] = micros
+            record.session_tz[i] = tz
+            return
+        record.session_ids.append(session_id)
+        record.session_seq.append(record.next_seq)
+        record.session_us.append(micros)
+        record.session_tz.append(tz)
+        record.next_seq += 1
+
+    def add_mention(self, user_id: str, session_id: str, label: str, text: str) -> bool:
+        record = self._users[user_id]
+        entity = self._entities.intern((self._strings.intern(label), self._strings.intern(text)))
+        try:
+            local = record.entity_ids.index(entity)
+            new = False
+            record.mentions[local] += 1
+        except ValueError:
+            local = len(record.entity_ids)
+            new = True
+            record.entity_ids.append(entity)
+            record.entity_seq.append(record.next_seq)
+            record.mentions.append(1)
+            record.next_seq += 1
+
+        seq = record.session_seq[self._session_index(record, session_id)]
+        edges = record.edge_session
+        at = len(edges)
+        if not new or (edges and edges[-1] > seq):
+            # Edges are kept ordered by session, so the scan back for an existing (session, entity)
+            # edge stops at the first older session instead of walking the user's whole history.
+            for e in range(len(edges) - 1, -1, -1):
+                if edges[e] < seq:
+                    break
+                if edges[e] > seq:
+                    at = e
+                elif record.edge_entity[e] == local:
+                    record.edge_weight[e] += 1.0
+                    return new
+        if at == len(edges):
+            edges.append(seq)
+            record.edge_entity.append(local)
+            record.edge_weight.append(1.0)
+        else:
+            # A mention for an older session (e.g. a re-ingested one) goes after that session's edges.
+            edges.insert(at, seq)
+            record.edge_entity.insert(at, local)
+            record.edge_weight.insert(at, 1.0)
+        return new
+
+    def _entity(self, entity: int) -> Tuple[str, str]:
+        label, text = self._entities.values[entity]
+        return self._strings.values[label], self._strings.values[text]
+
+    def entities(self, user_id: str) -> List[Tuple[str, str]]:
+        return [self._entity(e) for e in self._users[user_id].entity_ids]
+
+    def session_count(self, user_id: str) -> int:
+        return len(self._users[user_id].session_ids)
+
+    def prune_sessions(self, user_id: str, keep: int):
+        record = self._users[user_id]
+        drop = len(record.session_ids) - keep
+        if drop <= 0:
+            return
+        dropped = set(record.session_seq[:drop])
+        kept = [e for e in range(len(record.edge_session)) if record.edge_session[e] not in dropped]
+        record.edge_session = array('q', (record.edge_session[e] for e in kept))
+        record.edge_entity = array('i', (record.edge_entity[e] for e in kept))
+        record.edge_weight = array('d', (record.edge_weight[e] for e in kept))
+        del record.session_ids[:drop]
+        del record.session_seq[:drop]
+        del record.session_us[:drop]
+        del record.session_tz[:drop]
+
+    def _timestamp(self, record: _UserRecord, i: int) -> datetime:
+        ts = _EPOCH + timedelta(microseconds=record.session_us[i])
+        tz = self._timezones.values[record.session_tz[i]]
+        return ts.replace(tzinfo=tz) if tz is not None else ts
+
+    def node_link_data(self, user_id: str) -> Dict[str, Any]:
+        record = self._users[user_id]
+
+        # Merge sessions and entities by insertion sequence, as NetworkX orders nodes.
+        order = sorted([(seq, 0, i) for i, seq in enumerate(record.session_seq)] +
+                       [(seq, 1, i) for i, seq in enumerate(record.entity_seq)])
+        nodes = []
+        session_node_ids: Dict[int, str] = {}
+        for _, kind, i in order:
+            if kind == 0:
+                session_node_ids[record.session_seq[i]] = record.session_ids[i]
+                nodes.append({"label": "Session", "timestamp": self._timestamp(record, i),
+                              "id": record.session_ids[i]})
+            else:
+                label, text = self._entity(record.entity_ids[i])
+                nodes.append({"label": label, "text": text, "mentions": record.mentions[i],
+                              "id": f"{label}:{text}"})
+
+        # NetworkX lists edges grouped by source node, in node order; sorting by session seq
+        # (stable, so per-session insertion order is kept) gives the same sequence.
+        edges = []
+        for e in sorted(range(len(record.edge_session)), key=record.edge_session.__getitem__):
+            label, text = self._entity(record.entity_ids[record.edge_entity[e]])
+            edges.append({"relation": "MENTIONS", "weight": record.edge_weight[e],
+                          "source": session_node_ids[record.edge_session[e]],
+                          "target": f"{label}:{text}", "key": 0})
+
+        return {"directed": True, "multigraph": True, "graph": {}, "nodes": nodes, _EDGES_KEY: edges}
+
+
+GRAPH_BACKENDS = {"networkx": NetworkXGraphStore, "compact": CompactGraphStore}
+
+
+def create_graph_store(backend: Optional[str] = None) -> GraphStore:
+    backend = backend or "networkx"
+    if backend not in GRAPH_BACKENDS:
+        raise ValueError(f"Unknown graph backend '{backend}'. Expected one of {tuple(GRAPH_BACKENDS)}.")
+    return GRAPH_BACKENDS[backend]()
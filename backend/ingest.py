@@ -0,0 +1,244 @@
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+
+from models import Session, BulkIngestResult, BulkItemError
+from graph_logic import GraphBuilder
+from embeddings import EmbeddingManager
+from encoder import BatchingEncoder
+from wal import SessionLog
+from logs import SAMPLED
+from metrics import BATCH_SIZE, SESSIONS_INGESTED, stage
+from scheduler import run_inline
+
+logger = logging.getLogger(__name__)
+
+# Streams can carry millions of records; only the first errors are returned in full.
+MAX_REPORTED_ERRORS = 100
+# Sessions / profiles per state job, so interactive requests can run between the jobs of a large batch
+GRAPH_JOB_SESSIONS = 200
+UPSERT_JOB_USERS = 500
+
+
+class SessionIngestor:
+    """
+    Shared ingest pipeline for /sessions/bulk and streaming NDJSON uploads.
+    Applies a batch of raw session records to the Profile Graph, then rebuilds each
+    affected user's context once and encodes/upserts all of them in large batches.
+
+    State is touched through `run(fn, *args)`: MentorshipService passes its state executor,
+    so graph updates and upserts run off the event loop in bounded jobs.
+    """
+
+    def __init__(self, graph_builder: GraphBuilder, embedding_manager: EmbeddingManager,
+                 encoder: BatchingEncoder, session_log: Optional[SessionLog] = None,
+                 run: Callable[..., Awaitable[Any]] = run_inline):
+        self.graph_builder = graph_builder
+        self.embedding_manager = embedding_manager
+        self.encoder = encoder
+        self.session_log = session_log
+        self.run = run
+
+    async def ingest(self, records: List[Tuple[int, Any]], replay: bool = False) -> Tuple[int, List[BulkItemError]]:
+        """
+        Ingests (position, raw record) pairs. Invalid records are reported per item.
+        Valid sessions are written to the session log (if any) before state is touched.
+        With `replay` the records come from the session log and positions are their log offsets:
+        they are not logged again, and the ones a restored snapshot already holds are skipped.
+        Returns (users_updated, errors).
+        """
+        errors: List[BulkItemError] = []
+        sessions: List[Session] = []
+        positions: List[int] = []
+        for position, raw in records:
+            try:
+                if not isinstance(raw, dict):
+                    raise TypeError(f"session must be a JSON object, not {type(raw).__name__}")
+                sessions.append(Session(**raw))
+                positions.append(position)
+            except (ValidationError, TypeError) as e:
+                session_id = raw.get("session_id") if isinstance(raw, dict) else None
+                errors.append(BulkItemError(index=position, session_id=session_id, error=str(e)))
+
+        ticket = None
+        offsets = positions if replay else None
+        if not replay and self.session_log and sessions:
+            offsets = await self.session_log.append([session.model_dump(mode="json") for session in sessions])
+            ticket = offsets[0]
+        try:
+            users_updated = await self._apply(sessions, positions, errors, offsets)
+        finally:
+            if ticket is not None:
+                self.session_log.applied(ticket)
+
+        errors.sort(key=lambda err: err.index)
+        return users_updated, errors
+
+    async def _apply(self, sessions: List[Session], positions: List[int], errors: List[BulkItemError],
+                     offsets: Optional[List[int]]) -> int:
+        affected: Dict[str, str] = {}
+        failed = 0
+        for start in range(0, len(sessions), GRAPH_JOB_SESSIONS):
+            chunk_affected, graph_errors = await self.run(
+                self.graph_builder.process_sessions, sessions[start:start + GRAPH_JOB_SESSIONS],
+                offsets[start:start + GRAPH_JOB_SESSIONS] if offsets is not None else None)
+            affected.update(chunk_affected)
+            failed += len(graph_errors)
+            for j, message in graph_errors.items():
+                errors.append(BulkItemError(index=positions[start + j], session_id=sessions[start + j].session_id,
+                                            error=message))
+
+        attributes: Dict[str, Dict[str, Any]] = {}
+        # Latest session time per user, recorded with the profile in the history store
+        timestamps: Dict[str, float] = {}
+        for session in sessions:
+            attributes.setdefault(session.user_id, {}).update(session.metadata)
+            timestamps[session.user_id] = max(timestamps.get(session.user_id, 0.0), session.timestamp.timestamp())
+
+        profiles = await self.run(self._profiles, affected)
+
+        SESSIONS_INGESTED.inc(len(sessions) - failed)
+        users_updated = len(profiles)
+        # Contexts changed by a concurrent write while encoding are re-encoded (see _upsert_current).
+        while profiles:
+            BATCH_SIZE.observe(len(profiles), "ingest")
+            with stage("encode"):
+                vectors = await self.encoder.encode_many([context for _, _, context in profiles])
+            stale: List[Tuple[str, str, str]] = []
+            for start in range(0, len(profiles), UPSERT_JOB_USERS):
+                stale += await self.run(self._upsert_current, profiles[start:start + UPSERT_JOB_USERS],
+                                        vectors[start:start + UPSERT_JOB_USERS], attributes, timestamps)
+            profiles = stale
+        return users_updated
+
+    def _upsert_current(self, profiles: List[Tuple[str, str, str]], vectors: np.ndarray,
+                        attributes: Dict[str, Dict[str, Any]], timestamps: Dict[str, float]) -> List[Tuple[str, str, str]]:
+        """
+        Upserts the profiles whose encoded context is still the user's current one. Another write
+        for the same user (a /session racing this batch for the encoder) may have changed it;
+        those profiles are returned with their current context, to be encoded again.
+        """
+        keep: List[int] = []
+        stale: List[Tuple[str, str, str]] = []
+        for i, (user_id, user_type, context) in enumerate(profiles):
+            current = self.graph_builder.get_user_context(user_id)
+            if current == context:
+                keep.append(i)
+            elif current:
+                stale.append((user_id, user_type, current))
+        if keep:
+            self.embedding_manager.upsert_user_vectors(
+                [profiles[i][0] for i in keep], vectors[keep],
+                user_types=[profiles[i][1] for i in keep],
+                context_texts=[profiles[i][2] for i in keep],
+                attributes=[attributes.get(profiles[i][0]) for i in keep],
+                timestamps=[timestamps.get(profiles[i][0]) for i in keep]
+            )
+        return stale
+
+    def _profiles(self, affected: Dict[str, str]) -> List[Tuple[str, str, str]]:
+        """(user_id, user_type, context) of each affected user with a non-empty context."""
+        profiles = []
+        for user_id, user_type in affected.items():
+            context = self.graph_builder.get_user_context(user_id)
+            if context:
+                profiles.append((user_id, user_type, context))
+        return profiles
+
+    async def replay(self, offset: int = 0, chunk_size: int = 1000) -> int:
+        """
+        Re-applies logged sessions from `offset` (a snapshot's checkpoint) after a restart.
+        Records go through the bulk path, so each chunk is encoded in large batches.
+        Returns the number of sessions replayed.
+        """
+        if not self.session_log:
+            return 0
+        start = time.time()
+        replayed = 0
+        pending: List[Tuple[int, Any]] = []
+        for position, record in self.session_log.read_from(offset):
+            pending.append((position, record))
+            if len(pending) >= chunk_size:
+                await self.ingest(pending, replay=True)
+                replayed += len(pending)
+                pending = []
+        if pending:
+            await self.ingest(pending, replay=True)
+            replayed += len(pending)
+        if replayed:
+            logger.info("Replayed %d sessions from offset %d in %.2fs", replayed, offset, time.time() - start)
+        return replayed
+
+    async def ingest_ndjson(self, chunks: AsyncIterator[bytes], chunk_size: int = 500,
+                            max_line_bytes: int = 1 << 20) -> BulkIngestResult:
+        return await ingest_ndjson(chunks, self.ingest, chunk_size=chunk_size, max_line_bytes=max_line_bytes)
+
+
+async def ingest_ndjson(chunks: AsyncIterator[bytes],
+                        ingest: Callable[[List[Tuple[int, Any]]], Awaitable[Tuple[int, List[BulkItemError]]]],
+                        chunk_size: int = 500, max_line_bytes: int = 1 << 20) -> BulkIngestResult:
+    """
+    Ingests an NDJSON byte stream of Session records in bounded chunks via `ingest`
+    (SessionIngestor.ingest, or the state owner's when running multiple workers).
+    The next chunk is only read after the previous one has been applied, so a slow
+    encoder applies backpressure to the upload and memory stays flat regardless of size.
+    """
+    result = BulkIngestResult(processed=0, failed=0, users_updated=0, errors=[])
+    pending: List[Tuple[int, Any]] = []
+    line_no = -1
+
+    async def flush():
+        users_updated, errors = await ingest(pending)
+        _tally(result, len(pending), users_updated, errors)
+        pending.clear()
+        logger.info("%d records read, %d ingested, %d failed", result.processed + result.failed,
+                    result.processed, result.failed, extra=SAMPLED)
+
+    async for line in iter_ndjson_lines(chunks, max_line_bytes):
+        line_no += 1
+        try:
+            pending.append((line_no, json.loads(line)))
+        except ValueError as e:
+            _tally(result, 1, 0, [BulkItemError(index=line_no, error=f"Invalid JSON: {e}")])
+            continue
+        if len(pending) >= chunk_size:
+            await flush()
+    if pending:
+        await flush()
+    return result
+
+
+def _tally(result: BulkIngestResult, count: int, users_updated: int, errors: List[BulkItemError]):
+    result.processed += count - len(errors)
+    result.failed += len(errors)
+    # A user touched by several chunks is counted once per chunk.
+    result.users_updated += users_updated
+    room = MAX_REPORTED_ERRORS - len(result.errors)
+    if room > 0:
+        result.errors.extend(errors[:room])
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = 1 << 20) -> AsyncIterator[bytes]:
+    """Splits an async stream of byte chunks into non-empty lines, holding at most one partial line."""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            line = bytes(buffer[start:end]).strip()
+            start = end + 1
+            if line:
+                yield line
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"NDJSON line exceeds {max_line_bytes} bytes")
+    line = bytes(buffer).strip()
+    if line:
+        yield line
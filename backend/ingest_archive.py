@@ -0,0 +1,72 @@
+"""
+Streams a (possibly multi-GB) NDJSON transcript export to the /sessions/stream endpoint.
+
+Each line is one Session record: {"user_id": ..., "user_type": ..., "transcript": ...}.
+The file is read and uploaded in fixed-size blocks with chunked transfer encoding,
+so client memory stays flat no matter how large the archive is. `.gz` files are
+decompressed on the fly.
+
+Usage:
+    python ingest_archive.py sessions.ndjson
+    python ingest_archive.py export.ndjson.gz --chunk-size 1000
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+BLOCK_SIZE = 1 << 20
+
+
+def read_blocks(path: str, block_size: int = BLOCK_SIZE):
+    """Yields raw blocks from the archive and prints upload progress as it goes."""
+    total = os.path.getsize(path)
+    start = time.time()
+    with open(path, "rb") as raw:
+        f = gzip.GzipFile(fileobj=raw) if path.endswith(".gz") else raw
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            yield block
+            # Progress is tracked on the compressed position so .gz files report against their size on disk.
+            done = raw.tell()
+            elapsed = max(time.time() - start, 1e-6)
+            print(f"\r[..] {done / 1e6:,.1f} / {total / 1e6:,.1f} MB "
+                  f"({100 * done / max(total, 1):.0f}%, {done / 1e6 / elapsed:,.1f} MB/s)", end="", flush=True)
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="NDJSON file (optionally .gz) with one Session per line")
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--chunk-size", type=int, default=500, help="sessions applied per server-side chunk")
+    args = parser.parse_args()
+
+    print(f"Streaming {args.path} to {args.url}/sessions/stream ...")
+    try:
+        resp = requests.post(
+            f"{args.url}/sessions/stream",
+            params={"chunk_size": args.chunk_size},
+            data=read_blocks(args.path),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        resp.raise_for_status()
+    except Exception as e:
+        print(f"[X] Stream ingest failed: {e}")
+        sys.exit(1)
+
+    result = resp.json()
+    print(f"[✓] Ingested {result['processed']} sessions ({result['users_updated']} profile updates), "
+          f"{result['failed']} failed.")
+    for err in result["errors"]:
+        print(f"  X line {err['index'] + 1}: {err['error']}")
+
+
+if __name__ == "__main__":
+    main()
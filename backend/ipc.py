@@ -0,0 +1,229 @@
+"""
+Local IPC between HTTP workers and the state-owner process.
+
+The owner hosts the single MentorshipService (graphs, index, encoder) on a Unix domain
+socket; each uvicorn worker holds a StateClient with the same async methods. Calls are
+pickled frames (4-byte length + pickle) multiplexed over one connection per worker, so
+many in-flight requests share it and the owner serves them concurrently on its event loop.
+
+Pickle frames must only come from trusted local workers: the socket is bound with mode 0600
+(umask set before the bind, so it is never reachable with looser permissions), and connections
+from another user are refused before any frame is read (peer credentials, where the OS has them).
+"""
+import asyncio
+import itertools
+import logging
+import os
+import pickle
+import signal
+import socket
+import struct
+from typing import Any, AsyncIterator, Dict, Optional
+
+from models import BulkIngestResult
+from ingest import ingest_ndjson
+from metrics import add_to_profile, profile
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("!I")
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Any:
+    header = await reader.readexactly(_HEADER.size)
+    return pickle.loads(await reader.readexactly(_HEADER.unpack(header)[0]))
+
+
+def _write_frame(writer: asyncio.StreamWriter, message: Any):
+    payload = pickle.dumps(message, protocol=5)
+    writer.write(_HEADER.pack(len(payload)) + payload)
+
+
+def _peer_uid(writer: asyncio.StreamWriter) -> Optional[int]:
+    """uid of the process on the other end of a Unix socket (None where SO_PEERCRED is unavailable)."""
+    sock = writer.get_extra_info("socket")
+    if sock is None or not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+
+class StateServer:
+    """Serves a MentorshipService's REMOTE_METHODS over a Unix domain socket."""
+
+    def __init__(self, service, path: str):
+        self.service = service
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Connection handlers, closed with the server so workers see the owner go away
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        # The umask applies at bind time; a chmod afterwards would leave a window in which anyone
+        # could connect and send a pickle.
+        umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        finally:
+            os.umask(umask)
+        logger.info("Serving state on %s", self.path)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # Server.close() only stops accepting; open worker connections are dropped here
+            # (wait_closed() waits for them on newer Pythons).
+            for writer in self._connections.values():
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        uid = _peer_uid(writer)
+        if uid is not None and uid != os.getuid():
+            logger.warning("Refused state connection from uid %d", uid)
+            writer.close()
+            return
+        self._connections[asyncio.current_task()] = writer
+        tasks = set()
+        try:
+            while True:
+                call_id, method, args, kwargs = await _read_frame(reader)
+                # Each call runs as its own task so a slow encode does not hold up other workers' calls.
+                task = asyncio.get_running_loop().create_task(self._call(writer, call_id, method, args, kwargs))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+            self._connections.pop(asyncio.current_task(), None)
+
+    async def _call(self, writer: asyncio.StreamWriter, call_id: int, method: str, args: tuple, kwargs: dict):
+        # The stage breakdown travels back with every reply, so profiled requests see owner-side stages.
+        with profile() as stages:
+            try:
+                if method not in self.service.REMOTE_METHODS:
+                    raise AttributeError(f"'{method}' is not a remote state method")
+                result = (call_id, True, await getattr(self.service, method)(*args, **kwargs), stages)
+            except Exception as e:
+                result = (call_id, False, e, stages)
+        try:
+            if not result[1]:
+                # Exceptions whose constructor takes other arguments pickle fine but fail to load.
+                pickle.loads(pickle.dumps(result[2], protocol=5))
+            _write_frame(writer, result)
+        except Exception as e:
+            # Unpicklable result or exception: report it as a plain error.
+            error = e if result[1] else result[2]
+            _write_frame(writer, (call_id, False, RuntimeError(f"{type(error).__name__}: {error}"), stages))
+        await writer.drain()
+
+
+class StateClient:
+    """
+    Worker-side stand-in for MentorshipService: `await client.find_matches(request)` runs
+    the call in the state owner. Exceptions raised there are re-raised here.
+    """
+
+    def __init__(self, path: str, remote_methods: tuple):
+        self.path = path
+        self._remote_methods = remote_methods
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._receiver: Optional[asyncio.Task] = None
+        self._calls: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+        self._connecting = asyncio.Lock()
+
+    async def start(self):
+        await self._connect()
+
+    async def _connect(self):
+        async with self._connecting:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+            self._receiver = asyncio.get_running_loop().create_task(self._receive())
+
+    async def _receive(self):
+        try:
+            while True:
+                call_id, ok, value, stages = await _read_frame(self._reader)
+                future = self._calls.pop(call_id, None)
+                if future is None or future.done():
+                    continue
+                if ok:
+                    future.set_result((value, stages))
+                else:
+                    future.set_exception(value)
+        except Exception as e:
+            # Owner went away, or a reply could not be read (e.g. an exception that does not unpickle):
+            # drop the connection and fail in-flight calls; the next call reconnects.
+            if not isinstance(e, (asyncio.IncompleteReadError, ConnectionError)):
+                logger.error("Unreadable reply from the state owner", exc_info=True)
+            self._writer.close()
+            for future in self._calls.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"State owner connection lost: {e}"))
+            self._calls.clear()
+
+    async def call(self, method: str, *args, **kwargs) -> Any:
+        if self._writer is None or self._writer.is_closing():
+            await self._connect()
+        call_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._calls[call_id] = future
+        _write_frame(self._writer, (call_id, method, args, kwargs))
+        await self._writer.drain()
+        value, stages = await future
+        add_to_profile(stages)
+        return value
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or name not in self._remote_methods:
+            raise AttributeError(name)
+
+        async def remote(*args, **kwargs):
+            return await self.call(name, *args, **kwargs)
+        return remote
+
+    async def ingest_ndjson(self, chunks: AsyncIterator[bytes], chunk_size: int = 500) -> BulkIngestResult:
+        # Lines are parsed in the worker; only parsed chunks cross the socket.
+        return await ingest_ndjson(chunks, self.ingest, chunk_size=chunk_size)
+
+    async def close(self):
+        if self._receiver is not None:
+            self._receiver.cancel()
+            self._receiver = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+async def serve_state(path: str):
+    """Runs the state owner until SIGTERM/SIGINT, then shuts the service down cleanly (final snapshot)."""
+    from logs import configure_logging
+    from service import MentorshipService
+
+    configure_logging()
+    service = MentorshipService.from_env()
+    await service.start()
+    server = StateServer(service, path)
+    await server.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    await server.close()
+    await service.close()
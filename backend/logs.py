@@ -0,0 +1,42 @@
+"""
+Logging setup: leveled logging to stderr instead of print(), with sampling for hot paths.
+
+Per-request messages (cache hits, search details) are logged with `extra=SAMPLED`; only
+LOG_SAMPLE_RATE of them are emitted, so a busy server does not spend its time writing
+to stdout. Everything else (startup, snapshots, failures) is always logged at its level.
+"""
+import logging
+import os
+import random
+
+# Pass as `extra=` on hot-path records to subject them to sampling
+SAMPLED = {"sampled": True}
+
+
+class SamplingFilter(logging.Filter):
+    """Drops all but `rate` of the records marked SAMPLED; warnings and errors always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+def configure_logging(level: str = None, sample_rate: float = None):
+    """Configures the root logger from LOG_LEVEL (default INFO) and LOG_SAMPLE_RATE (default 0.01)."""
+    level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+    sample_rate = float(os.environ.get("LOG_SAMPLE_RATE", 0.01)) if sample_rate is None else sample_rate
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    handler.addFilter(SamplingFilter(sample_rate))
+    handler.mentorship = True
+    root = logging.getLogger()
+    # Idempotent: replace the handler from an earlier call
+    for existing in [h for h in root.handlers if getattr(h, "mentorship", False)]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
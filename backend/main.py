@@ -1,18 +1,40 @@
 # AI Mentorship System - FastAPI Backend
-from fastapi import FastAPI, HTTPException
-from typing import List
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 import json
+import os
+import time
 
-from models import Session, MatchRequest, MatchResult
-from graph_logic import GraphBuilder
-from embeddings import EmbeddingManager
-from privacy import PrivacyEngine
-from matching import MatchingEngine
+from models import Session, MatchRequest, MatchResult, BatchMatchRequest, AssignmentRequest, AssignmentResult, BulkSessionRequest, BulkIngestResult, GraphPage
+from service import MentorshipService
+from ipc import StateClient
+from logs import configure_logging
+from metrics import HTTP_SECONDS, REGISTRY, profile, server_timing
+from scheduler import Admission, Overloaded
+
+configure_logging()
+
+# Upper bound on users returned by one /graph page
+MAX_GRAPH_PAGE_SIZE = 1000
+# Users fetched per step while streaming /graph?format=ndjson
+GRAPH_STREAM_PAGE_SIZE = 100
+# Request header that opts into a per-stage timing breakdown (returned as Server-Timing)
+PROFILE_HEADER = "x-profile"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await service.start()
+    yield
+    await service.close()
 
 app = FastAPI(
     title="AI Mentorship System",
     description="Backend for an AI mentorship matching system using graph-based reasoning and differential privacy",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 from fastapi.middleware.cors import CORSMiddleware
@@ -25,11 +47,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize core components
-graph_builder = GraphBuilder()
-embedding_manager = EmbeddingManager()
-privacy_engine = PrivacyEngine()
-matching_engine = MatchingEngine(embedding_manager)
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Records request latency per route; with `X-Profile: 1` also returns the stage breakdown."""
+    start = time.perf_counter()
+    if request.headers.get(PROFILE_HEADER):
+        with profile() as stages:
+            response = await call_next(request)
+        response.headers["Server-Timing"] = server_timing(stages, time.perf_counter() - start)
+    else:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(time.perf_counter() - start, request.method,
+                         route.path if route else "unmatched", str(response.status_code))
+    return response
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """429 (queue full) / 503 (queue wait timed out) with a Retry-After hint instead of unbounded latency."""
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+# Admission control per endpoint class: interactive matching and ingest queue separately,
+# so a burst of uploads cannot delay /match (limits are per HTTP process, see README).
+admission = Admission.from_env()
+
+# Initialize core components.
+# With STATE_SOCKET set (uvicorn --workers N, see serve.py) state lives in one owner process
+# and this worker only parses, validates and serializes; otherwise it is built in-process.
+if os.environ.get("STATE_SOCKET"):
+    service = StateClient(os.environ["STATE_SOCKET"], MentorshipService.REMOTE_METHODS)
+else:
+    service = MentorshipService.from_env()
 
 @app.get("/")
 async def root():
@@ -38,52 +87,156 @@ async def root():
 @app.post("/session")
 async def process_session(session: Session):
     """Process a mentorship session and update the graph"""
-    try:
-        # Build graph from session data
-        graph_builder.process_session(session)
-        
-        # [ARCH UPDATE] Generate Embedding from Profile Graph (AI Hive "EV")
-        # 1. Get the updated context from the graph
-        user_context = graph_builder.get_user_context(session.user_id)
-        
-        # 2. Update the User's Embedding Vector
-        embedding_manager.update_user_embedding(
-            user_id=session.user_id, 
-            context_text=user_context,
-            user_type=session.user_type
-        )
-        
-        # (Optional) We can still keep session-level embeddings if we want granular search
-        # embedding_manager.generate_embeddings_for_session(session)
-        
-        return {
-            "message": "Session processed successfully",
-            "session_id": session.session_id
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing session: {str(e)}")
+    async with admission.slot("ingest"):
+        try:
+            return await service.process_session(session)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing session: {str(e)}")
+
+@app.post("/sessions/bulk")
+async def process_sessions_bulk(request: BulkSessionRequest) -> BulkIngestResult:
+    """
+    Ingest many sessions at once (backfills, data generation).
+    Each affected user's context is rebuilt and encoded once, in large batches,
+    and invalid sessions are reported per item without failing the batch.
+    """
+    async with admission.slot("ingest"):
+        try:
+            users_updated, errors = await service.ingest(list(enumerate(request.sessions)))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing sessions: {str(e)}")
+
+    return BulkIngestResult(
+        processed=len(request.sessions) - len(errors),
+        failed=len(errors),
+        users_updated=users_updated,
+        errors=errors
+    )
+
+@app.post("/sessions/stream")
+async def process_sessions_stream(request: Request, chunk_size: int = 500) -> BulkIngestResult:
+    """
+    Ingest an NDJSON body (one Session per line) of any size, e.g. a transcript archive
+    uploaded with chunked transfer encoding. Records are applied in chunks of chunk_size
+    as the body arrives; only the first errors are listed, counts cover all records.
+    """
+    async with admission.slot("ingest"):
+        try:
+            return await service.ingest_ndjson(request.stream(), chunk_size=max(1, chunk_size))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing session stream: {str(e)}")
 
 @app.post("/match")
 async def find_matches(match_request: MatchRequest) -> List[MatchResult]:
     """Find mentor-mentee matches based on session data"""
-    try:
-        # Run matching engine
-        matches = matching_engine.find_matches(match_request)
-        
-        return matches
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error finding matches: {str(e)}")
+    async with admission.slot("match"):
+        try:
+            # Run matching engine
+            matches = await service.find_matches(match_request)
+
+            return matches
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error finding matches: {str(e)}")
+
+@app.post("/match/batch")
+async def find_matches_batch(batch_request: BatchMatchRequest) -> Dict[str, List[MatchResult]]:
+    """
+    Find matches for many users at once (e.g. pairing a whole mentee cohort).
+    Runs one multi-query vector search; returns user_id -> ranked MatchResult list.
+    """
+    async with admission.slot("match"):
+        try:
+            return await service.find_matches_batch(batch_request)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error finding matches: {str(e)}")
+
+@app.post("/match/assign")
+async def assign_mentors(assignment_request: AssignmentRequest) -> AssignmentResult:
+    """
+    Globally assign mentees to mentors (cohort launches): maximizes total similarity
+    while respecting each mentor's capacity, instead of ranking each mentee on their own.
+    """
+    # A global assignment is a batch job: it queues with ingest, not with interactive matching.
+    async with admission.slot("ingest"):
+        try:
+            return await service.assign_mentors(assignment_request)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error assigning mentors: {str(e)}")
 
 @app.get("/graph")
-async def get_graph():
-    """Get the current graph representation"""
+async def get_graph(cursor: Optional[str] = None, limit: int = 100, format: str = "json"):
+    """
+    Get the current graph representation, one page of users at a time.
+    Pass the returned next_cursor to fetch the following page. With format=ndjson the
+    graphs from cursor onwards are streamed as one {"user_id", "graph"} line per user,
+    fetched GRAPH_STREAM_PAGE_SIZE users at a time.
+    """
+    try:
+        start = int(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+    if start < 0 or limit < 1:
+        raise HTTPException(status_code=400, detail="cursor must be >= 0 and limit >= 1")
+
+    if format == "ndjson":
+        async def stream_graphs():
+            position = start
+            while position is not None:
+                users, position, _ = await service.graph_page(position, GRAPH_STREAM_PAGE_SIZE)
+                for user_id, graph in users.items():
+                    yield json.dumps({"user_id": user_id, "graph": jsonable_encoder(graph)}) + "\n"
+        return StreamingResponse(stream_graphs(), media_type="application/x-ndjson")
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+
     try:
-        graph_data = graph_builder.get_graph_data()
-        return graph_data
+        users, next_cursor, total = await service.graph_page(start, min(limit, MAX_GRAPH_PAGE_SIZE))
+        return GraphPage(
+            users=jsonable_encoder(users),
+            next_cursor=str(next_cursor) if next_cursor is not None else None,
+            total=total
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving graph: {str(e)}")
 
+@app.get("/graph/{user_id}")
+async def get_user_graph(user_id: str):
+    """Get a single user's Profile Graph"""
+    graph_data = await service.user_graph(user_id)
+    if "error" in graph_data:
+        raise HTTPException(status_code=404, detail=f"No graph for user {user_id}")
+    return graph_data
+
+@app.post("/admin/snapshot")
+async def take_snapshot():
+    """Write a snapshot of the index, metadata and graphs now"""
+    async with admission.slot("ingest"):
+        try:
+            manifest = await service.snapshot()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error writing snapshot: {str(e)}")
+    if manifest is None:
+        raise HTTPException(status_code=400, detail="Snapshots are disabled (set SNAPSHOT_DIR)")
+    return manifest
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "AI Mentorship System"}
+    return {
+        "status": "healthy",
+        "service": "AI Mentorship System",
+        **(await service.health())
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: stage latency histograms, batch sizes, index and cache gauges."""
+    text = await service.metrics_text()
+    if isinstance(service, StateClient):
+        # Stages run in the state owner; HTTP latency is recorded by this worker.
+        text += REGISTRY.render()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
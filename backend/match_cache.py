@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from models import MatchResult
+
+# (user_id, top_k, sorted filter items)
+MatchKey = Tuple[str, int, Tuple[Tuple[str, str], ...]]
+
+
+def match_key(user_id: str, top_k: int, filters: Dict[str, Any]) -> MatchKey:
+    # Filter values are compared as strings by the attribute index, so key them the same way.
+    return user_id, top_k, tuple(sorted((key, str(value)) for key, value in filters.items()))
+
+
+class CachedMatches:
+    """One cached ranking plus what it was computed against."""
+    __slots__ = ("results", "user_version", "epoch", "min_score", "full")
+
+    def __init__(self, results: List[MatchResult], user_version: Optional[int], epoch: int, full: bool):
+        self.results = results
+        self.user_version = user_version
+        self.epoch = epoch
+        # Score a changed mentor must reach to enter this ranking
+        self.min_score = min((r.score for r in results), default=0.0)
+        self.full = full
+
+
+class MatchCache:
+    """
+    LRU of top-K match results keyed by (user_id, top_k, filters).
+    Entries are stored with the requester's profile version and the index epoch they
+    were computed at; MatchingEngine decides whether a stale-epoch entry is still valid.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[MatchKey, CachedMatches]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.revalidations = 0
+
+    def get(self, key: MatchKey) -> Optional[CachedMatches]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: MatchKey, entry: CachedMatches):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: MatchKey):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def keys(self) -> List[MatchKey]:
+        """Keys from most to least recently used (the active users first)."""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "revalidations": self.revalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
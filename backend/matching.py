@@ -1,11 +1,57 @@
+import logging
 import random
-from typing import List, Optional
-from models import MatchRequest, MatchResult
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from models import MatchRequest, MatchResult, BatchMatchRequest, AssignmentRequest, Assignment, AssignmentResult
 from embeddings import EmbeddingManager
+from entity_index import EntityIndex
+from vector_index import distance_to_score
+from assignment import similarity_blocks, top_candidates, assign_dense, auction
+from match_cache import MatchCache, CachedMatches, MatchKey, match_key
+from logs import SAMPLED
+from metrics import BATCH_SIZE, stage, timed
+
+logger = logging.getLogger(__name__)
+
+MENTOR_TYPE = "mentor"
+MENTEE_TYPE = "mentee"
+COLD_START_QUERY = "new user looking for mentorship"
+
+# "auto" solves exactly (Hungarian) up to this many mentees / mentor seats, else by auction.
+HUNGARIAN_MAX_MENTEES = 1000
+HUNGARIAN_MAX_SLOTS = 4000
+SIMILARITY_BLOCK_SIZE = 1024
+AUCTION_EPS = 1e-3
+# Below this many open mentors, candidates come from an exact NumPy scan instead of a filtered FAISS search
+DENSE_CANDIDATE_MAX_MENTORS = 4096
+# Extra auction passes for mentees whose candidate mentors all filled up
+AUCTION_PASSES = 3
+# A cached ranking is re-checked against at most this many profile changes before being recomputed
+MAX_REVALIDATE_CHANGES = 64
+# Retrieval for users with a vector: dense only, dense and lexical (shared graph entities) rankings
+# fused by reciprocal rank, or dense search restricted to the mentors sharing entities
+HYBRID_MODES = ("off", "rrf", "prefilter")
+# Candidates taken from each ranking before fusion
+LEXICAL_DEPTH = 50
+# Mentors sharing entities that a prefiltered dense search is restricted to
+PREFILTER_CANDIDATES = 1000
+# Reciprocal rank fusion: a candidate scores sum(1 / (RRF_K + rank)) over the rankings it appears in
+RRF_K = 60
 
 class MatchingEngine:
-    def __init__(self, embedding_manager: Optional[EmbeddingManager] = None):
+    def __init__(self, embedding_manager: Optional[EmbeddingManager] = None, cache_size: int = 10000,
+                 entity_index: Optional[EntityIndex] = None, hybrid: str = "off",
+                 lexical_depth: int = LEXICAL_DEPTH, prefilter_candidates: int = PREFILTER_CANDIDATES):
+        if hybrid not in HYBRID_MODES:
+            raise ValueError(f"Unknown hybrid mode '{hybrid}'. Expected one of {HYBRID_MODES}.")
         self.embedding_manager = embedding_manager
+        self.cache = MatchCache(max_entries=cache_size)
+        # Lexical retrieval over Profile Graph entities: serves users without a vector
+        # (no encoder call) and, with `hybrid`, boosts or prefilters the dense candidates.
+        self.entity_index = entity_index
+        self.hybrid = hybrid
+        self.lexical_depth = lexical_depth
+        self.prefilter_candidates = prefilter_candidates
 
     def find_matches(self, request: MatchRequest) -> List[MatchResult]:
         # Epsilon-greedy strategy
@@ -16,7 +62,7 @@ class MatchingEngine:
         
         # Exploration: Random match
         if random.random() < EPSILON: 
-            print("[Matching] Triggered Exploration")
+            logger.info("Triggered exploration", extra=SAMPLED)
             matches.append(MatchResult(
                 mentor_id="random_explorer_" + str(random.randint(100,999)),
                 score=0.5,
@@ -26,52 +72,397 @@ class MatchingEngine:
 
         # Exploitation: Semantic search
         if self.embedding_manager:
+            key = match_key(request.user_id, request.top_k, request.filters)
+            cached = self._cached(key)
+            if cached is not None:
+                logger.debug("Cache hit for %s", request.user_id, extra=SAMPLED)
+                return cached
+            user_version = self.embedding_manager.user_version(request.user_id)
+            epoch = self.embedding_manager.epoch
+
             # [ARCH UPDATE] Graph-Aware Matching
             # Retrieve the Mentee's "Embedding Vector" (EV) derived from their Profile Graph
             user_vector = self.embedding_manager.get_user_vector(request.user_id)
-            
-            # [DEBUG] Increase retrieval K to avoid filtering all results
-            search_k = 20
-            
+
             if user_vector is not None:
-                print(f"[Matching] Searching with User Vector for {request.user_id}")
+                logger.debug("Searching with user vector for %s", request.user_id, extra=SAMPLED)
                 # Search using the User's Vector
-                results = self.embedding_manager.search_by_vector(user_vector, k=search_k)
+                results = self._search(request.user_id, user_vector, request.top_k, request.filters)
             else:
-                print(f"[Matching] No vector found for {request.user_id}. Using Cold Start query.")
-                # Cold Start Fallback: If no graph vector, use a generic intent or their latest session?
-                # For now, fallback to a "New User" generic search
-                results = self.embedding_manager.search("new user looking for mentorship", k=search_k)
+                # Cold start: mentors sharing the user's graph entities, without running the encoder
+                results = self._lexical_matches(request.user_id, request.top_k, request.filters)
+                if not results:
+                    logger.info("No vector found for %s. Using cold start query.", request.user_id, extra=SAMPLED)
+                    # No entities either: fall back to a "New User" generic search
+                    results = self.embedding_manager.search(COLD_START_QUERY, k=request.top_k,
+                                                            **self._search_kwargs(request.user_id, request.filters))
 
-            print(f"[Matching] Found {len(results)} raw results.")
-            
-            for res in results:
-                meta = res['metadata']
-                # Basic Filtering
-                if meta['user_id'] == request.user_id:
-                    continue
-                if meta['user_type'] == 'mentee': # Assume we want mentors
-                     continue
-                     
-                # Deduplicate by user_id? FAISS might return multiple chunks for same user (if we had granular chunks)
-                # But here we have 1 vector per user update.
-                
-                matches.append(MatchResult(
-                    mentor_id=meta['user_id'],
-                    score=res['score'],
-                    rationale=f"High semantic alignment (Score: {res['score']:.2f})"
-                ))
-                
-                if len(matches) >= request.top_k:
-                    break
+            logger.debug("Found %d results", len(results), extra=SAMPLED)
+            matches = self._to_matches(results)
         
         # Fallback if no matches
         if not matches:
-             print("[Matching] No matches found after filtering. Using Fallback.")
-             matches.append(MatchResult(
-                mentor_id="default_mentor_01",
-                score=0.1,
-                rationale="Standard recommendation (cold start)."
-            ))
+             logger.info("No matches found after filtering. Using fallback.", extra=SAMPLED)
+             matches.append(self._fallback())
+
+        if self.embedding_manager:
+            self.cache.put(key, CachedMatches(matches, user_version, epoch, full=len(results) >= request.top_k))
             
         return matches[:request.top_k]
+
+    def find_matches_batch(self, request: BatchMatchRequest) -> Dict[str, List[MatchResult]]:
+        """
+        Matches many users in one call (dashboard refresh, nightly pairing).
+        Their vectors are stacked into one matrix and searched with a single multi-query
+        FAISS call; users without a vector share the cold-start query.
+        """
+        requested = list(dict.fromkeys(request.user_ids))
+        if not self.embedding_manager or not requested:
+            return {user_id: [self._fallback()] for user_id in requested}
+
+        # Serve what the cache still holds; search only for the rest.
+        matches: Dict[str, List[MatchResult]] = {}
+        for user_id in requested:
+            cached = self._cached(match_key(user_id, request.top_k, request.filters))
+            if cached is not None:
+                matches[user_id] = cached
+        user_ids = [user_id for user_id in requested if user_id not in matches]
+        if not user_ids:
+            return matches
+        BATCH_SIZE.observe(len(user_ids), "match_batch")
+        em = self.embedding_manager
+        epoch = em.epoch
+
+        # Users served without the shared dense search: lexical cold starts and prefiltered searches
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        batched: List[str] = []
+        vectors = np.empty((len(user_ids), em.dimension), dtype='float32')
+        cold_start = []
+        for user_id in user_ids:
+            vector = em.get_user_vector(user_id)
+            if vector is None:
+                lexical = self._lexical_matches(user_id, request.top_k, request.filters)
+                if lexical:
+                    results[user_id] = lexical
+                    continue
+                cold_start.append(len(batched))
+            elif self.hybrid == "prefilter" and self.entity_index is not None:
+                results[user_id] = self._search(user_id, vector, request.top_k, request.filters)
+                continue
+            else:
+                vectors[len(batched)] = vector
+            batched.append(user_id)
+        if cold_start:
+            vectors[cold_start] = em.embed_query(COLD_START_QUERY)
+
+        logger.info("Batch search for %d users (%d cold start, %d cached)", len(user_ids), len(cold_start),
+                    len(matches), extra=SAMPLED)
+        if batched:
+            fused = self.hybrid == "rrf" and self.entity_index is not None
+            hits = em.search_by_vectors(
+                vectors[:len(batched)], k=max(request.top_k, self.lexical_depth) if fused else request.top_k,
+                user_type=MENTOR_TYPE, exclude_user_ids=[[user_id] for user_id in batched], filters=request.filters
+            )
+            cold = {batched[i] for i in cold_start}
+            for i, (user_id, user_hits) in enumerate(zip(batched, hits)):
+                if fused and user_id not in cold:
+                    results[user_id] = self._fuse(user_id, vectors[i], user_hits, request.top_k, request.filters)
+                else:
+                    results[user_id] = user_hits[:request.top_k]
+
+        for user_id in user_ids:
+            user_results = results[user_id]
+            matches[user_id] = self._to_matches(user_results) or [self._fallback()]
+            self.cache.put(match_key(user_id, request.top_k, request.filters),
+                           CachedMatches(matches[user_id], em.user_version(user_id), epoch,
+                                         full=len(user_results) >= request.top_k))
+        return {user_id: matches[user_id] for user_id in requested}
+
+    @staticmethod
+    def _search_kwargs(user_id: str, filters: Dict[str, Any]) -> Dict[str, Any]:
+        # Mentor vectors live in their own partition and the requester is excluded inside FAISS,
+        # so every hit is a usable candidate and we only need top_k of them.
+        return {"user_type": MENTOR_TYPE, "exclude_user_ids": [user_id], "filters": filters}
+
+    def _search(self, user_id: str, user_vector: np.ndarray, top_k: int,
+                filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Top-k mentors for a user with a vector, per the hybrid mode."""
+        em = self.embedding_manager
+        search_kwargs = self._search_kwargs(user_id, filters)
+        if self.hybrid == "off" or self.entity_index is None:
+            return em.search_by_vector(user_vector, k=top_k, **search_kwargs)
+
+        if self.hybrid == "prefilter":
+            with stage("lexical"):
+                candidates = [uid for uid, _ in self.entity_index.search_user(
+                    user_id, self.prefilter_candidates, role=MENTOR_TYPE)]
+            results = []
+            if candidates:
+                results = em.search_by_vector(user_vector, k=top_k, allow_user_ids=candidates, **search_kwargs)
+            if len(results) < top_k:
+                # Too few mentors share an entity: fill up from the unrestricted search.
+                seen = {res["metadata"]["user_id"] for res in results}
+                results += [res for res in em.search_by_vector(user_vector, k=top_k, **search_kwargs)
+                            if res["metadata"]["user_id"] not in seen][:top_k - len(results)]
+            return results
+
+        dense = em.search_by_vector(user_vector, k=max(top_k, self.lexical_depth), **search_kwargs)
+        return self._fuse(user_id, user_vector, dense, top_k, filters)
+
+    def _lexical(self, user_id: str, k: int, filters: Dict[str, Any]) -> List[Tuple[int, float]]:
+        """(row, overlap score) of up to k mentors sharing the user's graph entities, best first.
+        Only mentors with a stored profile that passes the filters are kept."""
+        if self.entity_index is None:
+            return []
+        em = self.embedding_manager
+        with stage("lexical"):
+            hits = self.entity_index.search_user(user_id, k, role=MENTOR_TYPE)
+            allowed = set(em._rows_matching(filters).tolist()) if filters and hits else None
+        rows = []
+        for mentor_id, score in hits:
+            row = em.user_rows.get(mentor_id)
+            if row is not None and em.metadata[row]["user_type"] == MENTOR_TYPE and (allowed is None or row in allowed):
+                rows.append((row, score))
+        return rows
+
+    def _lexical_matches(self, user_id: str, top_k: int, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Cold-start results from shared entities alone, scored by IDF-weighted overlap."""
+        em = self.embedding_manager
+        return [{"metadata": em.metadata[row], "score": score, "rationale": self._shared_rationale(user_id, row)}
+                for row, score in self._lexical(user_id, top_k, filters)]
+
+    def _fuse(self, user_id: str, user_vector: np.ndarray, dense: List[Dict[str, Any]], top_k: int,
+              filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Reciprocal rank fusion of the dense hits with the lexical ranking. Scores stay semantic
+        similarities (lexical-only candidates are scored against their stored vectors), so they
+        remain comparable with the dense-only modes.
+        """
+        em = self.embedding_manager
+        fused: Dict[int, float] = {}
+        by_row: Dict[int, Dict[str, Any]] = {}
+        for rank, res in enumerate(dense):
+            row = em.user_rows[res["metadata"]["user_id"]]
+            by_row[row] = res
+            fused[row] = 1.0 / (RRF_K + rank + 1)
+        for rank, (row, _) in enumerate(self._lexical(user_id, self.lexical_depth, filters)):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (RRF_K + rank + 1)
+        best = sorted(fused, key=lambda row: -fused[row])[:top_k]
+
+        missing = [row for row in best if row not in by_row]
+        if missing:
+            for row, score in zip(missing, em.similarity(user_vector, missing).tolist()):
+                by_row[row] = {"metadata": em.metadata[row], "score": float(score)}
+        results = []
+        for row in best:
+            rationale = self._shared_rationale(user_id, row, by_row[row]["score"])
+            results.append({**by_row[row], "rationale": rationale} if rationale else by_row[row])
+        return results
+
+    def _shared_rationale(self, user_id: str, row: int, score: Optional[float] = None) -> Optional[str]:
+        mentor_entities = set(self.entity_index.entities(self.embedding_manager.metadata[row]["user_id"]))
+        shared = [e for e in self.entity_index.entities(user_id) if e in mentor_entities]
+        if not shared:
+            return None
+        if score is None:
+            return f"Shared profile themes: {'; '.join(shared)}"
+        return f"High semantic alignment (Score: {score:.2f}); shared themes: {'; '.join(shared)}"
+
+    @timed("match_cache")
+    def _cached(self, key: MatchKey) -> Optional[List[MatchResult]]:
+        """
+        Cached ranking for key if it is still exact, else None.
+        The requester's own profile must be unchanged. Mentor changes since the entry was
+        computed are checked cheaply: a changed mentor that was not in the ranking and whose
+        score cannot reach its lowest score leaves it valid; anything else recomputes.
+        """
+        entry = self.cache.get(key)
+        em = self.embedding_manager
+        user_id = key[0]
+        if entry is None:
+            self.cache.misses += 1
+            return None
+        if entry.user_version != em.user_version(user_id) or not self._still_valid(entry, user_id):
+            self.cache.invalidate(key)
+            self.cache.misses += 1
+            return None
+        self.cache.hits += 1
+        return list(entry.results)
+
+    def _still_valid(self, entry: CachedMatches, user_id: str) -> bool:
+        em = self.embedding_manager
+        if entry.epoch == em.epoch:
+            return True
+        changes = em.changes_since(entry.epoch)
+        if changes is None or len(changes) > MAX_REVALIDATE_CHANGES:
+            return False
+        changed_mentors = list(dict.fromkeys(uid for uid, user_types in changes
+                                             if MENTOR_TYPE in user_types and uid != user_id))
+        if changed_mentors:
+            # With fewer than top_k hits any new mentor could enter the ranking.
+            user_vector = em.get_user_vector(user_id)
+            # Hybrid rankings also depend on entity overlap, which the score bound does not cover.
+            if not entry.full or user_vector is None or self.hybrid != "off":
+                return False
+            listed = {match.mentor_id for match in entry.results}
+            if any(uid in listed for uid in changed_mentors):
+                return False
+            rows = [em.user_rows[uid] for uid in changed_mentors
+                    if uid in em.user_rows and em.metadata[em.user_rows[uid]]["user_type"] == MENTOR_TYPE]
+            if rows:
+                if em.similarity(user_vector, rows).max() >= entry.min_score:
+                    return False
+        entry.epoch = em.epoch
+        self.cache.revalidations += 1
+        return True
+
+    def refresh_cache(self, limit: int = 1000) -> int:
+        """
+        Recomputes stale cached rankings, most recently used first, up to `limit` users,
+        with one batch search per (top_k, filters). Used by the background precompute job
+        so active mentees find their matches already cached. Returns the number refreshed.
+        """
+        stale: Dict[Tuple[int, tuple], List[str]] = {}
+        refreshed = 0
+        for key in self.cache.keys():
+            if refreshed >= limit:
+                break
+            entry = self.cache.get(key)
+            user_id, top_k, filters = key
+            if entry is None or (entry.user_version == self.embedding_manager.user_version(user_id)
+                                 and self._still_valid(entry, user_id)):
+                continue
+            stale.setdefault((top_k, filters), []).append(user_id)
+            refreshed += 1
+        for (top_k, filters), user_ids in stale.items():
+            self.find_matches_batch(BatchMatchRequest(user_ids=user_ids, top_k=top_k, filters=dict(filters)))
+        return refreshed
+
+    def assign_mentors(self, request: AssignmentRequest) -> AssignmentResult:
+        """
+        Global one-to-one (or one-to-capacity) mentor assignment for a cohort.
+        Unlike find_matches, which ranks each mentee independently, this maximizes the total
+        similarity over all pairs while no mentor exceeds their capacity, so popular mentors
+        are spread across the cohort. Small cohorts are solved exactly (Hungarian on the dense
+        similarity matrix); large ones by an auction over each mentee's top candidates from
+        FAISS, computed block by block so memory stays bounded.
+        """
+        em = self.embedding_manager
+        if request.mentee_ids is None:
+            mentee_ids, mentee_rows = em.profile_rows(MENTEE_TYPE)
+        else:
+            mentee_ids = [u for u in dict.fromkeys(request.mentee_ids) if u in em.user_rows]
+            mentee_rows = np.array([em.user_rows[u] for u in mentee_ids], dtype='int64')
+        if request.mentor_ids is None:
+            mentor_ids, mentor_rows = em.profile_rows(MENTOR_TYPE)
+        else:
+            mentor_ids = [u for u in dict.fromkeys(request.mentor_ids)
+                          if u in em.user_rows and em.metadata[em.user_rows[u]]["user_type"] == MENTOR_TYPE]
+            mentor_rows = np.array([em.user_rows[u] for u in mentor_ids], dtype='int64')
+        if request.filters and len(mentor_rows):
+            keep = np.isin(mentor_rows, em._rows_matching(request.filters))
+            mentor_ids = [u for u, k in zip(mentor_ids, keep) if k]
+            mentor_rows = mentor_rows[keep]
+
+        capacity = np.array([int(request.capacities.get(
+            u, em.metadata[row]["attributes"].get("capacity", request.capacity))) for u, row in zip(mentor_ids, mentor_rows)],
+            dtype='int64')
+        capacity = np.maximum(capacity, 0)
+
+        solver = request.solver
+        if solver == "auto":
+            small = len(mentee_ids) <= HUNGARIAN_MAX_MENTEES and np.minimum(capacity, len(mentee_ids)).sum() <= HUNGARIAN_MAX_SLOTS
+            solver = "hungarian" if small else "auction"
+        if solver not in ("hungarian", "auction"):
+            raise ValueError(f"Unknown solver '{request.solver}'. Expected 'auto', 'hungarian' or 'auction'.")
+
+        logger.info("Assigning %d mentees to %d mentors (%d seats) with %s", len(mentee_ids), len(mentor_ids),
+                    int(capacity.sum()), solver)
+        if not len(mentee_ids) or not len(mentor_ids):
+            assigned = np.full(len(mentee_ids), -1, dtype=np.int64)
+            scores = np.zeros(len(mentee_ids))
+        elif solver == "hungarian":
+            with stage("assignment"):
+                assigned, scores = self._assign_exact(em._vectors[mentee_rows], em._vectors[mentor_rows], capacity,
+                                                      em.index_config.metric)
+        else:
+            with stage("assignment"):
+                assigned, scores = self._assign_auction(mentee_rows, mentor_rows, capacity, request.candidates)
+
+        assignments = [Assignment(mentee_id=mentee_ids[i], mentor_id=mentor_ids[j], score=float(scores[i]))
+                       for i, j in enumerate(assigned.tolist()) if j >= 0]
+        return AssignmentResult(
+            assignments=assignments,
+            unassigned=[mentee_ids[i] for i in np.nonzero(assigned < 0)[0]],
+            total_score=float(sum(a.score for a in assignments)),
+            solver=solver
+        )
+
+    @staticmethod
+    def _assign_exact(mentee_vectors: np.ndarray, mentor_vectors: np.ndarray, capacity: np.ndarray, metric: str):
+        similarity = np.empty((len(mentee_vectors), len(mentor_vectors)), dtype='float64')
+        for start, block in similarity_blocks(mentee_vectors, mentor_vectors, SIMILARITY_BLOCK_SIZE, metric):
+            similarity[start:start + len(block)] = block
+        assigned = assign_dense(similarity, capacity)
+        scores = np.where(assigned >= 0, similarity[np.arange(len(assigned)), np.maximum(assigned, 0)], 0.0)
+        return assigned, scores
+
+    def _assign_auction(self, mentee_rows: np.ndarray, mentor_rows: np.ndarray, capacity: np.ndarray,
+                        candidates: int):
+        em = self.embedding_manager
+        index = em.partitions[MENTOR_TYPE]
+        # Row id -> mentor index (-1 for misses and rows outside this cohort); slot -1 catches FAISS misses.
+        local = np.full(int(mentor_rows.max()) + 2, -1, dtype=np.int64)
+        local[mentor_rows] = np.arange(len(mentor_rows))
+        assigned = np.full(len(mentee_rows), -1, dtype=np.int64)
+        scores = np.zeros(len(mentee_rows))
+        remaining = capacity.copy()
+
+        for _ in range(AUCTION_PASSES):
+            pending = np.nonzero(assigned < 0)[0]
+            open_mentors = np.nonzero(remaining > 0)[0]
+            if not len(pending) or not len(open_mentors):
+                break
+            # Top candidates per mentee among mentors with free seats, block by block.
+            k = min(candidates, len(open_mentors))
+            if len(open_mentors) <= DENSE_CANDIDATE_MAX_MENTORS:
+                # Few mentors left: an exact scan beats a FAISS search with a very selective filter.
+                top, sim = top_candidates(em._vectors[mentee_rows[pending]], em._vectors[mentor_rows[open_mentors]],
+                                          k, SIMILARITY_BLOCK_SIZE, em.index_config.metric)
+                cand = open_mentors[top]
+            else:
+                # The selector slows the search down, so skip it while every mentor in the partition is eligible.
+                allow_rows = None if len(open_mentors) == len(index) else mentor_rows[open_mentors]
+                cand = np.full((len(pending), k), -1, dtype=np.int64)
+                sim = np.zeros((len(pending), k))
+                for start in range(0, len(pending), SIMILARITY_BLOCK_SIZE):
+                    block = pending[start:start + SIMILARITY_BLOCK_SIZE]
+                    distances, rows = index.search(em._vectors[mentee_rows[block]], k, allow_rows=allow_rows)
+                    cand[start:start + len(block)] = local[np.where(rows < len(local) - 1, rows, -1)]
+                    sim[start:start + len(block)] = distance_to_score(distances, em.index_config.metric)
+
+            # Cosine scores can be negative, but any pairing still beats none (as in the exact solver).
+            won = auction(cand, sim + 1 if em.index_config.metric == "ip" else sim, remaining, eps=AUCTION_EPS)
+            hit = won >= 0
+            if not hit.any():
+                break
+            assigned[pending[hit]] = won[hit]
+            scores[pending[hit]] = sim[hit, np.argmax(cand[hit] == won[hit, None], axis=1)]
+            remaining -= np.bincount(won[hit], minlength=len(remaining))
+        return assigned, scores
+
+    @staticmethod
+    def _to_matches(results: List[Dict[str, Any]]) -> List[MatchResult]:
+        return [MatchResult(
+            mentor_id=res['metadata']['user_id'],
+            score=res['score'],
+            rationale=res.get('rationale') or f"High semantic alignment (Score: {res['score']:.2f})"
+        ) for res in results]
+
+    @staticmethod
+    def _fallback() -> MatchResult:
+        return MatchResult(
+            mentor_id="default_mentor_01",
+            score=0.1,
+            rationale="Standard recommendation (cold start)."
+        )
@@ -0,0 +1,202 @@
+"""
+In-process metrics with Prometheus text exposition, plus per-request stage profiling.
+
+    with stage("index_search"):
+        ...
+
+times a block into the `mentorship_stage_seconds{stage=...}` histogram and, when a request
+opted into profiling (see profile()), into that request's stage breakdown. The breakdown is
+kept in a ContextVar, so it follows the request through awaits (and asyncio.to_thread).
+
+Kept dependency-free: a handful of counters and histograms guarded by one lock each.
+"""
+import contextlib
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+Labels = Tuple[str, ...]
+# (name, type, help, [(label dict, value)]) produced by collectors at scrape time
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+# Seconds, from 50µs (cache hits, small searches) to 10s (large bulk encodes)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if not values:
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Labels = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        if not series:
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Labels = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Labels = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Registers a callback producing gauge-style families (index sizes, cache stats) at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus text format. Families without samples are left out, so the registries of
+        an HTTP worker and the state owner can be concatenated without duplicates."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, help, samples in collector():
+                if not samples:
+                    continue
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    label_text = _format_labels(tuple(labels), tuple(labels.values()))
+                    lines.append(f"{name}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "mentorship_stage_seconds", "Time spent in each hot-path stage", ("stage",))
+BATCH_SIZE = REGISTRY.histogram(
+    "mentorship_batch_size", "Items per batch (encoder micro-batches, ingest chunks, batch matches)",
+    ("kind",), buckets=SIZE_BUCKETS)
+SESSIONS_INGESTED = REGISTRY.counter(
+    "mentorship_sessions_ingested_total", "Sessions applied to the Profile Graphs")
+HTTP_SECONDS = REGISTRY.histogram(
+    "mentorship_http_request_seconds", "HTTP request latency until the response starts", ("method", "route", "status"))
+
+# Stage name -> seconds for the current request, when it asked for a breakdown
+_profile: ContextVar[Optional[Dict[str, float]]] = ContextVar("mentorship_profile", default=None)
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, name)
+        breakdown = _profile.get()
+        if breakdown is not None:
+            breakdown[name] = breakdown.get(name, 0.0) + elapsed
+
+
+def timed(name: str):
+    """Decorator form of stage() for synchronous functions."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextlib.contextmanager
+def profile() -> Iterator[Dict[str, float]]:
+    """Collects a stage -> seconds breakdown for everything timed inside the block."""
+    breakdown: Dict[str, float] = {}
+    token = _profile.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _profile.reset(token)
+
+
+def add_to_profile(breakdown: Dict[str, float]):
+    """Merges a breakdown measured elsewhere (the state owner) into the current request's."""
+    current = _profile.get()
+    if current is not None:
+        for name, seconds in breakdown.items():
+            current[name] = current.get(name, 0.0) + seconds
+
+
+def server_timing(breakdown: Dict[str, float], total: float) -> str:
+    """Formats a breakdown as a Server-Timing header value (durations in ms)."""
+    entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in breakdown.items()]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
@@ -31,8 +31,60 @@ class UserGraph(BaseModel):
 class MatchRequest(BaseModel):
     user_id: str
     top_k: int = 3
+    # Exact-match filters on mentor profile attributes (taken from Session.metadata)
+    filters: Dict[str, Any] = {}
 
 class MatchResult(BaseModel):
     mentor_id: str
     score: float
     rationale: str
+
+class BatchMatchRequest(BaseModel):
+    user_ids: List[str]
+    top_k: int = 3
+    # Applied to every user in the batch
+    filters: Dict[str, Any] = {}
+
+class AssignmentRequest(BaseModel):
+    # Defaults to every mentee / mentor profile
+    mentee_ids: Optional[List[str]] = None
+    mentor_ids: Optional[List[str]] = None
+    # Mentees per mentor: per-mentor override, else the mentor's "capacity" attribute, else this default
+    capacity: int = 1
+    capacities: Dict[str, int] = {}
+    filters: Dict[str, Any] = {}
+    solver: str = "auto"  # "auto", "hungarian" or "auction"
+    # Candidate mentors considered per mentee by the auction solver
+    candidates: int = 50
+
+class Assignment(BaseModel):
+    mentee_id: str
+    mentor_id: str
+    score: float
+
+class AssignmentResult(BaseModel):
+    assignments: List[Assignment]
+    unassigned: List[str] = []
+    total_score: float
+    solver: str
+
+class BulkSessionRequest(BaseModel):
+    # Raw items (not even required to be objects) so one malformed session is reported per item
+    # instead of rejecting the whole batch
+    sessions: List[Any]
+
+class BulkItemError(BaseModel):
+    index: int
+    session_id: Optional[str] = None
+    error: str
+
+class BulkIngestResult(BaseModel):
+    processed: int
+    failed: int
+    users_updated: int
+    errors: List[BulkItemError] = []
+
+class GraphPage(BaseModel):
+    users: Dict[str, Any]
+    next_cursor: Optional[str] = None
+    total: int
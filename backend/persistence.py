@@ -0,0 +1,236 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import pickle
+import shutil
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from graph_logic import GraphBuilder
+from embeddings import EmbeddingManager
+from wal import SessionLog
+from scheduler import run_inline
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+EMBEDDINGS_FILE = "embeddings.pkl"
+PARTITIONS_FILE = "partitions.pkl"
+GRAPHS_FILE = "graphs.pkl"
+
+
+def _index_file(number: int) -> str:
+    return f"index-{number}.faiss"
+
+
+class _PartitionPickler(pickle.Pickler):
+    """Pickles partitions with their FAISS indexes replaced by references to index-<n>.faiss files."""
+
+    def __init__(self, file, indexes: List[faiss.Index]):
+        super().__init__(file, protocol=5)
+        self.indexes = indexes
+
+    def persistent_id(self, obj):
+        if isinstance(obj, faiss.Index):
+            # A copy, so the write thread doesn't race later updates to the live index.
+            self.indexes.append(faiss.clone_index(obj))
+            return len(self.indexes) - 1
+        return None
+
+
+class _PartitionUnpickler(pickle.Unpickler):
+    def __init__(self, file, directory: str):
+        super().__init__(file)
+        self.directory = directory
+
+    def persistent_load(self, number):
+        # Memory-mapped where the index type allows it (IVF lists are mapped read-only, see IVFIndex).
+        return faiss.read_index(os.path.join(self.directory, _index_file(number)), faiss.IO_FLAG_MMAP)
+
+
+class SnapshotManager:
+    """
+    Durable snapshots of the in-memory state: FAISS partitions, row metadata and Profile Graphs.
+
+    Layout of `directory/current`:
+        vectors.f32      raw float32 rows (n x dimension), memory-mapped on restore
+        embeddings.pkl   row metadata and the rest of the embedding manager's state
+        partitions.pkl   VectorIndex wrappers (row maps, tombstones)
+        index-<n>.faiss  FAISS indexes of HNSW/IVF partitions (faiss.write_index), memory-mapped
+                         on restore; Flat partitions are rebuilt from vectors.f32 instead
+        graphs.pkl       GraphBuilder store and cached contexts
+        manifest.json    version, counts and dimension, written last
+
+    A snapshot is captured through `run` (MentorshipService passes its state executor, so no
+    request interleaves with the capture and the event loop stays free) and written from a thread into a temporary directory that is then swapped in with rename,
+    so a crash mid-write leaves the previous snapshot intact.
+
+    With a session log, the manifest records the log offset the snapshot covers
+    (`extra["wal_offset"]`) and log segments before it are deleted once it is written.
+    Sessions after that offset that were already applied when the snapshot was captured are
+    listed in the graph state (GraphBuilder.logged_offsets), so replay applies each exactly once.
+    """
+
+    def __init__(self, directory: str, graph_builder: GraphBuilder, embedding_manager: EmbeddingManager,
+                 interval_seconds: float = 0, session_log: Optional[SessionLog] = None,
+                 run: Callable[..., Awaitable[Any]] = run_inline):
+        self.directory = directory
+        self.graph_builder = graph_builder
+        self.embedding_manager = embedding_manager
+        self.session_log = session_log
+        if session_log is not None:
+            graph_builder.logged_offsets = set()
+        self.interval_seconds = interval_seconds
+        self.run = run
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.last_snapshot: Optional[Dict[str, Any]] = None
+
+    @property
+    def current(self) -> str:
+        return os.path.join(self.directory, "current")
+
+    def capture(self, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Serializes the current state into memory. Must not interleave with writes."""
+        if self.session_log and extra and "wal_offset" in extra:
+            self.graph_builder.forget_logged_before(extra["wal_offset"])
+        vectors, embedding_state = self.embedding_manager.export_state()
+        indexes: List[faiss.Index] = []
+        partitions = io.BytesIO()
+        _PartitionPickler(partitions, indexes).dump(embedding_state["partitions"])
+        return {
+            "vectors": np.array(vectors, dtype='float32', copy=True),
+            "embeddings": pickle.dumps({**embedding_state, "partitions": None}, protocol=5),
+            "partitions": partitions.getvalue(),
+            "indexes": indexes,
+            "graphs": pickle.dumps(self.graph_builder.export_state(), protocol=5),
+            "manifest": {
+                "version": SNAPSHOT_VERSION,
+                "created_at": time.time(),
+                "dimension": self.embedding_manager.dimension,
+                "model_name": self.embedding_manager.cache.model_name,
+                "rows": len(vectors),
+                "users": len(self.embedding_manager.user_rows),
+                "graph_users": self.graph_builder.user_count(),
+                "extra": extra or {},
+            },
+        }
+
+    def write(self, captured: Dict[str, Any]) -> Dict[str, Any]:
+        """Writes a captured snapshot to disk and atomically replaces the current one."""
+        os.makedirs(self.directory, exist_ok=True)
+        staging = os.path.join(self.directory, f".tmp-{os.getpid()}-{time.time_ns()}")
+        os.makedirs(staging)
+        try:
+            captured["vectors"].tofile(os.path.join(staging, VECTORS_FILE))
+            for name, key in ((EMBEDDINGS_FILE, "embeddings"), (PARTITIONS_FILE, "partitions"),
+                              (GRAPHS_FILE, "graphs")):
+                with open(os.path.join(staging, name), "wb") as f:
+                    f.write(captured[key])
+            for number, index in enumerate(captured["indexes"]):
+                faiss.write_index(index, os.path.join(staging, _index_file(number)))
+            with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+                json.dump(captured["manifest"], f)
+            for name in os.listdir(staging):
+                with open(os.path.join(staging, name), "rb") as f:
+                    os.fsync(f.fileno())
+
+            previous = os.path.join(self.directory, "previous")
+            if os.path.exists(previous):
+                shutil.rmtree(previous)
+            if os.path.exists(self.current):
+                os.rename(self.current, previous)
+            os.rename(staging, self.current)
+            shutil.rmtree(previous, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return captured["manifest"]
+
+    async def snapshot(self, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Captures state through `run` and writes it in a worker thread."""
+        async with self._lock:
+            if self.session_log:
+                # Read before the capture: every session before the offset is in it. Those after it
+                # that are applied by the time of the capture are recorded in GraphBuilder.logged_offsets
+                # and skipped by replay.
+                extra = {**(extra or {}), "wal_offset": self.session_log.checkpoint_offset()}
+            captured = await self.run(self.capture, extra)
+            start = time.time()
+            if self.session_log:
+                # New appends go to a fresh segment, so everything before the checkpoint can be dropped.
+                self.session_log.rotate()
+            manifest = await asyncio.to_thread(self.write, captured)
+            if self.session_log:
+                self.session_log.truncate_before(manifest["extra"]["wal_offset"])
+            logger.info("Wrote %d users / %d graphs to %s in %.2fs", manifest["users"], manifest["graph_users"],
+                        self.current, time.time() - start)
+            self.last_snapshot = manifest
+            return manifest
+
+    def restore(self) -> Optional[Dict[str, Any]]:
+        """
+        Loads the current snapshot, if any, into the graph builder and embedding manager.
+        Vectors are memory-mapped copy-on-write, so startup does not read the whole file;
+        pages are faulted in on access and the array moves to RAM when it first grows.
+        """
+        # A crash between the two renames in write() leaves only "previous".
+        path = self.current
+        if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            path = os.path.join(self.directory, "previous")
+            if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+                return None
+
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        if manifest["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {manifest['version']}")
+
+        start = time.time()
+        rows, dimension = manifest["rows"], manifest["dimension"]
+        if rows:
+            vectors = np.memmap(os.path.join(path, VECTORS_FILE), dtype='float32', mode='c',
+                                shape=(rows, dimension))
+        else:
+            vectors = np.zeros((1, dimension), dtype='float32')
+        with open(os.path.join(path, EMBEDDINGS_FILE), "rb") as f:
+            embedding_state = pickle.load(f)
+        with open(os.path.join(path, PARTITIONS_FILE), "rb") as f:
+            embedding_state["partitions"] = _PartitionUnpickler(f, path).load()
+        self.embedding_manager.restore_state(vectors, embedding_state)
+        with open(os.path.join(path, GRAPHS_FILE), "rb") as f:
+            self.graph_builder.restore_state(pickle.load(f))
+
+        logger.info("Restored %d users / %d graphs from %s in %.2fs", manifest["users"], manifest["graph_users"],
+                    path, time.time() - start)
+        self.last_snapshot = manifest
+        return manifest
+
+    def start(self):
+        """Starts periodic snapshots every interval_seconds (no-op when the interval is 0)."""
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                logger.exception("Periodic snapshot failed: %s", e)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,22 +1,130 @@
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
 import numpy as np
 
+MECHANISMS = ("laplace", "gaussian")
+# Rows noised per step; bounds the scratch buffer for large batches
+NOISE_CHUNK_ROWS = 4096
+
+
 class PrivacyEngine:
-    def __init__(self, epsilon: float = 1.0):
+    """
+    Differential privacy for embedding batches, applied before vectors are stored.
+
+    Each row is L2-clipped to `clip_norm`, so replacing one user's vector moves the batch by at
+    most 2 * clip_norm in L2 (the sensitivity), and then noise is added in place:
+      - laplace:  per-coordinate scale 2 * clip_norm * sqrt(d) / epsilon (L1 sensitivity bound)
+      - gaussian: sigma = 2 * clip_norm * sqrt(2 ln(1.25 / delta)) / epsilon ((epsilon, delta)-DP)
+    Every release charges `epsilon` to the user's budget (sequential composition); once a user
+    has spent `budget`, charge() refuses further releases and the stored vector is kept.
+    Noise comes from a per-engine np.random.Generator (seedable for reproducible runs).
+    """
+
+    def __init__(self, epsilon: float = 1.0, mechanism: str = "laplace", delta: float = 1e-5,
+                 clip_norm: float = 1.0, budget: Optional[float] = None, seed: Optional[int] = None):
+        if epsilon <= 0:
+            raise ValueError("epsilon must be positive")
+        if mechanism not in MECHANISMS:
+            raise ValueError(f"Unknown mechanism '{mechanism}'. Expected one of {MECHANISMS}.")
+        if budget is not None and budget < epsilon:
+            raise ValueError("budget must allow at least one release (budget >= epsilon)")
         self.epsilon = epsilon
+        self.mechanism = mechanism
+        self.delta = delta
+        self.clip_norm = clip_norm
+        self.budget = budget
+        self.rng = np.random.default_rng(seed)
+        # user_id -> epsilon spent so far
+        self.spent: Dict[str, float] = {}
+        # Generator and scratch buffer are not thread-safe
+        self._lock = threading.Lock()
+        self._scratch = np.empty(0, dtype='float32')
+
+    def noise_scale(self, dimension: int) -> float:
+        """Laplace scale b or Gaussian sigma per coordinate for `dimension`-d vectors."""
+        sensitivity = 2 * self.clip_norm
+        if self.mechanism == "gaussian":
+            return sensitivity * np.sqrt(2 * np.log(1.25 / self.delta)) / self.epsilon
+        return sensitivity * np.sqrt(dimension) / self.epsilon
+
+    def clip(self, vectors: np.ndarray) -> np.ndarray:
+        """Scales rows with L2 norm above clip_norm back onto the ball, in place."""
+        norms = np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+        factors = np.minimum(1.0, self.clip_norm / np.maximum(norms, 1e-12)).astype(vectors.dtype)
+        vectors *= factors[:, None]
+        return vectors
+
+    def privatize(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Clips and noises a C-contiguous float32 (n, d) matrix in place (no float64 temporaries);
+        returns it. Does not touch budgets; see charge().
+        """
+        if vectors.dtype != np.float32 or vectors.ndim != 2 or not vectors.flags.c_contiguous:
+            raise ValueError("privatize() needs a C-contiguous float32 (n, d) matrix")
+        self.clip(vectors)
+        scale = np.float32(self.noise_scale(vectors.shape[1]))
+        with self._lock:
+            for start in range(0, len(vectors), NOISE_CHUNK_ROWS):
+                block = vectors[start:start + NOISE_CHUNK_ROWS]
+                if self._scratch.size < block.size:
+                    self._scratch = np.empty(block.size, dtype='float32')
+                noise = self._scratch[:block.size].reshape(block.shape)
+                if self.mechanism == "gaussian":
+                    self.rng.standard_normal(dtype=np.float32, out=noise)
+                    noise *= scale
+                    block += noise
+                else:
+                    # Laplace(0, b) = b * (E1 - E2) for independent standard exponentials
+                    self.rng.standard_exponential(dtype=np.float32, out=noise)
+                    noise *= scale
+                    block += noise
+                    self.rng.standard_exponential(dtype=np.float32, out=noise)
+                    noise *= scale
+                    block -= noise
+        return vectors
 
     def add_noise(self, vector: np.ndarray) -> np.ndarray:
         """
-        Adds Laplace noise to the embedding vector for differential privacy.
+        Returns a clipped, noised copy of one vector (or a matrix of them).
+        """
+        noisy = np.array(vector, dtype='float32', order='C', ndmin=2)
+        self.privatize(noisy)
+        return noisy.reshape(np.shape(vector))
+
+    def charge(self, user_ids: List[str]) -> np.ndarray:
         """
-        # Scale of noise is 1/epsilon (simplified for MVP)
-        # In production, sensitivity analysis is required.
-        scale = 1.0 / self.epsilon
-        noise = np.random.laplace(0, scale, vector.shape)
-        return vector + noise
+        Charges one release of `epsilon` per user; returns a bool mask of the users whose
+        budget allowed it (users over budget are not charged).
+        """
+        allowed = np.ones(len(user_ids), dtype=bool)
+        for i, user_id in enumerate(user_ids):
+            spent = self.spent.get(user_id, 0.0)
+            if self.budget is not None and spent + self.epsilon > self.budget + 1e-12:
+                allowed[i] = False
+                continue
+            self.spent[user_id] = spent + self.epsilon
+        return allowed
+
+    def remaining_budget(self, user_id: str) -> Optional[float]:
+        if self.budget is None:
+            return None
+        return max(0.0, self.budget - self.spent.get(user_id, 0.0))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mechanism": self.mechanism,
+            "epsilon": self.epsilon,
+            "budget": self.budget,
+            "users": len(self.spent),
+            # (a copy: the state thread may add users while /health reads this)
+            "users_exhausted": sum(1 for spent in list(self.spent.values())
+                                   if self.budget is not None and spent + self.epsilon > self.budget + 1e-12),
+        }
 
     def anonymize_user_id(self, user_id: str) -> str:
         """
         Hashes user ID for simple pseudonymization.
         """
-        import hashlib
         return hashlib.sha256(user_id.encode()).hexdigest()[:12]
@@ -0,0 +1,199 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Rows aggregated per step; bounds the float32 scratch used by aggregate()
+AGGREGATE_CHUNK_ROWS = 65536
+
+
+class ProfileHistory:
+    """
+    Columnar history of per-user profile vectors, kept out of the live search index.
+
+    Every profile update appends one row: the vector (float16, half the size of the index's
+    float32), its timestamp and its owner. Only the time-decayed aggregate is searched:
+
+        aggregate(user) = sum_i w_i * v_i / sum_i w_i,   w_i = 2 ** ((t_i - t_newest) / half_life)
+
+    Weights are relative to the user's newest entry, so an aggregate does not drift with
+    wall-clock time and never needs recomputing until the user changes again.
+
+    Storage stays bounded: compact() (run automatically when the columns fill up) drops
+    removed users' rows, rows whose weight fell below `min_weight` and all but the newest
+    `max_per_user` rows of each user.
+    """
+
+    def __init__(self, dimension: int, half_life_seconds: float, max_per_user: int = 32,
+                 min_weight: float = 1e-3, initial_capacity: int = 1024):
+        if half_life_seconds <= 0:
+            raise ValueError("half_life_seconds must be positive")
+        self.dimension = dimension
+        self.half_life_seconds = half_life_seconds
+        self.max_per_user = max_per_user
+        self.min_weight = min_weight
+        self.size = 0
+        self._vectors = np.zeros((initial_capacity, dimension), dtype='float16')
+        self._timestamps = np.zeros(initial_capacity, dtype='float64')
+        # Owner of each row as an index into user_ids; -1 marks rows of removed users
+        self._owners = np.full(initial_capacity, -1, dtype='int64')
+        self.user_ids: List[str] = []
+        self._user_index: Dict[str, int] = {}
+        # Rows per owner, in append order, so a user's history is read without scanning the columns
+        self._rows: List[List[int]] = []
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _owner(self, user_id: str) -> int:
+        owner = self._user_index.get(user_id)
+        if owner is None:
+            owner = self._user_index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            self._rows.append([])
+        return owner
+
+    def _reserve(self, n: int):
+        if self.size + n <= len(self._owners):
+            return
+        self.compact()
+        capacity = len(self._owners)
+        # Grow when compaction freed less than half, so compactions stay amortized O(1) per row.
+        while self.size + n > capacity // 2:
+            capacity *= 2
+        if capacity != len(self._owners):
+            for name, fill in (("_vectors", 0), ("_timestamps", 0), ("_owners", -1)):
+                old = getattr(self, name)
+                grown = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+                grown[:self.size] = old[:self.size]
+                setattr(self, name, grown)
+
+    def append(self, user_ids: Sequence[str], vectors: np.ndarray, timestamps: Sequence[float]):
+        """Appends one (vector, timestamp) row per user."""
+        n = len(user_ids)
+        if n == 0:
+            return
+        self._reserve(n)
+        start = self.size
+        owners = [self._owner(user_id) for user_id in user_ids]
+        self._vectors[start:start + n] = vectors
+        self._timestamps[start:start + n] = timestamps
+        self._owners[start:start + n] = owners
+        for row, owner in enumerate(owners, start):
+            self._rows[owner].append(row)
+        self.size += n
+
+    def remove(self, user_id: str) -> bool:
+        """Forgets a user's history; the rows are reclaimed by the next compaction."""
+        owner = self._user_index.get(user_id)
+        if owner is None or not self._rows[owner]:
+            return False
+        self._owners[self._rows[owner]] = -1
+        self._rows[owner] = []
+        return True
+
+    def user_history(self, user_id: str):
+        """(timestamps, float32 vectors) of a user's rows, oldest first."""
+        owner = self._user_index.get(user_id)
+        rows = np.array(self._rows[owner] if owner is not None else [], dtype='int64')
+        order = np.argsort(self._timestamps[rows], kind='stable')
+        return self._timestamps[rows[order]], self._vectors[rows[order]].astype('float32')
+
+    def aggregate(self, user_ids: Sequence[str]) -> np.ndarray:
+        """
+        Time-decayed mean vector of each user, as float32 (len(user_ids), dimension).
+        Users without history get zero rows. One vectorized pass per chunk of rows:
+        per-user newest timestamps and sums come from reduceat over contiguous groups.
+        """
+        out = np.zeros((len(user_ids), self.dimension), dtype='float32')
+        groups = []
+        for position, user_id in enumerate(user_ids):
+            owner = self._user_index.get(user_id)
+            if owner is not None and self._rows[owner]:
+                groups.append((position, self._rows[owner]))
+
+        start = 0
+        while start < len(groups):
+            # Whole users per chunk, at least one, up to AGGREGATE_CHUNK_ROWS rows
+            end, rows_in_chunk = start, 0
+            while end < len(groups) and (end == start or rows_in_chunk + len(groups[end][1]) <= AGGREGATE_CHUNK_ROWS):
+                rows_in_chunk += len(groups[end][1])
+                end += 1
+            chunk = groups[start:end]
+            counts = np.fromiter((len(rows) for _, rows in chunk), dtype='int64', count=len(chunk))
+            rows = np.fromiter((row for _, rows in chunk for row in rows), dtype='int64', count=rows_in_chunk)
+            offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+            timestamps = self._timestamps[rows]
+            newest = np.repeat(np.maximum.reduceat(timestamps, offsets), counts)
+            weights = np.exp2((timestamps - newest) / self.half_life_seconds).astype('float32')
+            weighted = self._vectors[rows].astype('float32')
+            weighted *= weights[:, None]
+            sums = np.add.reduceat(weighted, offsets, axis=0)
+            sums /= np.add.reduceat(weights, offsets)[:, None]
+            out[[position for position, _ in chunk]] = sums
+            start = end
+        return out
+
+    def compact(self):
+        """Drops removed users' rows, rows decayed below min_weight and rows past max_per_user."""
+        live = np.flatnonzero(self._owners[:self.size] >= 0)
+        owners, timestamps = self._owners[live], self._timestamps[live]
+        # Group by owner, newest first, to rank each row within its user's history
+        order = np.lexsort((-timestamps, owners))
+        owners, timestamps, live = owners[order], timestamps[order], live[order]
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]]) if len(owners) else np.zeros(0, dtype='int64')
+        counts = np.diff(np.r_[starts, len(owners)])
+        rank = np.arange(len(owners)) - np.repeat(starts, counts)
+        newest = np.repeat(timestamps[starts], counts)
+        weights = np.exp2((timestamps - newest) / self.half_life_seconds)
+        keep = np.sort(live[(rank < self.max_per_user) & (weights >= self.min_weight)])
+
+        n = len(keep)
+        self._vectors[:n] = self._vectors[keep]
+        self._timestamps[:n] = self._timestamps[keep]
+        self._owners[:n] = self._owners[keep]
+        self._owners[n:self.size] = -1
+        self.size = n
+        self._rebuild_rows()
+
+    def _rebuild_rows(self):
+        self._rows = [[] for _ in self.user_ids]
+        for row, owner in enumerate(self._owners[:self.size].tolist()):
+            if owner >= 0:
+                self._rows[owner].append(row)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.size,
+            "users": sum(1 for rows in self._rows if rows),
+            "bytes": self.size * (self._vectors.itemsize * self.dimension + 16),
+            "half_life_seconds": self.half_life_seconds,
+        }
+
+    def export_state(self) -> Dict[str, Any]:
+        return {
+            "dimension": self.dimension,
+            "vectors": self._vectors[:self.size].copy(),
+            "timestamps": self._timestamps[:self.size].copy(),
+            "owners": self._owners[:self.size].copy(),
+            "user_ids": list(self.user_ids),
+        }
+
+    def restore_state(self, state: Optional[Dict[str, Any]]):
+        """Replaces the history with an exported one (or clears it for None)."""
+        if state is None:
+            state = {"dimension": self.dimension, "vectors": np.zeros((0, self.dimension), dtype='float16'),
+                     "timestamps": np.zeros(0), "owners": np.zeros(0, dtype='int64'), "user_ids": []}
+        if state["dimension"] != self.dimension:
+            raise ValueError(f"History dimension {state['dimension']} does not match {self.dimension}")
+        self.size = len(state["owners"])
+        capacity = max(1024, 2 * self.size)
+        self._vectors = np.zeros((capacity, self.dimension), dtype='float16')
+        self._timestamps = np.zeros(capacity, dtype='float64')
+        self._owners = np.full(capacity, -1, dtype='int64')
+        self._vectors[:self.size] = state["vectors"]
+        self._timestamps[:self.size] = state["timestamps"]
+        self._owners[:self.size] = state["owners"]
+        self.user_ids = list(state["user_ids"])
+        self._user_index = {user_id: owner for owner, user_id in enumerate(self.user_ids)}
+        self._rebuild_rows()
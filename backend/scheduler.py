@@ -0,0 +1,241 @@
+"""
+Request scheduling: keeps the event loop free and sheds load instead of queueing without bound.
+
+StateExecutor
+    Runs every operation on the in-memory state (graph updates, index upserts, searches,
+    snapshots) on one dedicated thread, so blocking CPU work never stalls the event loop and
+    the non-thread-safe structures are never touched concurrently. Jobs are taken in deadline
+    order: a job's deadline is its enqueue time plus `priority * priority_delay`, so a /match
+    overtakes ingest work queued less than `priority_delay` earlier, yet nothing starves.
+
+ConcurrencyLimiter
+    Per endpoint class (match, ingest) admission control in front of the handlers: at most
+    `limit` requests in flight and `max_queue` waiting. A full queue answers 429 and a wait
+    longer than `queue_timeout` answers 503, both with a Retry-After estimated from recent
+    service times.
+"""
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+from metrics import REGISTRY, Family, add_to_profile
+
+# Job priorities on the state thread (lower runs first)
+INTERACTIVE = 0
+INGEST = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", INGEST: "ingest", BACKGROUND: "background"}
+
+STATE_QUEUE_SECONDS = REGISTRY.histogram(
+    "mentorship_state_queue_seconds", "Time jobs waited for the state thread", ("priority",))
+REJECTED = REGISTRY.counter(
+    "mentorship_requests_rejected_total", "Requests shed by admission control", ("class", "reason"))
+
+
+async def run_inline(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Default `run` of components used without a StateExecutor (scripts, tests): calls fn in place."""
+    return fn(*args, **kwargs)
+
+
+class Overloaded(Exception):
+    """Raised by ConcurrencyLimiter; main.py turns it into a 429/503 with Retry-After."""
+
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class StateExecutor:
+    def __init__(self, priority_delay: float = 0.25):
+        self.priority_delay = priority_delay
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.busy_seconds = 0.0
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._worker, name="state", daemon=True)
+        self._thread.start()
+
+    async def run(self, priority: int, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs fn(*args, **kwargs) on the state thread and returns its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # The caller's context travels with the job, so stage timings reach its request profile.
+        context = contextvars.copy_context()
+        now = time.monotonic()
+        with self._cv:
+            if self._closed:
+                raise RuntimeError("State executor is closed")
+            if self._thread is None:
+                self._start()
+            heapq.heappush(self._heap, (now + priority * self.priority_delay, next(self._seq), priority, now,
+                                        future, loop, context, fn, args, kwargs))
+            self._cv.notify()
+        return await future
+
+    @classmethod
+    def from_env(cls) -> "StateExecutor":
+        return cls(priority_delay=float(os.getenv("STATE_PRIORITY_DELAY_MS", "250")) / 1000)
+
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def _worker(self):
+        while True:
+            with self._cv:
+                while not self._heap and not self._closed:
+                    self._cv.wait()
+                if not self._heap:
+                    return
+                _, _, priority, enqueued, future, loop, context, fn, args, kwargs = heapq.heappop(self._heap)
+            start = time.monotonic()
+            waited = start - enqueued
+            STATE_QUEUE_SECONDS.observe(waited, PRIORITY_NAMES.get(priority, str(priority)))
+            try:
+                context.run(add_to_profile, {"state_queue": waited})
+                result, error = context.run(fn, *args, **kwargs), None
+            except BaseException as e:
+                result, error = None, e
+            self.busy_seconds += time.monotonic() - start
+            try:
+                loop.call_soon_threadsafe(_resolve, future, result, error)
+            except RuntimeError:
+                pass  # The caller's loop is gone (shutdown)
+
+    def close(self):
+        """Lets queued jobs finish, then stops the thread."""
+        with self._cv:
+            self._closed = True
+            self._cv.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def _resolve(future: asyncio.Future, result: Any, error: Optional[BaseException]):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class ConcurrencyLimiter:
+    # Weight of the latest request in the service-time average behind Retry-After
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        if limit < 1:
+            raise ValueError(f"{name} concurrency limit must be at least 1")
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_seconds = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: the queue ahead, drained `limit` at a time."""
+        return max(1, math.ceil((self.waiting + 1) * self._service_seconds / self.limit))
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            REJECTED.inc(1, self.name, "queue_full")
+            raise Overloaded(429, self.retry_after(), f"Too many {self.name} requests queued")
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            # The slot is handed over by release(), so `active` already counts this request.
+            await asyncio.wait_for(future, self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Handed a slot just as the request gave up (client disconnect): pass it on.
+                self._hand_over()
+            elif future in self._waiters:
+                # (release() may already have skipped past it)
+                self._waiters.remove(future)
+            if isinstance(e, asyncio.TimeoutError):
+                REJECTED.inc(1, self.name, "queue_timeout")
+                raise Overloaded(503, self.retry_after(), f"Timed out waiting for a {self.name} slot")
+            raise
+
+    def release(self, elapsed: float):
+        self._service_seconds += self.EWMA_ALPHA * (elapsed - self._service_seconds)
+        self._hand_over()
+
+    def _hand_over(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Holds one admission slot for the block (raises Overloaded instead of entering)."""
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+
+class Admission:
+    """The limiters of one HTTP process, keyed by endpoint class."""
+
+    def __init__(self, limiters: Dict[str, ConcurrencyLimiter]):
+        self.limiters = limiters
+        REGISTRY.add_collector(self._collect_metrics)
+
+    def __getitem__(self, name: str) -> ConcurrencyLimiter:
+        return self.limiters[name]
+
+    def slot(self, name: str):
+        return self.limiters[name].slot()
+
+    @classmethod
+    def from_env(cls) -> "Admission":
+        """MATCH_* and INGEST_* CONCURRENCY / QUEUE_SIZE / QUEUE_TIMEOUT_MS, with the defaults below."""
+        return cls({
+            name: ConcurrencyLimiter(
+                name,
+                limit=int(os.getenv(f"{prefix}_CONCURRENCY", limit)),
+                max_queue=int(os.getenv(f"{prefix}_QUEUE_SIZE", queue)),
+                queue_timeout=float(os.getenv(f"{prefix}_QUEUE_TIMEOUT_MS", timeout_ms)) / 1000,
+            )
+            for name, prefix, limit, queue, timeout_ms in (
+                ("match", "MATCH", 64, 256, 1000),
+                ("ingest", "INGEST", 8, 64, 5000),
+            )
+        })
+
+    def _collect_metrics(self) -> List[Family]:
+        return [
+            ("mentorship_requests_in_flight", "gauge", "Admitted requests per class",
+             [({"class": name}, limiter.active) for name, limiter in self.limiters.items()]),
+            ("mentorship_requests_queued", "gauge", "Requests waiting for admission per class",
+             [({"class": name}, limiter.waiting) for name, limiter in self.limiters.items()]),
+        ]
@@ -0,0 +1,66 @@
+"""
+Runs the API with several HTTP worker processes sharing one copy of the state.
+
+    python serve.py --workers 4 --port 8000
+
+A state-owner process builds the graphs, index and encoder (loading the model once) and
+serves them on a Unix socket (ipc.py); uvicorn then starts N workers with STATE_SOCKET set,
+so each worker parses and serializes requests on its own core and forwards the state
+operations to the owner. With --workers 1 the app runs in-process as before.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import uvicorn
+
+
+def run_state_owner(path: str):
+    from ipc import serve_state
+    asyncio.run(serve_state(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--socket", help="Unix socket the state owner listens on "
+                                          "(default: state.sock in a new private temporary directory)")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        uvicorn.run("main:app", host=args.host, port=args.port)
+        return
+
+    socket_dir = None
+    if args.socket is None:
+        # mkdtemp creates the directory with mode 0700, so no other user can reach the socket.
+        socket_dir = tempfile.mkdtemp(prefix="mentorship-")
+        args.socket = os.path.join(socket_dir, "state.sock")
+
+    owner = multiprocessing.get_context("spawn").Process(target=run_state_owner, args=(args.socket,), name="state-owner")
+    owner.start()
+    # Startup restores snapshots / replays the log before the socket appears.
+    while not os.path.exists(args.socket):
+        if not owner.is_alive():
+            raise SystemExit("[X] State owner failed to start")
+        time.sleep(0.1)
+
+    os.environ["STATE_SOCKET"] = args.socket
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        # SIGTERM lets the owner take its final snapshot and flush the session log.
+        owner.terminate()
+        owner.join()
+        if socket_dir is not None:
+            shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
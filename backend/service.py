@@ -0,0 +1,336 @@
+import asyncio
+import functools
+import logging
+import os
+import numpy as np
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from models import Session, MatchRequest, MatchResult, BatchMatchRequest, AssignmentRequest, AssignmentResult, BulkItemError, BulkIngestResult
+from graph_logic import GraphBuilder
+from extraction import EntityExtractor
+from embeddings import EmbeddingManager
+from vector_index import IndexConfig
+from text_encoders import create_text_encoder
+from privacy import PrivacyEngine
+from profile_history import ProfileHistory
+from matching import MatchingEngine
+from encoder import BatchingEncoder
+from ingest import SessionIngestor, ingest_ndjson
+from persistence import SnapshotManager
+from wal import SessionLog
+from metrics import REGISTRY, SESSIONS_INGESTED, Family, stage
+from scheduler import BACKGROUND, INGEST, INTERACTIVE, StateExecutor
+
+logger = logging.getLogger(__name__)
+
+# When the text encoder is loaded: in a thread while serving (warming up after),
+# before serving, or on the first encode.
+ENCODER_PRELOAD_MODES = ("background", "eager", "lazy")
+
+
+class MentorshipService:
+    """
+    Owns all mutable state (Profile Graphs, vector index, encoder, log and snapshots)
+    behind the async operations the API exposes.
+
+    In single-process mode main.py calls it directly. With several HTTP workers, one
+    state-owner process hosts it (see ipc.py) and every worker talks to it through a
+    StateClient exposing the same methods, so all workers see one consistent index and
+    the model is loaded once.
+
+    Every read or write of that state runs on the StateExecutor's single thread (see
+    scheduler.py), so the event loop never blocks on graph updates or index searches and
+    interactive jobs (matches, graph reads) go ahead of queued ingest work.
+    """
+
+    # Methods a StateClient may call remotely.
+    REMOTE_METHODS = ("process_session", "ingest", "find_matches", "find_matches_batch", "assign_mentors",
+                      "graph_page", "user_graph", "snapshot", "health", "metrics_text")
+
+    def __init__(self, graph_builder: GraphBuilder, embedding_manager: EmbeddingManager,
+                 encoder: BatchingEncoder, session_log: Optional[SessionLog] = None,
+                 snapshot_manager: Optional[SnapshotManager] = None, match_cache_size: int = 10000,
+                 precompute_interval_seconds: float = 0, precompute_limit: int = 1000,
+                 encoder_preload: str = "background", match_hybrid: str = "off",
+                 executor: Optional[StateExecutor] = None):
+        self.graph_builder = graph_builder
+        self.embedding_manager = embedding_manager
+        self.encoder = encoder
+        self.session_log = session_log
+        self.snapshot_manager = snapshot_manager
+        self.executor = executor or StateExecutor()
+        if snapshot_manager:
+            snapshot_manager.run = functools.partial(self.executor.run, INGEST)
+        self.privacy_engine = embedding_manager.privacy
+        self.matching_engine = MatchingEngine(embedding_manager, cache_size=match_cache_size,
+                                              entity_index=graph_builder.entity_index, hybrid=match_hybrid)
+        self.precompute_interval_seconds = precompute_interval_seconds
+        self.precompute_limit = precompute_limit
+        self._precompute_task: Optional[asyncio.Task] = None
+        if encoder_preload not in ENCODER_PRELOAD_MODES:
+            raise ValueError(f"Unknown encoder preload mode '{encoder_preload}'. Expected one of {ENCODER_PRELOAD_MODES}.")
+        self.encoder_preload = encoder_preload
+        self._encoder_task: Optional[asyncio.Task] = None
+        self.session_ingestor = SessionIngestor(graph_builder, embedding_manager, encoder, session_log=session_log,
+                                                run=functools.partial(self.executor.run, INGEST))
+        REGISTRY.add_collector(self._collect_metrics)
+
+    @classmethod
+    def from_env(cls) -> "MentorshipService":
+        """Builds the components from environment variables (see README)."""
+        graph_builder = GraphBuilder(
+            extractor=EntityExtractor.from_config(os.environ["EXTRACTION_RULES_PATH"])
+            if os.environ.get("EXTRACTION_RULES_PATH") else None,
+            max_session_nodes=int(os.environ["GRAPH_MAX_SESSION_NODES"]) if os.environ.get("GRAPH_MAX_SESSION_NODES") else None,
+            backend=os.environ.get("GRAPH_BACKEND", "networkx")
+        )
+        # Differential privacy on stored profile vectors (disabled unless PRIVACY_EPSILON is set)
+        privacy = PrivacyEngine(
+            epsilon=float(os.environ["PRIVACY_EPSILON"]),
+            mechanism=os.environ.get("PRIVACY_MECHANISM", "laplace"),
+            delta=float(os.environ.get("PRIVACY_DELTA", 1e-5)),
+            clip_norm=float(os.environ.get("PRIVACY_CLIP_NORM", 1.0)),
+            budget=float(os.environ["PRIVACY_BUDGET"]) if os.environ.get("PRIVACY_BUDGET") else None,
+            seed=int(os.environ["PRIVACY_SEED"]) if os.environ.get("PRIVACY_SEED") else None
+        ) if os.environ.get("PRIVACY_EPSILON") else None
+        embedding_manager = EmbeddingManager(
+            index_config=IndexConfig.from_env(),
+            cache_size=int(os.environ.get("EMBEDDING_CACHE_SIZE", 10000)),
+            cache_dir=os.environ.get("EMBEDDING_CACHE_DIR") or None,
+            feature_weights=np.load(os.environ["EMBEDDING_FEATURE_WEIGHTS"])
+            if os.environ.get("EMBEDDING_FEATURE_WEIGHTS") else None,
+            text_encoder=create_text_encoder(
+                os.environ.get("ENCODER_BACKEND", "torch"),
+                model_name=os.environ.get("ENCODER_MODEL", "all-MiniLM-L6-v2"),
+                dimension=int(os.environ.get("EMBEDDING_DIMENSION", 384)),
+                model_dir=os.environ.get("ENCODER_MODEL_DIR") or None,
+                threads=int(os.environ.get("ENCODER_THREADS", 0))
+            ),
+            privacy=privacy,
+            # Profile history with time-decayed aggregation (disabled unless a half-life is set)
+            history=ProfileHistory(
+                int(os.environ.get("EMBEDDING_DIMENSION", 384)),
+                half_life_seconds=float(os.environ["PROFILE_HISTORY_HALF_LIFE_DAYS"]) * 86400,
+                max_per_user=int(os.environ.get("PROFILE_HISTORY_MAX_PER_USER", 32)),
+                min_weight=float(os.environ.get("PROFILE_HISTORY_MIN_WEIGHT", 1e-3))
+            ) if os.environ.get("PROFILE_HISTORY_HALF_LIFE_DAYS") else None
+        )
+        # Micro-batches profile encodes from concurrent /session requests off the event loop
+        encoder = BatchingEncoder(
+            embedding_manager.encode_batch,
+            max_batch_size=int(os.environ.get("ENCODER_MAX_BATCH_SIZE", 32)),
+            max_wait_ms=float(os.environ.get("ENCODER_MAX_WAIT_MS", 5)),
+            workers=int(os.environ.get("ENCODER_WORKERS", 1))
+        )
+        # Write-ahead session log (disabled unless WAL_DIR is set)
+        session_log = SessionLog(
+            os.environ["WAL_DIR"],
+            group_commit_ms=float(os.environ.get("WAL_GROUP_COMMIT_MS", 2)),
+            fsync=os.environ.get("WAL_FSYNC", "1") != "0"
+        ) if os.environ.get("WAL_DIR") else None
+        # Durable snapshots (disabled unless SNAPSHOT_DIR is set)
+        snapshot_manager = SnapshotManager(
+            os.environ["SNAPSHOT_DIR"], graph_builder, embedding_manager,
+            interval_seconds=float(os.environ.get("SNAPSHOT_INTERVAL_SECONDS", 300)),
+            session_log=session_log
+        ) if os.environ.get("SNAPSHOT_DIR") else None
+        return cls(graph_builder, embedding_manager, encoder, session_log, snapshot_manager,
+                   match_cache_size=int(os.environ.get("MATCH_CACHE_SIZE", 10000)),
+                   precompute_interval_seconds=float(os.environ.get("MATCH_PRECOMPUTE_INTERVAL_SECONDS", 0)),
+                   precompute_limit=int(os.environ.get("MATCH_PRECOMPUTE_LIMIT", 1000)),
+                   encoder_preload=os.environ.get("ENCODER_PRELOAD", "background"),
+                   match_hybrid=os.environ.get("MATCH_HYBRID", "off"),
+                   executor=StateExecutor.from_env())
+
+    async def start(self):
+        # Model loading runs in a thread, overlapping snapshot restore and log replay.
+        if self.encoder_preload == "eager":
+            await asyncio.to_thread(self._load_encoder)
+        elif self.encoder_preload == "background":
+            self._encoder_task = asyncio.get_running_loop().create_task(asyncio.to_thread(self._load_encoder))
+        manifest = None
+        if self.snapshot_manager:
+            # Restore the last snapshot instead of re-encoding every transcript.
+            manifest = self.snapshot_manager.restore()
+        if self.session_log:
+            # Then replay sessions logged after it (WAL_REPLAY_FROM overrides the checkpoint).
+            offset = manifest["extra"].get("wal_offset", 0) if manifest else 0
+            if os.environ.get("WAL_REPLAY_FROM"):
+                offset = int(os.environ["WAL_REPLAY_FROM"])
+            await self.session_ingestor.replay(offset)
+        if self.snapshot_manager:
+            self.snapshot_manager.start()
+        if self.precompute_interval_seconds > 0:
+            self._precompute_task = asyncio.get_running_loop().create_task(self._precompute_matches())
+
+    def _load_encoder(self):
+        encoder = self.embedding_manager.encoder
+        try:
+            encoder.load()
+            encoder.warmup()
+        except Exception as e:
+            # Encodes retry the load; /health reports the error meanwhile.
+            logger.exception("Model load failed: %s", e)
+
+    async def _precompute_matches(self):
+        """Background job: keeps cached top-K rankings of recently active mentees fresh."""
+        while True:
+            await asyncio.sleep(self.precompute_interval_seconds)
+            try:
+                refreshed = await self.executor.run(BACKGROUND, self.matching_engine.refresh_cache,
+                                                    self.precompute_limit)
+                if refreshed:
+                    logger.info("Precomputed matches for %d users", refreshed)
+            except Exception as e:
+                logger.exception("Match precompute failed: %s", e)
+
+    async def close(self):
+        if self._encoder_task is not None:
+            self._encoder_task.cancel()
+            self._encoder_task = None
+        if self._precompute_task is not None:
+            self._precompute_task.cancel()
+            try:
+                await self._precompute_task
+            except asyncio.CancelledError:
+                pass
+            self._precompute_task = None
+        if self.snapshot_manager:
+            await self.snapshot_manager.stop()
+            await self.snapshot_manager.snapshot()
+        if self.session_log:
+            await self.session_log.close()
+        await self.encoder.close()
+        await asyncio.to_thread(self.executor.close)
+
+    def _graph_update(self, session: Session, log_offset: Optional[int] = None) -> str:
+        """Applies one session to its user's graph and returns the rebuilt context (state thread)."""
+        self.graph_builder.process_session(session, log_offset)
+        SESSIONS_INGESTED.inc()
+        return self.graph_builder.get_user_context(session.user_id)
+
+    def _upsert_if_current(self, session: Session, context: str, vector: np.ndarray) -> Optional[str]:
+        """Upserts the vector encoded from `context` if that is still the user's context (state thread).
+        Returns None once stored, else the current context to encode instead."""
+        current = self.graph_builder.get_user_context(session.user_id)
+        if current != context:
+            return current or None
+        self.embedding_manager.upsert_user_vector(
+            user_id=session.user_id,
+            vector=vector,
+            user_type=session.user_type,
+            context_text=context,
+            attributes=session.metadata,
+            timestamp=session.timestamp.timestamp()
+        )
+        return None
+
+    async def process_session(self, session: Session) -> Dict[str, Any]:
+        ticket = None
+        try:
+            # Log the session durably before any state is mutated
+            if self.session_log:
+                with stage("wal_append"):
+                    ticket, = await self.session_log.append([session.model_dump(mode="json")])
+
+            # Build graph from session data
+            # [ARCH UPDATE] Generate Embedding from Profile Graph (AI Hive "EV")
+            # 1. Get the updated context from the graph
+            user_context = await self.executor.run(INGEST, self._graph_update, session, ticket)
+
+            # 2. Update the User's Embedding Vector
+            # Encoding is awaited on the batching encoder so the event loop stays free during inference.
+            # A newer session for the same user may change the context while this one encodes;
+            # then the current context is encoded instead, so a stale vector never lands last.
+            while user_context:
+                with stage("encode"):
+                    vector = await self.encoder.encode(user_context)
+                user_context = await self.executor.run(INGEST, self._upsert_if_current, session, user_context, vector)
+
+            # (Optional) We can still keep session-level embeddings if we want granular search
+            # self.embedding_manager.generate_embeddings_for_session(session)
+        finally:
+            if ticket is not None:
+                self.session_log.applied(ticket)
+
+        return {
+            "message": "Session processed successfully",
+            "session_id": session.session_id
+        }
+
+    async def ingest(self, records: List[Tuple[int, Any]]) -> Tuple[int, List[BulkItemError]]:
+        return await self.session_ingestor.ingest(records)
+
+    async def ingest_ndjson(self, chunks: AsyncIterator[bytes], chunk_size: int = 500) -> BulkIngestResult:
+        # Parsed locally (in the HTTP worker) and applied chunk by chunk through ingest().
+        return await ingest_ndjson(chunks, self.ingest, chunk_size=chunk_size)
+
+    async def find_matches(self, request: MatchRequest) -> List[MatchResult]:
+        return await self.executor.run(INTERACTIVE, self.matching_engine.find_matches, request)
+
+    async def find_matches_batch(self, request: BatchMatchRequest) -> Dict[str, List[MatchResult]]:
+        return await self.executor.run(INTERACTIVE, self.matching_engine.find_matches_batch, request)
+
+    async def assign_mentors(self, request: AssignmentRequest) -> AssignmentResult:
+        return await self.executor.run(INGEST, self.matching_engine.assign_mentors, request)
+
+    async def graph_page(self, start: int, limit: int) -> Tuple[Dict[str, Any], Optional[int], int]:
+        return await self.executor.run(INTERACTIVE, self._graph_page, start, limit)
+
+    def _graph_page(self, start: int, limit: int) -> Tuple[Dict[str, Any], Optional[int], int]:
+        users, next_cursor = self.graph_builder.get_graph_page(start, limit)
+        return users, next_cursor, self.graph_builder.user_count()
+
+    async def user_graph(self, user_id: str) -> Dict[str, Any]:
+        return await self.executor.run(INTERACTIVE, self.graph_builder.get_graph_data, user_id)
+
+    async def snapshot(self) -> Optional[Dict[str, Any]]:
+        if not self.snapshot_manager:
+            return None
+        return await self.snapshot_manager.snapshot()
+
+    def _collect_metrics(self) -> List[Family]:
+        """Gauges and cache counters read from the components at scrape time."""
+        em = self.embedding_manager
+        users = len(em.user_rows)
+        rows = em.current_id - len(em._free_rows)
+        families: List[Family] = [
+            ("mentorship_index_vectors", "gauge", "Vectors held per index partition",
+             [({"partition": name}, len(index)) for name, index in list(em.partitions.items())]),
+            ("mentorship_users", "gauge", "Users with a profile vector", [({}, users)]),
+            ("mentorship_vectors_per_user", "gauge", "Allocated vector rows per profiled user",
+             [({}, rows / users if users else 0.0)]),
+            ("mentorship_graph_users", "gauge", "Users with a Profile Graph", [({}, self.graph_builder.user_count())]),
+        ]
+        if em.history is not None:
+            history = em.history.stats()
+            families += [
+                ("mentorship_history_rows", "gauge", "Profile vectors kept in the history store", [({}, history["rows"])]),
+                ("mentorship_history_bytes", "gauge", "Approximate size of the history store", [({}, history["bytes"])]),
+            ]
+        for cache, stats in (("embedding", em.cache.stats()), ("match", self.matching_engine.cache.stats())):
+            families += [
+                (f"mentorship_{cache}_cache_hits_total", "counter", f"{cache.capitalize()} cache hits", [({}, stats["hits"])]),
+                (f"mentorship_{cache}_cache_misses_total", "counter", f"{cache.capitalize()} cache misses", [({}, stats["misses"])]),
+                (f"mentorship_{cache}_cache_entries", "gauge", f"{cache.capitalize()} cache entries", [({}, stats["entries"])]),
+                (f"mentorship_{cache}_cache_hit_ratio", "gauge", f"{cache.capitalize()} cache hit ratio", [({}, stats["hit_rate"])]),
+            ]
+        return families
+
+    async def metrics_text(self) -> str:
+        # Read in place, not queued behind ingest jobs: counters are locked and the collectors only
+        # read sizes and counters, which the state thread can change but never leaves inconsistent.
+        return REGISTRY.render()
+
+    async def health(self) -> Dict[str, Any]:
+        # Read in place like metrics_text, so a probe answers while the state thread is busy.
+        return {
+            "ready": self.embedding_manager.encoder.ready,
+            "encoder": self.embedding_manager.encoder.status(),
+            "embedding_cache": self.embedding_manager.cache.stats(),
+            "match_cache": self.matching_engine.cache.stats(),
+            "privacy": self.privacy_engine.stats() if self.privacy_engine else None,
+            "profile_history": self.embedding_manager.history.stats() if self.embedding_manager.history else None,
+            "last_snapshot": self.snapshot_manager.last_snapshot if self.snapshot_manager else None,
+            "state_queue": self.executor.pending()
+        }
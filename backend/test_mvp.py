@@ -77,13 +77,35 @@ def run_test():
     res_hank = requests.post(f"{BASE_URL}/match", json={"user_id": "mentee_hank", "top_k": 3})
     print(f"Match for Hank (Fundraising): {res_hank.json()}")
 
+    # Batch matching should agree with the single-user calls
+    res_batch = requests.post(f"{BASE_URL}/match/batch",
+                              json={"user_ids": ["mentee_frank", "mentee_grace", "mentee_hank"], "top_k": 3})
+    batch = res_batch.json()
+    if batch.get("mentee_frank") == res_frank.json() and batch.get("mentee_hank") == res_hank.json():
+        print(f"[\u2713] Batch match agrees for {len(batch)} mentees")
+    else:
+        print(f"[X] Batch match differs: {batch}")
+
     # 5. Verify Graph Data
     print("\nVerifying Graph Data...")
-    res_graph = requests.get(f"{BASE_URL}/graph")
+    res_graph = requests.get(f"{BASE_URL}/graph", params={"limit": 5})
     data = res_graph.json()
-    user_count = len(data)
-    print(f"Graph contains data for {user_count} users.")
-    
+    user_count = data["total"]
+    print(f"Graph contains data for {user_count} users (first page: {len(data['users'])}).")
+
+    res_user = requests.get(f"{BASE_URL}/graph/mentee_frank")
+    if res_user.status_code == 200:
+        print(f"[\u2713] Frank's graph has {len(res_user.json()['nodes'])} nodes")
+    else:
+        print(f"[X] Per-user graph failed: {res_user.text}")
+
+    # 6. Verify Metrics
+    res_metrics = requests.get(f"{BASE_URL}/metrics")
+    if res_metrics.status_code == 200 and "mentorship_stage_seconds" in res_metrics.text:
+        print("[✓] /metrics exposes stage histograms")
+    else:
+        print(f"[X] /metrics failed: {res_metrics.status_code}")
+
     print("\nTest Complete.")
 
 if __name__ == "__main__":
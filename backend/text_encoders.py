@@ -0,0 +1,244 @@
+"""
+Text encoder backends for EmbeddingManager.
+
+    torch       sentence-transformers on PyTorch (the original path)
+    onnx        ONNX Runtime on CPU: the model's exported ONNX graph plus a `tokenizers`
+                tokenizer, so the process never imports torch
+    onnx-int8   the same graph with dynamically quantized int8 weights (quantized once, cached
+                next to the fp32 file); smaller and faster, with a small accuracy cost
+    mock        random vectors, used when the libraries for the chosen backend are missing
+
+Encoders load lazily: nothing is read from disk until load() or the first encode(), so
+importing the API stays cheap. MentorshipService.start() loads and warms the encoder in the
+background and /health reports readiness through status().
+"""
+import importlib.util
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8", "mock")
+# Libraries each backend needs; if any is missing we fall back to mock vectors
+_REQUIREMENTS = {
+    "torch": ("sentence_transformers",),
+    "onnx": ("onnxruntime", "tokenizers"),
+    "onnx-int8": ("onnxruntime", "tokenizers", "onnx"),
+    "mock": (),
+}
+# Short, medium and long texts so warmup exercises a few sequence lengths
+WARMUP_TEXTS = [
+    "mentor",
+    "new user looking for mentorship",
+    "Interests: Leadership, Career Growth. Challenges: Time Management, Stress. "
+    "Goals: raise a seed round, hire a first engineer and learn to manage a growing team.",
+]
+
+
+class TextEncoder:
+    """Base class: lazy, thread-safe loading plus load/readiness bookkeeping."""
+    backend = "mock"
+
+    def __init__(self, model_name: str, dimension: int):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def cache_name(self) -> str:
+        """Identifies the vectors this encoder produces (embedding cache and snapshot key)."""
+        return self.model_name
+
+    @property
+    def ready(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        """Loads the model once; concurrent callers wait for the first load."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            start = time.perf_counter()
+            try:
+                dimension = self._load()
+                if dimension != self.dimension:
+                    raise ValueError(f"Model {self.model_name} produces {dimension}-d vectors, "
+                                     f"expected {self.dimension}")
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                raise
+            self.error = None
+            self.load_seconds = time.perf_counter() - start
+            self._loaded = True
+            logger.info("Loaded %s (%s) in %.2fs", self.model_name, self.backend, self.load_seconds)
+
+    def warmup(self, repeat: int = 2):
+        """Runs a few small batches so first-request latency excludes one-off setup costs."""
+        start = time.perf_counter()
+        for _ in range(repeat):
+            self.encode(WARMUP_TEXTS)
+        self.warmup_seconds = time.perf_counter() - start
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encodes texts into an (n, dimension) float32 array, loading the model on first use."""
+        self.load()
+        return np.asarray(self._encode(texts), dtype='float32')
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "model": self.model_name,
+            "ready": self._loaded,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+        }
+
+    def _load(self) -> int:
+        """Loads the model and returns its output dimension."""
+        raise NotImplementedError
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class MockEncoder(TextEncoder):
+    """Random vectors for the MVP demo when no model libraries are installed."""
+    backend = "mock"
+
+    @property
+    def cache_name(self) -> str:
+        return f"mock-{self.dimension}"
+
+    def _load(self) -> int:
+        return self.dimension
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return np.random.rand(len(texts), self.dimension).astype('float32')
+
+
+class TorchEncoder(TextEncoder):
+    """sentence-transformers on PyTorch."""
+    backend = "torch"
+
+    def _load(self) -> int:
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(self.model_name)
+        return self.model.get_sentence_embedding_dimension()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=max(1, len(texts)))
+
+
+class OnnxEncoder(TextEncoder):
+    """
+    ONNX Runtime (CPU) encoder for sentence-transformers models.
+
+    Reads `onnx/model.onnx` and `tokenizer.json` from model_dir, or from the model's
+    Hugging Face repo (which ships both for all-MiniLM-L6-v2). Output is mean-pooled
+    over the attention mask and L2-normalized, as in the model's sentence-transformers
+    pipeline, so vectors match the torch backend.
+    """
+    backend = "onnx"
+
+    def __init__(self, model_name: str, dimension: int, model_dir: Optional[str] = None,
+                 quantize: bool = False, max_length: int = 256, threads: int = 0):
+        super().__init__(model_name, dimension)
+        self.model_dir = model_dir
+        self.quantize = quantize
+        self.max_length = max_length
+        self.threads = threads
+        if quantize:
+            self.backend = "onnx-int8"
+
+    @property
+    def cache_name(self) -> str:
+        # int8 vectors differ slightly from fp32 ones, so they must not share cache entries.
+        return f"{self.model_name}:int8" if self.quantize else self.model_name
+
+    def _model_files(self) -> Tuple[str, str]:
+        if self.model_dir:
+            model_path = os.path.join(self.model_dir, "onnx", "model.onnx")
+            if not os.path.exists(model_path):
+                model_path = os.path.join(self.model_dir, "model.onnx")
+            return model_path, os.path.join(self.model_dir, "tokenizer.json")
+        from huggingface_hub import hf_hub_download
+        repo_id = self.model_name if "/" in self.model_name else f"sentence-transformers/{self.model_name}"
+        return hf_hub_download(repo_id, "onnx/model.onnx"), hf_hub_download(repo_id, "tokenizer.json")
+
+    @staticmethod
+    def _quantized(model_path: str) -> str:
+        """Path of the int8 copy of model_path, quantizing it on first use."""
+        quantized_path = model_path[:-len(".onnx")] + ".int8.onnx"
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            partial = f"{quantized_path}.{os.getpid()}.tmp"
+            quantize_dynamic(model_path, partial, weight_type=QuantType.QInt8)
+            os.replace(partial, quantized_path)
+        return quantized_path
+
+    def _load(self) -> int:
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path, tokenizer_path = self._model_files()
+        if self.quantize:
+            model_path = self._quantized(os.path.realpath(model_path))
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._inputs = {node.name for node in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(self.max_length)
+        self.tokenizer.enable_padding()
+        return int(self.session.get_outputs()[0].shape[-1])
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension), dtype='float32')
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64), "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feed["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        tokens = self.session.run(None, feed)[0]
+
+        weights = mask[:, :, None].astype('float32')
+        pooled = (tokens * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+
+def create_text_encoder(backend: str = "torch", model_name: str = "all-MiniLM-L6-v2", dimension: int = 384,
+                        model_dir: Optional[str] = None, threads: int = 0) -> TextEncoder:
+    """
+    Builds an (unloaded) encoder. Only checks that the backend's libraries are installed,
+    without importing them; falls back to mock vectors if they are not.
+    """
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}'. Expected one of {ENCODER_BACKENDS}.")
+    missing = [module for module in _REQUIREMENTS[backend] if importlib.util.find_spec(module) is None]
+    if missing:
+        logger.warning("%s not found. Using mock embeddings.", ", ".join(missing))
+        backend = "mock"
+
+    if backend == "torch":
+        return TorchEncoder(model_name, dimension)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEncoder(model_name, dimension, model_dir=model_dir, quantize=backend == "onnx-int8",
+                           threads=threads)
+    return MockEncoder(model_name, dimension)
@@ -0,0 +1,471 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+METRICS = ("l2", "ip")
+
+
+@dataclass
+class IndexConfig:
+    """
+    Selects and tunes the FAISS backend used for profile search.
+    Flat is exact; IVF and HNSW trade a little recall for sub-linear search.
+    """
+    index_type: str = "flat"
+    # "l2" (Euclidean) or "ip" (inner product; cosine similarity with normalized vectors)
+    metric: str = "l2"
+    # L2-normalize vectors at insert (and queries). Defaults to on for "ip", so scores are cosine.
+    normalize: Optional[bool] = None
+    # IVF: number of coarse clusters and how many of them are probed per query
+    nlist: int = 256
+    nprobe: int = 16
+    # IVF buffers vectors in an exact index until this many are available for training
+    # (defaults to 39 * nlist, FAISS's minimum for a stable k-means).
+    train_size: Optional[int] = None
+    # IVF-PQ: sub-quantizers per vector and bits per code
+    pq_m: int = 48
+    pq_bits: int = 8
+    # HNSW: graph degree and construction/search beam widths
+    hnsw_m: int = 32
+    ef_construction: int = 80
+    ef_search: int = 64
+    # HNSW cannot delete, so replaced vectors are tombstoned and the graph is rebuilt
+    # once tombstones exceed this fraction of its rows.
+    rebuild_ratio: float = 0.25
+
+    def __post_init__(self):
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type '{self.index_type}'. Expected one of {INDEX_TYPES}.")
+        if self.metric not in METRICS:
+            raise ValueError(f"Unknown metric '{self.metric}'. Expected one of {METRICS}.")
+        if self.normalize is None:
+            self.normalize = self.metric == "ip"
+
+    @property
+    def faiss_metric(self) -> int:
+        return faiss.METRIC_INNER_PRODUCT if self.metric == "ip" else faiss.METRIC_L2
+
+    @classmethod
+    def from_env(cls) -> "IndexConfig":
+        """Builds a config from FAISS_* environment variables, falling back to defaults."""
+        normalize = os.environ.get("FAISS_NORMALIZE")
+        config = cls(index_type=os.environ.get("FAISS_INDEX_TYPE", cls.index_type),
+                     metric=os.environ.get("FAISS_METRIC", cls.metric),
+                     normalize=None if not normalize else normalize not in ("0", "false"))
+        for field, cast in (("nlist", int), ("nprobe", int), ("train_size", int), ("pq_m", int),
+                            ("pq_bits", int), ("hnsw_m", int), ("ef_construction", int),
+                            ("ef_search", int), ("rebuild_ratio", float)):
+            value = os.environ.get(f"FAISS_{field.upper()}")
+            if value:
+                setattr(config, field, cast(value))
+        return config
+
+
+class VectorIndex:
+    """
+    Row-addressed wrapper around a FAISS index.
+    Callers address vectors by stable row ids; subclasses map those onto whatever the
+    underlying index supports (in-place writes, native ids, or tombstones).
+    """
+
+    def __init__(self, dimension: int, config: IndexConfig):
+        self.dimension = dimension
+        self.config = config
+
+    def upsert(self, rows: np.ndarray, vectors: np.ndarray):
+        raise NotImplementedError
+
+    def remove(self, rows: np.ndarray):
+        raise NotImplementedError
+
+    def search(self, queries: np.ndarray, k: int, allow_rows: Optional[np.ndarray] = None,
+               exclude_rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (distances, rows), nearest first; missing results are padded with row -1.
+        Distances are squared L2, or the negated inner product for "ip", so lower is
+        always better (see distance_to_score).
+        allow_rows / exclude_rows restrict the search inside FAISS via an IDSelector,
+        so filtered-out rows never take up any of the k result slots.
+        """
+        raise NotImplementedError
+
+    def _faiss_search(self, index: faiss.Index, queries: np.ndarray, k: int,
+                      params: Optional[faiss.SearchParameters]) -> Tuple[np.ndarray, np.ndarray]:
+        distances, ids = index.search(queries, k, params=params)
+        if self.config.metric == "ip":
+            np.negative(distances, out=distances)
+        return distances, ids
+
+    def _search_parameters(self, selector: faiss.IDSelector) -> faiss.SearchParameters:
+        return faiss.SearchParameters(sel=selector)
+
+    def _selector_parameters(self, allow_ids: Optional[np.ndarray], exclude_ids: Optional[np.ndarray],
+                             bitmap: Optional[np.ndarray] = None) -> Optional[faiss.SearchParameters]:
+        """
+        Builds search parameters carrying an IDSelector over FAISS ids (None if unfiltered).
+        `bitmap` additionally restricts the search to the ids whose bit is set (little-endian bits).
+        """
+        selector = None
+        if allow_ids is not None:
+            selector = faiss.IDSelectorBatch(np.ascontiguousarray(allow_ids, dtype='int64'))
+        if exclude_ids is not None and len(exclude_ids):
+            excluded = faiss.IDSelectorNot(faiss.IDSelectorBatch(np.ascontiguousarray(exclude_ids, dtype='int64')))
+            selector = excluded if selector is None else faiss.IDSelectorAnd(selector, excluded)
+        if bitmap is not None:
+            members = faiss.IDSelectorBitmap(len(bitmap) * 8, faiss.swig_ptr(bitmap))
+            selector = members if selector is None else faiss.IDSelectorAnd(selector, members)
+        if selector is None:
+            return None
+        params = self._search_parameters(selector)
+        # SWIG doesn't keep Python-side references alive; pin the selector tree on the params.
+        params.referenced_objects = [selector, bitmap]
+        return params
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def restore_vectors(self, vectors: np.ndarray):
+        """
+        Called after a snapshot restore with the embedding store's row vectors, for indexes
+        that were snapshotted without their vectors (see persistence.py). No-op by default.
+        """
+
+
+class _PositionalIndex(VectorIndex):
+    """
+    Base for indexes whose FAISS ids are insertion positions (Flat, HNSW).
+    Keeps a row <-> position map so rows survive replacement and removal.
+    """
+
+    def __init__(self, dimension: int, config: IndexConfig):
+        super().__init__(dimension, config)
+        self.index = self._new_faiss_index()
+        self._row_of_pos = np.empty(0, dtype='int64')
+        self._pos_of_row: Dict[int, int] = {}
+        self._dead = 0
+        # Bitmap of live positions, built on the first search after a change (see _live_bitmap)
+        self._live: Optional[np.ndarray] = None
+
+    def _new_faiss_index(self) -> faiss.Index:
+        raise NotImplementedError
+
+    def _append(self, rows: List[int], vectors: np.ndarray):
+        start = self.index.ntotal
+        self.index.add(vectors)
+        self._row_of_pos = np.concatenate([self._row_of_pos, np.asarray(rows, dtype='int64')])
+        for offset, row in enumerate(rows):
+            self._pos_of_row[row] = start + offset
+        self._live = None
+
+    def _tombstone(self, row: int) -> Optional[int]:
+        pos = self._pos_of_row.pop(row, None)
+        if pos is not None:
+            self._row_of_pos[pos] = -1
+            self._dead += 1
+            self._live = None
+        return pos
+
+    def remove(self, rows: np.ndarray):
+        for row in np.asarray(rows).tolist():
+            self._tombstone(row)
+
+    def _positions(self, rows: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if rows is None:
+            return None
+        return np.array([self._pos_of_row[r] for r in np.asarray(rows).tolist() if r in self._pos_of_row],
+                        dtype='int64')
+
+    def search(self, queries: np.ndarray, k: int, allow_rows: Optional[np.ndarray] = None,
+               exclude_rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(queries, dtype='float32')
+        allow_pos = self._positions(allow_rows)
+        if self.index.ntotal == 0 or k <= 0 or (allow_pos is not None and len(allow_pos) == 0):
+            return (np.full((len(queries), k), np.inf, dtype='float32'),
+                    np.full((len(queries), k), -1, dtype='int64'))
+
+        exclude_pos = self._positions(exclude_rows)
+        # Live positions a query may return, so short results can be told apart from exhausted ones
+        if allow_pos is not None:
+            available = len(np.setdiff1d(allow_pos, exclude_pos if exclude_pos is not None else []))
+        else:
+            available = len(self._pos_of_row) - (len(np.unique(exclude_pos)) if exclude_pos is not None else 0)
+        # Tombstoned positions are excluded inside FAISS too, so they never take up any of the k
+        # slots (allowed positions are live already).
+        live = self._live_bitmap() if self._dead and allow_pos is None else None
+        params = self._selector_parameters(allow_pos, exclude_pos, bitmap=live)
+        distances, positions = self._search_positions(queries, min(self.index.ntotal, k), params,
+                                                      min(k, available))
+        rows = np.where(positions >= 0, self._row_of_pos[np.maximum(positions, 0)], -1)
+        return _compact(distances, rows, k)
+
+    def _search_positions(self, queries: np.ndarray, k: int, params: Optional[faiss.SearchParameters],
+                          wanted: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(distances, positions) for the queries; `wanted` is how many hits each can have."""
+        return self._faiss_search(self.index, queries, k, params)
+
+    def _live_bitmap(self) -> np.ndarray:
+        if self._live is None:
+            self._live = np.packbits(self._row_of_pos >= 0, bitorder='little')
+        return self._live
+
+    def __len__(self) -> int:
+        return len(self._pos_of_row)
+
+
+class FlatIndex(_PositionalIndex):
+    """Exact brute-force search. Replacements overwrite the stored vector in place."""
+
+    def __init__(self, dimension: int, config: IndexConfig):
+        super().__init__(dimension, config)
+        self._free_pos: List[int] = []
+
+    def _new_faiss_index(self) -> faiss.Index:
+        return faiss.IndexFlat(self.dimension, self.config.faiss_metric)
+
+    def _storage(self) -> np.ndarray:
+        # IndexFlat keeps vectors contiguously; expose them as a writable view.
+        ntotal = self.index.ntotal
+        return faiss.rev_swig_ptr(self.index.get_xb(), ntotal * self.dimension).reshape(ntotal, self.dimension)
+
+    def upsert(self, rows: np.ndarray, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype='float32').reshape(-1, self.dimension)
+        new_rows, new_vectors = [], []
+        storage = self._storage() if self.index.ntotal else None
+        for row, vector in zip(np.asarray(rows).tolist(), vectors):
+            pos = self._pos_of_row.get(row)
+            if pos is None and self._free_pos:
+                pos = self._free_pos.pop()
+                self._pos_of_row[row] = pos
+                self._row_of_pos[pos] = row
+                self._dead -= 1
+                self._live = None
+            if pos is not None:
+                storage[pos] = vector
+            else:
+                new_rows.append(row)
+                new_vectors.append(vector)
+        if new_rows:
+            self._append(new_rows, np.stack(new_vectors))
+
+    def remove(self, rows: np.ndarray):
+        for row in np.asarray(rows).tolist():
+            pos = self._tombstone(row)
+            if pos is not None:
+                self._free_pos.append(pos)
+
+    def __getstate__(self) -> Dict:
+        # Live positions hold exactly the embedding store's row vectors, which the snapshot already
+        # has (vectors.f32), so the FAISS index is left out and rebuilt by restore_vectors.
+        return {**self.__dict__, "index": None, "_live": None}
+
+    def restore_vectors(self, vectors: np.ndarray):
+        if self.index is not None:
+            return
+        stored = np.zeros((len(self._row_of_pos), self.dimension), dtype='float32')
+        live = self._row_of_pos >= 0
+        stored[live] = vectors[self._row_of_pos[live]]
+        self.index = self._new_faiss_index()
+        self.index.add(stored)
+
+
+class HNSWIndex(_PositionalIndex):
+    """Graph-based ANN. HNSW can't delete, so replaced rows are tombstoned and compacted later."""
+
+    def _new_faiss_index(self) -> faiss.Index:
+        index = faiss.IndexHNSWFlat(self.dimension, self.config.hnsw_m, self.config.faiss_metric)
+        index.hnsw.efConstruction = self.config.ef_construction
+        index.hnsw.efSearch = self.config.ef_search
+        return index
+
+    def _search_parameters(self, selector: faiss.IDSelector) -> faiss.SearchParameters:
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=self.config.ef_search)
+
+    def _search_positions(self, queries: np.ndarray, k: int, params: Optional[faiss.SearchParameters],
+                          wanted: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The beam only keeps efSearch candidates, so when the selector rejects most of the graph
+        (tombstones, narrow filters) it can end with fewer than k hits. Those queries are searched
+        again with a wider beam until they are full or the beam covers the whole graph.
+        """
+        distances, positions = self._faiss_search(self.index, queries, k, params)
+        ef = max(self.config.ef_search, k)
+        short = np.flatnonzero((positions >= 0).sum(axis=1) < wanted)
+        while len(short) and ef < self.index.ntotal:
+            ef = min(ef * 4, self.index.ntotal)
+            if params is None:
+                params = faiss.SearchParametersHNSW(efSearch=ef)
+            params.efSearch = ef
+            distances[short], positions[short] = self._faiss_search(self.index, queries[short], k, params)
+            short = short[(positions[short] >= 0).sum(axis=1) < wanted]
+        return distances, positions
+
+    def upsert(self, rows: np.ndarray, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype='float32').reshape(-1, self.dimension)
+        rows = np.asarray(rows).tolist()
+        for row in rows:
+            self._tombstone(row)
+        self._append(rows, vectors)
+        self._maybe_rebuild()
+
+    def remove(self, rows: np.ndarray):
+        super().remove(rows)
+        self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        if self._dead <= self.config.rebuild_ratio * max(self.index.ntotal, 1):
+            return
+        live_pos = np.flatnonzero(self._row_of_pos >= 0)
+        live_rows = self._row_of_pos[live_pos].tolist()
+        live_vectors = self.index.reconstruct_n(0, self.index.ntotal)[live_pos] if len(live_pos) else None
+
+        self.index = self._new_faiss_index()
+        self._row_of_pos = np.empty(0, dtype='int64')
+        self._pos_of_row = {}
+        self._dead = 0
+        if live_rows:
+            self._append(live_rows, live_vectors)
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index (IVF-Flat or IVF-PQ) using rows as native FAISS ids.
+    Until enough vectors exist to train the coarse quantizer, rows are served from an exact Flat index.
+    """
+
+    def __init__(self, dimension: int, config: IndexConfig):
+        super().__init__(dimension, config)
+        self.train_size = config.train_size or 39 * config.nlist
+        self.index: Optional[faiss.IndexIVF] = None
+        self._staging: Optional[FlatIndex] = FlatIndex(dimension, config)
+        # Set when the inverted lists are memory-mapped from a snapshot (read-only until loaded)
+        self._mapped = False
+
+    def _new_faiss_index(self) -> faiss.IndexIVF:
+        quantizer = faiss.IndexFlat(self.dimension, self.config.faiss_metric)
+        if self.config.index_type == "ivf_pq":
+            index = faiss.IndexIVFPQ(quantizer, self.dimension, self.config.nlist,
+                                     self.config.pq_m, self.config.pq_bits, self.config.faiss_metric)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, self.dimension, self.config.nlist, self.config.faiss_metric)
+        index.nprobe = self.config.nprobe
+        return index
+
+    def _train(self):
+        staging = self._staging
+        live_pos = np.flatnonzero(staging._row_of_pos >= 0)
+        rows = staging._row_of_pos[live_pos]
+        vectors = np.ascontiguousarray(staging._storage()[live_pos])
+
+        index = self._new_faiss_index()
+        index.train(vectors)
+        # Hashtable direct map makes remove_ids proportional to the rows removed, not the index size.
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        index.add_with_ids(vectors, rows)
+        self.index = index
+        self._staging = None
+
+    def upsert(self, rows: np.ndarray, vectors: np.ndarray):
+        rows = np.asarray(rows, dtype='int64')
+        vectors = np.ascontiguousarray(vectors, dtype='float32').reshape(-1, self.dimension)
+        if self._staging is not None:
+            self._staging.upsert(rows, vectors)
+            if len(self._staging) >= self.train_size:
+                self._train()
+            return
+        self._load_lists()
+        self.index.remove_ids(rows)
+        self.index.add_with_ids(vectors, rows)
+
+    def remove(self, rows: np.ndarray):
+        rows = np.asarray(rows, dtype='int64')
+        if self._staging is not None:
+            self._staging.remove(rows)
+        else:
+            self._load_lists()
+            self.index.remove_ids(rows)
+
+    def restore_vectors(self, vectors: np.ndarray):
+        self._mapped = self._staging is None and isinstance(faiss.downcast_InvertedLists(self.index.invlists),
+                                                            faiss.OnDiskInvertedLists)
+        if self._staging is not None:
+            self._staging.restore_vectors(vectors)
+
+    def _load_lists(self):
+        """Copies inverted lists memory-mapped from a snapshot into RAM before they are modified."""
+        if not self._mapped:
+            return
+        mapped = self.index.invlists
+        lists = faiss.ArrayInvertedLists(mapped.nlist, mapped.code_size)
+        for list_no in range(mapped.nlist):
+            size = mapped.list_size(list_no)
+            if size:
+                lists.add_entries(list_no, size, mapped.get_ids(list_no), mapped.get_codes(list_no))
+        self.index.replace_invlists(lists, True)
+        lists.this.disown()
+        self._mapped = False
+
+    def __getstate__(self) -> Dict:
+        # Mapped lists can't be cloned or written as a standalone index.
+        self._load_lists()
+        return self.__dict__.copy()
+
+    def _search_parameters(self, selector: faiss.IDSelector) -> faiss.SearchParameters:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=self.config.nprobe)
+
+    def search(self, queries: np.ndarray, k: int, allow_rows: Optional[np.ndarray] = None,
+               exclude_rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if self._staging is not None:
+            return self._staging.search(queries, k, allow_rows=allow_rows, exclude_rows=exclude_rows)
+        queries = np.ascontiguousarray(queries, dtype='float32')
+        if allow_rows is not None and len(allow_rows) == 0:
+            return (np.full((len(queries), k), np.inf, dtype='float32'),
+                    np.full((len(queries), k), -1, dtype='int64'))
+        params = self._selector_parameters(allow_rows, exclude_rows)
+        return self._faiss_search(self.index, queries, k, params)
+
+    def __len__(self) -> int:
+        # One read of _staging: /metrics calls this off the state thread, which may train meanwhile.
+        staging = self._staging
+        return len(staging) if staging is not None else self.index.ntotal
+
+
+def _compact(distances: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Moves valid hits to the front of each result row and trims/pads to k columns."""
+    order = np.argsort(rows < 0, axis=1, kind='stable')
+    rows = np.take_along_axis(rows, order, axis=1)
+    distances = np.take_along_axis(distances, order, axis=1)
+    if rows.shape[1] < k:
+        pad = k - rows.shape[1]
+        rows = np.pad(rows, ((0, 0), (0, pad)), constant_values=-1)
+        distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+    return distances[:, :k], rows[:, :k]
+
+
+def distance_to_score(distances: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Similarity score for search distances: cosine / inner product for "ip",
+    1 / (1 + squared L2) for "l2" (higher is better either way).
+    """
+    if metric == "ip":
+        return -distances
+    return 1 / (1 + np.maximum(distances, 0))
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalizes a float32 C-contiguous matrix in place (one multithreaded pass); zero rows stay zero."""
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def create_index(dimension: int, config: Optional[IndexConfig] = None) -> VectorIndex:
+    """Factory for the configured FAISS backend."""
+    config = config or IndexConfig()
+    if config.index_type == "flat":
+        return FlatIndex(dimension, config)
+    if config.index_type == "hnsw":
+        return HNSWIndex(dimension, config)
+    return IVFIndex(dimension, config)
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import os
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Segment files are named by the absolute log offset of their first byte.
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+
+
+def _segment_name(base: int) -> str:
+    return f"{SEGMENT_PREFIX}{base:020d}{SEGMENT_SUFFIX}"
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    payload = json.dumps(record, separators=(",", ":")).encode()
+    return b"%08x " % zlib.crc32(payload) + payload + b"\n"
+
+
+def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+    """Parses one log line; returns None for a torn or corrupt record."""
+    if len(line) < 10 or line[8:9] != b" " or not line.endswith(b"\n"):
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class SessionLog:
+    """
+    Append-only write-ahead log of Session records, stored as segment files in `directory`.
+
+    Each record is one line: crc32 (hex), a space, then the session as JSON. Offsets are
+    absolute byte positions across segments, so a snapshot can store the offset it covers
+    and replay resumes from there.
+
+    Appends are group-committed: records queued while a write+fsync is in flight are written
+    together and share the next fsync, so concurrent requests pay for one fsync between them.
+    """
+
+    def __init__(self, directory: str, group_commit_ms: float = 2.0, fsync: bool = True):
+        self.directory = directory
+        self.group_commit = group_commit_ms / 1000.0
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._bases = self._segments()
+        if not self._bases:
+            self._bases = [0]
+        self._file = self._open_segment(self._bases[-1])
+        # Offset just past the last durable record; records are numbered when written, not when queued.
+        self._end = self._bases[-1] + self._recover_tail()
+        # Set when a failed write could not be truncated away: the next write starts a fresh segment.
+        self._reopen = False
+        self._pending: List[Tuple[bytes, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._in_flight: Set[int] = set()
+        self._writing = False
+
+    def _segments(self) -> List[int]:
+        return sorted(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+                      if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+
+    def _open_segment(self, base: int):
+        # Unbuffered, so a failed write leaves nothing behind in a buffer to be flushed later.
+        return open(os.path.join(self.directory, _segment_name(base)), "ab", buffering=0)
+
+    def _recover_tail(self) -> int:
+        """Truncates a record torn by a crash at the end of the last segment; returns its valid size."""
+        path = self._file.name
+        position = valid = 0
+        with open(path, "rb") as f:
+            for line in f:
+                position += len(line)
+                if _decode(line) is not None:
+                    valid = position
+        if valid != os.path.getsize(path):
+            logger.warning("Truncating torn record at %s:%d", path, valid)
+            self._file.truncate(valid)
+        return valid
+
+    @property
+    def end_offset(self) -> int:
+        return self._end
+
+    def checkpoint_offset(self) -> int:
+        """
+        Offset up to which every record has been applied to in-memory state: a snapshot
+        captured now is consistent with replaying the log from here.
+        """
+        # Records still queued will be written at or after _end.
+        return min(self._in_flight) if self._in_flight else self._end
+
+    async def append(self, records: List[Dict[str, Any]]) -> List[int]:
+        """
+        Durably logs records before they are applied; returns each record's offset, the first
+        of which is the ticket for `applied()`. Resolves once the records are written and fsynced.
+        """
+        if self._writer is None or self._writer.done():
+            self._wakeup = asyncio.Event()
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+        lines = [_encode(record) for record in records]
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((b"".join(lines), future))
+        self._wakeup.set()
+        try:
+            start = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The write may still land: abandon the ticket once it is known.
+            future.add_done_callback(lambda f: f.cancelled() or f.exception() or self.applied(f.result()))
+            raise
+        offsets = []
+        for line in lines:
+            offsets.append(start)
+            start += len(line)
+        return offsets
+
+    def applied(self, ticket: int):
+        """Marks the records logged under `ticket` as applied (or abandoned)."""
+        self._in_flight.discard(ticket)
+
+    async def _write_loop(self):
+        while True:
+            await self._wakeup.wait()
+            if self.group_commit:
+                await asyncio.sleep(self.group_commit)
+            self._wakeup.clear()
+            batch, self._pending = self._pending, []
+            if not batch:
+                continue
+            self._writing = True
+            try:
+                start = await asyncio.to_thread(self._write, b"".join(data for data, _ in batch))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                self._writing = False
+            # Tickets are the durable offsets of the records just written.
+            for data, future in batch:
+                self._in_flight.add(start)
+                future.set_result(start)
+                start += len(data)
+
+    def _write(self, data: bytes) -> int:
+        """Writes and fsyncs data at the end of the log; returns the offset it starts at."""
+        if self._reopen:
+            self._file.close()
+            if self._end == self._bases[-1]:
+                # The segment holds only the failed write. Reopened for appending (not "wb"), so a later
+                # truncate still moves the write position back to the end of the file.
+                self._file = self._open_segment(self._end)
+                self._file.truncate(0)
+            else:
+                self._bases.append(self._end)
+                self._file = self._open_segment(self._end)
+            self._reopen = False
+        view = memoryview(data)
+        try:
+            written = 0
+            while written < len(data):
+                written += self._file.write(view[written:])
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except Exception:
+            # Cut the segment back to the last durable record, so a partial line does not hide
+            # the records appended after it on replay.
+            try:
+                self._file.truncate(self._end - self._bases[-1])
+            except OSError:
+                logger.exception("Could not truncate failed write in %s; starting a new segment", self._file.name)
+                self._reopen = True
+            raise
+        start = self._end
+        self._end += len(data)
+        return start
+
+    def rotate(self):
+        """Starts a new segment at the current end so older ones can be dropped after a snapshot."""
+        if self._pending or self._writing or self._end == self._bases[-1]:
+            return
+        self._file.close()
+        self._bases.append(self._end)
+        self._file = self._open_segment(self._end)
+
+    def truncate_before(self, offset: int):
+        """Deletes segments that end at or before `offset` (already covered by a snapshot)."""
+        while len(self._bases) > 1 and self._bases[1] <= offset:
+            os.remove(os.path.join(self.directory, _segment_name(self._bases.pop(0))))
+
+    def read_from(self, offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yields (offset, record) for every durable record starting at or after `offset`."""
+        for i, base in enumerate(self._bases):
+            if i + 1 < len(self._bases) and self._bases[i + 1] <= offset:
+                continue
+            position = base
+            with open(os.path.join(self.directory, _segment_name(base)), "rb") as f:
+                for line in f:
+                    record = _decode(line)
+                    if record is None:
+                        # A line a failed write left behind: skip it, later records are still valid
+                        logger.warning("Skipping corrupt record at %s:%d", f.name, position - base)
+                    elif position >= offset:
+                        yield position, record
+                    position += len(line)
+
+    async def close(self):
+        if self._writer is not None:
+            # Let queued appends finish before stopping the writer.
+            while self._pending or self._writing:
+                await asyncio.sleep(self.group_commit or 0.001)
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        self._file.close()
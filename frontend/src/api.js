@@ -15,8 +15,13 @@ export const api = {
         const response = await axios.post(`${API_URL}/match`, matchRequest);
         return response.data;
     },
-    getGraph: async () => {
-        const response = await axios.get(`${API_URL}/graph`);
+    getGraph: async (cursor = null, limit = 100) => {
+        const params = cursor ? { cursor, limit } : { limit };
+        const response = await axios.get(`${API_URL}/graph`, { params });
+        return response.data;
+    },
+    getUserGraph: async (userId) => {
+        const response = await axios.get(`${API_URL}/graph/${encodeURIComponent(userId)}`);
         return response.data;
     }
 };
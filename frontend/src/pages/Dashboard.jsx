@@ -173,7 +173,7 @@ const Dashboard = ({ user, onLogout }) => {
                             {graphData ? (
                                 <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
                                     <div className="bg-white/5 border border-white/5 p-4 rounded-xl">
-                                        <div className="text-3xl font-bold text-indigo-400 mb-1">{Object.keys(graphData).length}</div>
+                                        <div className="text-3xl font-bold text-indigo-400 mb-1">{graphData.total}</div>
                                         <div className="text-xs text-slate-500 uppercase tracking-wider font-semibold">Total Users</div>
                                     </div>
                                     {/* Additional stats could go here */}
@@ -190,7 +190,7 @@ const Dashboard = ({ user, onLogout }) => {
                             <h2 className="text-lg font-semibold mb-4 text-white">Raw Graph Data</h2>
                             <div className="bg-[#0B0E17] p-4 rounded-xl border border-slate-800 overflow-hidden">
                                 <pre className="text-indigo-300 overflow-auto max-h-96 text-xs font-mono scrollbar-thin scrollbar-thumb-slate-700 scrollbar-track-transparent p-2">
-                                    {JSON.stringify(graphData, null, 2)}
+                                    {JSON.stringify(graphData.users, null, 2)}
                                 </pre>
                             </div>
                         </Card>